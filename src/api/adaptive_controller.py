@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class _SessionState:
+    """Feedback state of one live session."""
+
+    def __init__(self, level: int, fps: float):
+        self.level = level
+        self.fps = fps
+        self.latency: Optional[float] = None  # EWMA of end-to-end server latency (s)
+        self.submitted = 0
+        self.superseded = 0
+        self.results = 0
+        self.last_change = 0  # `results` count at the last resolution change
+        self.last_hint = 0.0
+        self.hinted: Optional[tuple] = None
+
+
+class AdaptiveController:
+    """
+    Per-session feedback controller for live inference resolution and send rate.
+
+    For every session it tracks an EWMA of the end-to-end server latency (frame
+    received -> result emitted), the share of frames that were superseded
+    before inference and the scheduler's queue depth. From those it steps the
+    session's inference resolution through `resolutions` (down when latency is
+    over target or frames back up, up when there is headroom) and derives the
+    send rate the client should use. Changes are pushed to the client through
+    `emit_hint(sid, hint)` (the `rate_hint` Socket.IO event).
+    """
+
+    def __init__(
+        self,
+        emit_hint: Callable[[str, dict], None],
+        resolutions: Sequence[int] = (256, 320, 416, 640),
+        initial_size: int = 320,
+        target_latency_ms: float = 150,
+        min_fps: float = 2,
+        max_fps: float = 30,
+        hint_interval_s: float = 1.0,
+        smoothing: float = 0.2,
+        settle_frames: int = 10
+    ):
+        """
+        @param {Callable} emit_hint - Called as emit_hint(sid, {"fps", "target_size", "latency_ms"})
+        @param {Sequence[int]} resolutions - Inference sizes (longest side) to choose from
+        @param {int} initial_size - Size new sessions start with (closest entry of `resolutions`)
+        @param {float} target_latency_ms - End-to-end latency the controller steers towards
+        @param {float} min_fps - Lowest send rate ever suggested
+        @param {float} max_fps - Highest send rate ever suggested
+        @param {float} hint_interval_s - Minimum time between two hints to the same session
+        @param {float} smoothing - EWMA weight of the newest latency sample
+        @param {int} settle_frames - Results to wait after a resolution change before the next one
+        """
+        self.emit_hint = emit_hint
+        self.resolutions = sorted(set(int(r) for r in resolutions))
+        self.initial_level = min(
+            range(len(self.resolutions)), key=lambda i: abs(self.resolutions[i] - initial_size)
+        )
+        self.target_latency = target_latency_ms / 1000.0
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.hint_interval = hint_interval_s
+        self.smoothing = smoothing
+        self.settle_frames = settle_frames
+
+        self._sessions: Dict[str, _SessionState] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self) -> int:
+        """Largest resolution a session can be given."""
+        return self.resolutions[-1]
+
+    def get_target_size(self, sid: str) -> int:
+        """Inference size currently assigned to a session."""
+        with self._lock:
+            return self.resolutions[self._state(sid).level]
+
+    def on_submit(self, sid: str, superseded: bool) -> None:
+        """
+        Record an incoming frame.
+
+        @param {str} sid - Session id
+        @param {bool} superseded - Whether it replaced a frame that was still waiting
+        """
+        with self._lock:
+            state = self._state(sid)
+            state.submitted += 1
+            if superseded:
+                state.superseded += 1
+
+    def on_result(self, sid: str, latency_s: float, queue_depth: int, batch_limit: int) -> None:
+        """
+        Feed back a processed frame and adjust the session if needed.
+
+        @param {str} sid - Session id
+        @param {float} latency_s - Time from the frame entering the queue to its result being emitted
+        @param {int} queue_depth - Sessions still waiting for inference
+        @param {int} batch_limit - Scheduler batch size (queue depth above it means a backlog)
+        """
+        with self._lock:
+            state = self._sessions.get(sid)
+            if state is None:
+                return
+            state.results += 1
+            if state.latency is None:
+                state.latency = latency_s
+            else:
+                state.latency += self.smoothing * (latency_s - state.latency)
+
+            drop_ratio = state.superseded / state.submitted if state.submitted else 0.0
+            backlog = queue_depth > batch_limit
+            settled = state.results - state.last_change >= self.settle_frames
+
+            if settled and (state.latency > self.target_latency * 1.25 or backlog or drop_ratio > 0.5):
+                if state.level > 0:
+                    state.level -= 1
+                    state.last_change = state.results
+            elif settled and state.latency < self.target_latency * 0.5 and not backlog and drop_ratio < 0.1:
+                if state.level < len(self.resolutions) - 1:
+                    state.level += 1
+                    state.last_change = state.results
+
+            # suggest the rate the server keeps up with: one frame per observed latency,
+            # scaled down when the session's frames are overwritten before inference
+            fps = (1.0 / max(state.latency, 1e-3)) * (1.0 - 0.5 * drop_ratio)
+            state.fps = max(self.min_fps, min(self.max_fps, fps))
+            hint = self._build_hint(state)
+            now = time.monotonic()
+            if not self._should_hint(state, hint, now):
+                return
+            state.hinted = (hint["target_size"], hint["fps"])
+            state.last_hint = now
+            # reset the drop window so the next hint reflects the new rate
+            state.submitted = state.superseded = 0
+
+        try:
+            self.emit_hint(sid, hint)
+        except Exception as e:
+            logger.error(f"Failed to send rate hint to {sid}: {e}")
+
+    def remove_session(self, sid: str) -> None:
+        """Forget a session's state (e.g. on disconnect)."""
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def get_session_ids(self) -> list:
+        """Sessions with controller state."""
+        with self._lock:
+            return list(self._sessions)
+
+    def get_stats(self) -> dict:
+        """Current resolution, suggested rate and latency per session."""
+        with self._lock:
+            return {
+                "resolutions": self.resolutions,
+                "target_latency_ms": self.target_latency * 1000.0,
+                "sessions": {sid: self._build_hint(state) for sid, state in self._sessions.items()}
+            }
+
+    def _state(self, sid: str) -> _SessionState:
+        state = self._sessions.get(sid)
+        if state is None:
+            state = self._sessions[sid] = _SessionState(self.initial_level, self.max_fps)
+        return state
+
+    def _build_hint(self, state: _SessionState) -> dict:
+        return {
+            "fps": round(float(state.fps), 1),
+            "target_size": self.resolutions[state.level],
+            "latency_ms": round(state.latency * 1000.0, 1) if state.latency is not None else None
+        }
+
+    def _should_hint(self, state: _SessionState, hint: dict, now: float) -> bool:
+        """Send on resolution changes, or on a rate change of more than 10% once the interval passed."""
+        if state.hinted is None:
+            return True
+        size, fps = state.hinted
+        if hint["target_size"] != size:
+            return True
+        return now - state.last_hint >= self.hint_interval and abs(hint["fps"] - fps) > 0.1 * fps
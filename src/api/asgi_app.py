@@ -0,0 +1,386 @@
+import time
+
+# taken before the heavy imports below, so startup timings include them
+PROCESS_STARTED = time.perf_counter()
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from urllib.parse import parse_qs
+import asyncio
+import atexit
+import json
+import logging
+import threading
+
+import socketio
+
+from config import Config
+from socket_handlers import SocketIOHandlers
+from frame_ring import FrameRingPool
+from session_manager import session_gauges
+from model_registry import ModelRegistry
+from log_setup import configure_logging
+
+configure_logging(Config)
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorTasks:
+    """
+    Stands in for the Flask-SocketIO server the live pipeline was written against.
+
+    Background tasks (the batch scheduler's inference loop) run on the bounded
+    thread pool instead of a greenlet, `sleep` blocks only that thread, and
+    emits made from a pool thread are handed over to the event loop that owns
+    the AsyncServer.
+    """
+
+    def __init__(self, sio: socketio.AsyncServer, executor: ThreadPoolExecutor):
+        """
+        @param {socketio.AsyncServer} sio - Server the results are emitted on
+        @param {ThreadPoolExecutor} executor - Threads all CPU work runs on
+        """
+        self.sio = sio
+        self.executor = executor
+        # set once the server started (see create_app's on_startup)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start_background_task(self, target: Callable, *args, **kwargs):
+        return self.executor.submit(target, *args, **kwargs)
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def emit(self, event: str, data=None, to: Optional[str] = None) -> None:
+        """Emit from any thread; dropped while the event loop is not running."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.sio.emit(event, data, to=to), self.loop)
+
+
+class AsyncSocketIOHandlers(SocketIOHandlers):
+    """
+    SocketIOHandlers for python-socketio's AsyncServer.
+
+    Handlers run on the event loop and never block it: `image_binary` frames go to
+    the same batch scheduler as in live_app (its inference loop runs on the
+    executor), `image` frames are decoded, inferred and encoded on the executor.
+    An idle connection costs a coroutine and its socket buffers, no thread.
+    """
+
+    def __init__(
+        self,
+        detection_service_getter: Callable,
+        service_ready: threading.Event,
+        tasks: ExecutorTasks,
+        config: Config,
+        frame_rings: Optional[FrameRingPool] = None
+    ):
+        """
+        @param {Callable} detection_service_getter - Function that returns detection service
+        @param {threading.Event} service_ready - Event indicating service is ready
+        @param {ExecutorTasks} tasks - Executor and AsyncServer the handlers run work on and emit with
+        @param {Config} config - Application configuration (live batching and ASGI settings)
+        @param {FrameRingPool} frame_rings - Optional shared-memory frame slots for live sessions
+        """
+        super().__init__(detection_service_getter, service_ready, tasks, config, frame_rings=frame_rings)
+        self.sio = tasks.sio
+        self.executor = tasks.executor
+        self.executor_workers = max(1, config.ASGI_EXECUTOR_WORKERS)
+        self.max_inflight = max(1, config.ASGI_MAX_INFLIGHT)
+        # `image` frames being processed or waiting for an executor thread (event loop only)
+        self.images_in_flight = 0
+        self.images_refused = 0
+
+    async def handle_image(self, sid: str, data: str) -> None:
+        """
+        Handle incoming base64 image frames from clients.
+
+        @param {str} sid - Socket.IO session id
+        @param {str} data - Base64-encoded image data
+        @emits "response_back" - Processed frame and detection results
+        """
+        try:
+            error = self.get_unavailable_error()
+            if error is not None:
+                await self.sio.emit("response_back", error, to=sid)
+                return
+
+            if self.images_in_flight >= self.max_inflight:
+                self.images_refused += 1
+                await self.sio.emit("response_back", {"error": "Server is busy, please retry"}, to=sid)
+                return
+
+            detection_service = self.get_detection_service()
+            started = time.monotonic()
+            self.images_in_flight += 1
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, detection_service.process_frame, data
+                )
+            finally:
+                self.images_in_flight -= 1
+            if not self.sessions.is_live(sid):
+                self.sessions.discard_result(sid)
+                return
+            timings = self._take_timings(sid, result)
+
+            await self.sio.emit("response_back", result, to=sid)
+            self._record_timings(sid, timings, started)
+            self._log_frame(sid, result, "image")
+
+        except Exception as e:
+            logger.error(f"Error processing frame: {str(e)}")
+            await self.sio.emit("response_back", {"error": str(e)}, to=sid)
+
+    async def handle_image_binary(self, sid: str, data: bytes) -> None:
+        """Handle incoming binary image frames; only queues the frame, inference runs on the executor."""
+        try:
+            error = self.get_unavailable_error()
+            if error is not None:
+                await self.sio.emit("response_back", error, to=sid)
+                return
+
+            if not self.submit_live_frame(sid, data):
+                await self.sio.emit("response_back", {"error": "Too many frames buffered, please retry"}, to=sid)
+
+        except Exception as e:
+            logger.error(f"Error processing binary frame: {str(e)}")
+            await self.sio.emit("response_back", {"error": str(e)}, to=sid)
+
+    async def handle_connect(self, sid: str, environ: dict, auth: Optional[dict] = None) -> None:
+        """
+        Handle client connection (same auth payload and query options as live_app).
+
+        @param {str} sid - Socket.IO session id
+        @param {dict} environ - Connection request environ (query string)
+        @param {dict} auth - Optional Socket.IO auth payload sent by the client
+        """
+        args = {key: values[0] for key, values in parse_qs(environ.get("QUERY_STRING", "")).items()}
+        status = self.register_session(sid, self.parse_session_options(auth, args))
+        await self.sio.emit("connection_status", status, to=sid)
+
+    async def handle_disconnect(self, sid: str, reason=None) -> None:
+        """Handle client disconnection."""
+        self.remove_session(sid)
+
+    def get_executor_stats(self) -> dict:
+        """Executor size and `image` concurrency counters."""
+        return {
+            "executor_workers": self.executor_workers,
+            "max_inflight": self.max_inflight,
+            "images_in_flight": self.images_in_flight,
+            "images_refused": self.images_refused
+        }
+
+
+def json_response(body: dict, status: int = 200) -> tuple:
+    return status, "application/json", json.dumps(body).encode()
+
+
+def text_response(text: str, status: int = 200, content_type: str = "text/plain") -> tuple:
+    return status, content_type, text.encode()
+
+
+def create_app(config: Config) -> tuple[socketio.ASGIApp, socketio.AsyncServer]:
+    """
+    Application factory for the ASGI server.
+
+    Serves the live Socket.IO events and the /health, /ready, /clients, /stats and
+    /metrics routes of live_app with an in-process model. /detect/batch, the admin
+    endpoints and INFERENCE_WORKERS are only available in live_app.
+
+    @param {Config} config - Application configuration
+    @return {tuple} - ASGI app (for uvicorn) and AsyncServer
+    """
+    sio = socketio.AsyncServer(
+        async_mode="asgi",
+        cors_allowed_origins=config.CORS_ALLOWED_ORIGINS,
+        max_http_buffer_size=config.MAX_HTTP_BUFFER_SIZE,
+        ping_timeout=60,
+        ping_interval=25,
+        logger=False,  # Disable verbose SocketIO logs
+        engineio_logger=False
+    )
+
+    # every decode, inference and encode of this process runs on these threads
+    executor = ThreadPoolExecutor(max_workers=max(1, config.ASGI_EXECUTOR_WORKERS), thread_name_prefix="asgi-inference")
+    tasks = ExecutorTasks(sio, executor)
+
+    if config.INFERENCE_WORKERS > 0:
+        logger.warning("INFERENCE_WORKERS is ignored by the ASGI server, the model is served in-process")
+
+    frame_rings = None
+    if config.FRAME_RING_BUDGET_MB > 0:
+        frame_rings = FrameRingPool(
+            config.FRAME_RING_BUDGET_MB,
+            slots_per_session=config.FRAME_RING_SLOTS,
+            max_side=max((config.LIVE_TARGET_SIZE,) + (config.LIVE_RESOLUTIONS if config.LIVE_ADAPTIVE else ()))
+        )
+        atexit.register(frame_rings.close)
+
+    model_registry = ModelRegistry(config)
+    model_registry.startup["import_seconds"] = round(time.perf_counter() - PROCESS_STARTED, 3)
+    service_ready = threading.Event()
+
+    def load_model() -> None:
+        """Load the model off the event loop so the server accepts connections right away."""
+        try:
+            logger.info("Loading detection model in background...")
+            model_registry.load_initial()
+            model_registry.startup["ready_seconds"] = round(time.perf_counter() - PROCESS_STARTED, 3)
+            service_ready.set()
+            logger.info(f"✓ Detection model loaded successfully! Startup timings: {model_registry.startup}")
+            if config.MODEL_WATCH_INTERVAL_S > 0:
+                model_registry.watch(config.MODEL_WATCH_INTERVAL_S)
+                logger.info(f"Watching {config.MODEL_PATH} for new weights")
+        except Exception as e:
+            logger.error(f"✗ Failed to load model: {e}")
+
+    threading.Thread(target=load_model, daemon=True).start()
+
+    handlers = AsyncSocketIOHandlers(
+        model_registry.get_service, service_ready, tasks, config, frame_rings=frame_rings
+    )
+
+    sio.on("image", handlers.handle_image)
+    sio.on("image_binary", handlers.handle_image_binary)
+    sio.on("connect", handlers.handle_connect)
+    sio.on("disconnect", handlers.handle_disconnect)
+
+    def home() -> tuple:
+        return text_response("YOLO Live Detection Server is running")
+
+    def health() -> tuple:
+        return json_response({
+            "status": "healthy",
+            "model_status": "ready" if service_ready.is_set() else "loading",
+            "model_loaded": model_registry.current is not None,
+            "model_version": model_registry.current["model_version"] if model_registry.current else None,
+            "startup": model_registry.startup,
+            "version": "1.0.0"
+        })
+
+    def ready() -> tuple:
+        is_ready = service_ready.is_set()
+        return json_response({
+            "ready": is_ready,
+            "message": "Model ready" if is_ready else "Model still loading..."
+        }, 200 if is_ready else 503)
+
+    def active_clients() -> tuple:
+        return json_response({
+            "active_clients": handlers.get_active_client_count(),
+            "status": "running"
+        })
+
+    def stats() -> tuple:
+        return json_response({
+            "batching": handlers.scheduler.get_stats(),
+            "executor": handlers.get_executor_stats(),
+            "frame_rings": frame_rings.get_stats() if frame_rings is not None else None,
+            "adaptive": handlers.controller.get_stats() if handlers.controller is not None else None,
+            "result_cache": (
+                model_registry.result_cache.get_stats() if model_registry.result_cache is not None else None
+            ),
+            "model": model_registry.get_status(),
+            "latency": handlers.metrics.get_stats() if handlers.metrics is not None else None,
+            "sessions": handlers.get_session_stats()
+        })
+
+    def metrics() -> tuple:
+        if handlers.metrics is None:
+            return text_response("latency metrics are disabled (LATENCY_METRICS=0)\n", 404)
+        return text_response(handlers.metrics.render_prometheus([
+            ("live_queue_depth", "Sessions with a frame waiting for inference.", handlers.scheduler.get_queue_depth()),
+            ("live_active_clients", "Connected Socket.IO clients.", handlers.get_active_client_count()),
+            ("live_model_ready", "1 once the model is loaded and warmed up.", int(service_ready.is_set())),
+            *session_gauges(handlers.get_session_stats())
+        ]), content_type="text/plain; version=0.0.4")
+
+    routes = {
+        "/": home,
+        "/health": health,
+        "/ready": ready,
+        "/clients": active_clients,
+        "/stats": stats,
+        "/metrics": metrics
+    }
+
+    async def http_app(scope, receive, send) -> None:
+        """Plain HTTP routes; everything under /socket.io is handled by the AsyncServer."""
+        if scope["type"] != "http":
+            return
+        route = routes.get(scope["path"].rstrip("/") or "/")
+        if route is None:
+            status, content_type, body = text_response("Not Found", 404)
+        elif scope["method"] not in ("GET", "HEAD"):
+            status, content_type, body = text_response("Method Not Allowed", 405)
+        else:
+            status, content_type, body = route()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body if scope["method"] != "HEAD" else b""})
+
+    async def announce_model_swaps() -> None:
+        """Tell connected clients when a reload switched the model (MODEL_WATCH_INTERVAL_S)."""
+        swaps = 0
+        while True:
+            await sio.sleep(1.0)
+            if model_registry.swaps != swaps:
+                swaps = model_registry.swaps
+                handlers.emit_model_changed(model_registry.current)
+
+    async def sweep_sessions() -> None:
+        """Drop per-session state left behind by sessions that disconnected mid-frame."""
+        while True:
+            await sio.sleep(config.SESSION_SWEEP_INTERVAL_S)
+            handlers.sessions.sweep()
+
+    async def on_startup() -> None:
+        tasks.loop = asyncio.get_running_loop()
+        sio.start_background_task(announce_model_swaps)
+        if config.SESSION_SWEEP_INTERVAL_S > 0:
+            sio.start_background_task(sweep_sessions)
+
+    def on_shutdown() -> None:
+        model_registry.stop()
+        executor.shutdown(wait=False, cancel_futures=True)
+        # uvicorn re-raises the stop signal once shut down, so atexit handlers may never run
+        if frame_rings is not None:
+            frame_rings.close()
+
+    app = socketio.ASGIApp(sio, other_asgi_app=http_app, on_startup=on_startup, on_shutdown=on_shutdown)
+
+    logger.info("✓ ASGI application initialized successfully (model loading in background)")
+
+    return app, sio
+
+
+def main():
+    """Main entry point of the ASGI server"""
+    import uvicorn
+
+    config = Config()
+
+    logger.info(f"Starting ASGI server on {config.HOST}:{config.PORT}")
+    logger.info("Server will start immediately, model loads in background")
+
+    app, _ = create_app(config)
+
+    uvicorn.run(
+        app,
+        host=config.HOST,
+        port=config.PORT,
+        # binary frames arrive as single websocket messages
+        ws_max_size=config.MAX_HTTP_BUFFER_SIZE,
+        log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
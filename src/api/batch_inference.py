@@ -0,0 +1,290 @@
+import json
+import logging
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+from inference_pool import InferencePool
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# Zip archives sent as a raw body are spooled here first (zip needs to seek to its central directory)
+ZIP_SPOOL_BYTES = 16 * 1024 * 1024
+
+# (name, image bytes or the reason the entry was skipped)
+UploadEntry = Tuple[str, Union[bytes, Exception]]
+
+
+def iter_archive(fileobj, name: str, max_image_bytes: int) -> Iterator[UploadEntry]:
+    """
+    Yield the images of a tar or zip archive one at a time.
+
+    Tar archives are read as a stream (`fileobj` need not be seekable), zip
+    archives need a seekable file. Entries that are not images are skipped.
+
+    @param {file} fileobj - Archive contents
+    @param {str} name - Archive name, used to tell zip from tar
+    @param {int} max_image_bytes - Larger entries are reported as errors instead of read
+    """
+    if name.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                if info.file_size > max_image_bytes:
+                    yield info.filename, ValueError(f"Image larger than {max_image_bytes} bytes")
+                    continue
+                yield info.filename, archive.read(info)
+        return
+
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile() or not member.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if member.size > max_image_bytes:
+                yield member.name, ValueError(f"Image larger than {max_image_bytes} bytes")
+                continue
+            yield member.name, archive.extractfile(member).read()
+
+
+def iter_request_images(request, max_image_bytes: int) -> Iterator[UploadEntry]:
+    """
+    Yield the images of a batch upload without loading all of it.
+
+    Accepted bodies:
+      - multipart/form-data with any number of image and/or tar/zip archive files
+        (werkzeug spools large uploads to temporary files)
+      - a raw tar (optionally compressed) body, read as a stream while inference runs
+      - a raw zip body, spooled to a temporary file first
+      - a single raw image body
+
+    @param {flask.Request} request - Incoming request
+    @param {int} max_image_bytes - Larger images are reported as errors instead of read
+    """
+    content_type = (request.mimetype or "").lower()
+
+    if content_type == "multipart/form-data":
+        for field in request.files:
+            for storage in request.files.getlist(field):
+                name = storage.filename or field
+                lower = name.lower()
+                if lower.endswith(TAR_EXTENSIONS) or lower.endswith(".zip"):
+                    yield from iter_archive(storage.stream, name, max_image_bytes)
+                    continue
+                data = storage.stream.read(max_image_bytes + 1)
+                if len(data) > max_image_bytes:
+                    yield name, ValueError(f"Image larger than {max_image_bytes} bytes")
+                    continue
+                yield name, data
+        return
+
+    if content_type in ("application/zip", "application/x-zip-compressed"):
+        with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_BYTES) as spool:
+            shutil.copyfileobj(request.stream, spool)
+            spool.seek(0)
+            yield from iter_archive(spool, "upload.zip", max_image_bytes)
+        return
+
+    if content_type in ("application/x-tar", "application/gzip", "application/x-gzip",
+                        "application/x-bzip2", "application/x-xz"):
+        yield from iter_archive(request.stream, "upload.tar", max_image_bytes)
+        return
+
+    data = request.stream.read(max_image_bytes + 1)
+    if len(data) > max_image_bytes:
+        yield "image", ValueError(f"Image larger than {max_image_bytes} bytes")
+    elif data:
+        yield "image", data
+
+
+class BatchInferenceRunner:
+    """
+    Runs uploaded image collections through the model for the HTTP batch endpoint.
+
+    Images are pulled from the upload in chunks of `batch_size` (smaller when the
+    chunk would not fit a worker's input buffer), each chunk is one forward pass, and every result is written out as one NDJSON line as soon as
+    its chunk finished. The upload is only read as fast as inference consumes it
+    (at most `max_in_flight` chunks are submitted but not yet written), so a slow
+    model or a slow reader pushes back on the client instead of buffering the
+    archive. With an inference pool, chunks run in the worker processes; without
+    one, they run in the request's own thread and the event loop gets a turn
+    between chunks so live sessions keep flowing.
+    """
+
+    def __init__(
+        self,
+        detection_service_getter: Callable,
+        pool: Optional[InferencePool] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        batch_size: int = 8,
+        max_in_flight: int = 1,
+        max_jobs: int = 2
+    ):
+        """
+        @param {Callable} detection_service_getter - Function that returns the detection service
+        @param {InferencePool} pool - Optional worker pool the chunks are run on
+        @param {Callable} sleep - Cooperative sleep (e.g. socketio.sleep)
+        @param {int} batch_size - Images per forward pass
+        @param {int} max_in_flight - Chunks of one job submitted to workers at the same time
+            (keep it below the number of workers so live batches still find an idle one)
+        @param {int} max_jobs - Batch requests served at the same time; more are refused
+        """
+        self.get_detection_service = detection_service_getter
+        self.pool = pool
+        self.sleep = sleep
+        self.batch_size = max(1, int(batch_size))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_jobs = max(1, int(max_jobs))
+        # a chunk handed to a worker has to fit its shared-memory input buffer
+        self.max_chunk_bytes = pool.buffer_size if pool is not None else None
+
+        self._lock = threading.Lock()
+        self._active_jobs = 0
+
+        # statistics
+        self._jobs = 0
+        self._images = 0
+        self._errors = 0
+
+    def try_start_job(self) -> bool:
+        """Reserve a job slot; False when `max_jobs` requests are already running."""
+        with self._lock:
+            if self._active_jobs >= self.max_jobs:
+                return False
+            self._active_jobs += 1
+            self._jobs += 1
+            return True
+
+    def finish_job(self) -> None:
+        """Release a job slot taken by `try_start_job` (once its response is closed)."""
+        with self._lock:
+            self._active_jobs -= 1
+
+    def run(
+        self,
+        entries: Iterator[UploadEntry],
+        imagesz: int = 640,
+        conf: float = 0.25,
+        annotate: bool = False
+    ) -> Iterator[str]:
+        """
+        Run an upload through the model and yield NDJSON lines.
+
+        Every image produces {"index", "name", "detections", "count", "width", "height"}
+        (plus "frame" when annotating) or {"index", "name", "error"}; the last line is
+        {"summary": {"images", "errors", "seconds"}}.
+
+        @param {Iterator} entries - (name, bytes or Exception) from iter_request_images
+        @param {int} imagesz - Inference size
+        @param {float} conf - Confidence threshold
+        @param {bool} annotate - Also return every annotated image as a base64 data URI
+        """
+        started = time.perf_counter()
+        images = errors = 0
+        # chunks submitted but not written yet: (first index, names, holder of the results)
+        pending = deque()
+        try:
+            for first_index, chunk in self._chunks(entries):
+                while len(pending) >= self.max_in_flight:
+                    for line, failed in self._write(pending.popleft()):
+                        images += 1
+                        errors += failed
+                        yield line
+                pending.append(self._submit(first_index, chunk, imagesz, conf, annotate))
+            while pending:
+                for line, failed in self._write(pending.popleft()):
+                    images += 1
+                    errors += failed
+                    yield line
+        except Exception as e:
+            logger.error(f"Batch inference aborted after {images} images: {e}")
+            yield json.dumps({"error": f"Batch aborted: {e}"}) + "\n"
+        finally:
+            with self._lock:
+                self._images += images
+                self._errors += errors
+
+        seconds = time.perf_counter() - started
+        logger.info(f"Batch inference finished: {images} images, {errors} errors in {seconds:.1f}s")
+        yield json.dumps({"summary": {"images": images, "errors": errors, "seconds": round(seconds, 3)}}) + "\n"
+
+    def get_stats(self) -> dict:
+        """Job and image counters."""
+        with self._lock:
+            return {
+                "active_jobs": self._active_jobs,
+                "max_jobs": self.max_jobs,
+                "jobs": self._jobs,
+                "images": self._images,
+                "errors": self._errors,
+                "batch_size": self.batch_size,
+                "max_in_flight": self.max_in_flight
+            }
+
+    def _chunks(self, entries: Iterator[UploadEntry]) -> Iterator[Tuple[int, List[UploadEntry]]]:
+        chunk, chunk_bytes, first_index = [], 0, 0
+        for entry in entries:
+            size = len(entry[1]) if isinstance(entry[1], bytes) else 0
+            if chunk and self.max_chunk_bytes is not None and chunk_bytes + size > self.max_chunk_bytes:
+                yield first_index, chunk
+                first_index += len(chunk)
+                chunk, chunk_bytes = [], 0
+            chunk.append(entry)
+            chunk_bytes += size
+            if len(chunk) == self.batch_size:
+                yield first_index, chunk
+                first_index += len(chunk)
+                chunk, chunk_bytes = [], 0
+        if chunk:
+            yield first_index, chunk
+
+    def _submit(self, first_index: int, chunk: List[UploadEntry], imagesz: int, conf: float, annotate: bool) -> tuple:
+        """Start (pool) or run (in-process) the inference of one chunk."""
+        names = [name for name, _ in chunk]
+        holder = {"results": [data if isinstance(data, Exception) else None for _, data in chunk]}
+        todo = [index for index, (_, data) in enumerate(chunk) if not isinstance(data, Exception)]
+        if not todo:
+            holder["done"] = True
+            return first_index, names, holder
+
+        images = [chunk[index][1] for index in todo]
+
+        def on_done(results):
+            for index, result in zip(todo, results):
+                holder["results"][index] = result
+            holder["done"] = True
+
+        if self.pool is not None:
+            # wait for an idle worker: this is where a busy pool pushes back on the upload
+            while not self.pool.submit_images(images, imagesz, conf, annotate, on_done):
+                self.sleep(0.005)
+            return first_index, names, holder
+
+        service = self.get_detection_service()
+        if service is None:
+            raise RuntimeError("Detection service not available")
+        on_done(service.detect_images(images, imagesz=imagesz, conf=conf, annotate=annotate))
+        # let live batches and socket I/O run between chunks
+        self.sleep(0)
+        return first_index, names, holder
+
+    def _write(self, submitted: tuple) -> Iterator[Tuple[str, bool]]:
+        """Wait for a chunk's results and yield (NDJSON line, failed) per image."""
+        first_index, names, holder = submitted
+        while not holder.get("done"):
+            self.sleep(0.002)
+        for offset, (name, result) in enumerate(zip(names, holder["results"])):
+            entry = {"index": first_index + offset, "name": name}
+            if isinstance(result, Exception):
+                entry["error"] = str(result)
+            else:
+                entry.update(result)
+            yield json.dumps(entry) + "\n", isinstance(result, Exception)
@@ -0,0 +1,422 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from inference_pool import InferencePool
+from frame_ring import FrameRingPool
+from adaptive_controller import AdaptiveController
+from tracker import SessionTracker
+from frame_gate import FrameGate
+from latency_metrics import LatencyMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """
+    Central micro-batching scheduler for live inference.
+
+    Every live session keeps at most one pending frame (newer frames overwrite
+    older ones). A single inference loop drains the pending frames of all
+    sessions into batches of up to `max_batch_size` images, waiting at most
+    `max_wait_ms` for a batch to fill, and hands each result back to the
+    session it came from. With an adaptive controller, sessions can run at
+    different resolutions; a batch only ever holds frames of one resolution.
+    Sessions in tracking mode (`{"tracking": True}` options) keep a
+    SessionTracker here that rides along with their frames; the other sessions
+    keep a FrameGate that lets near-duplicate frames skip inference.
+    Each result's stage timings are completed with the queue, emit and total
+    time and recorded in the latency metrics. Pending frames are bounded by
+    `max_pending_bytes` in total, and frames of sessions that closed while
+    queued or in flight are dropped instead of run or emitted.
+    """
+
+    def __init__(
+        self,
+        detection_service_getter: Callable,
+        emit_result: Callable[[str, object], None],
+        start_background_task: Callable,
+        sleep: Callable[[float], None] = time.sleep,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10,
+        target_size: int = 320,
+        pool: Optional[InferencePool] = None,
+        frame_rings: Optional[FrameRingPool] = None,
+        controller: Optional[AdaptiveController] = None,
+        tracking_interval: int = 5,
+        tracking_motion_threshold: float = 12.0,
+        gate_threshold: float = 0.0,
+        gate_max_stale_ms: float = 1000,
+        metrics: Optional[LatencyMetrics] = None,
+        max_pending_bytes: int = 0,
+        session_active: Optional[Callable[[str], bool]] = None
+    ):
+        """
+        Initialize the scheduler.
+
+        @param {Callable} detection_service_getter - Function that returns detection service
+        @param {Callable} emit_result - Called as emit_result(sid, result) for every processed frame;
+            result is the response dict or the Exception raised for that frame
+        @param {Callable} start_background_task - Starts the inference loop (e.g. socketio.start_background_task)
+        @param {Callable} sleep - Cooperative sleep used while a batch fills (e.g. socketio.sleep)
+        @param {int} max_batch_size - Maximum number of frames per forward pass
+        @param {float} max_wait_ms - Maximum time the oldest pending frame waits for the batch to fill
+        @param {int} target_size - Longest side used for live inference (when no controller is set)
+        @param {InferencePool} pool - Optional worker pool; batches then run in worker processes
+            and a new batch is only formed once a worker is idle
+        @param {FrameRingPool} frame_rings - Optional per-session shared-memory frame slots;
+            each frame is resized into a slot of its session's ring instead of a fresh array
+        @param {AdaptiveController} controller - Optional per-session resolution/rate controller;
+            it picks each session's inference size and is fed every frame's latency
+        @param {int} tracking_interval - Tracking mode: run detection at least every N frames
+        @param {float} tracking_motion_threshold - Tracking mode: thumbnail difference forcing detection
+        @param {float} gate_threshold - Thumbnail difference under which a frame reuses the session's
+            last detections (0 disables the frame gate)
+        @param {float} gate_max_stale_ms - Maximum age of detections reused by the frame gate
+        @param {LatencyMetrics} metrics - Optional per-stage latency histograms fed with every frame;
+            sessions with the `{"timings": True}` option also get their frame's timings in the result
+        @param {int} max_pending_bytes - Cap on the bytes of all pending frames; frames past it
+            are refused (0 disables the cap)
+        @param {Callable} session_active - Returns whether a session is still connected; frames of
+            closed sessions are cancelled before inference and their results discarded
+        """
+        self.get_detection_service = detection_service_getter
+        self.emit_result = emit_result
+        self.start_background_task = start_background_task
+        self.sleep = sleep
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.target_size = target_size
+        self.pool = pool
+        self.frame_rings = frame_rings
+        self.controller = controller
+        self.tracking_interval = tracking_interval
+        self.tracking_motion_threshold = tracking_motion_threshold
+        self.gate_threshold = gate_threshold
+        self.gate_max_stale_ms = gate_max_stale_ms
+        self.metrics = metrics
+        self.max_pending_bytes = max(0, int(max_pending_bytes))
+        self.session_active = session_active
+
+        # sid -> (frame bytes, time the session's pending slot was filled, session options)
+        self._pending: "OrderedDict[str, Tuple[bytes, float, dict]]" = OrderedDict()
+        self._pending_bytes = 0
+        # sessions with a frame being inferred; their next frame waits (and coalesces) in
+        # _pending until it is done, so results stay in order and tracker/gate updates chain
+        self._in_flight: Set[str] = set()
+        self._lock = threading.Lock()
+        self._running = False
+        # sid -> tracker of sessions in tracking mode
+        self._trackers: Dict[str, SessionTracker] = {}
+        # sid -> near-duplicate gate of the other sessions
+        self._gates: Dict[str, FrameGate] = {}
+        # hits/misses of gates whose session already ended
+        self._gate_hits = 0
+        self._gate_misses = 0
+
+        # statistics
+        self._frames_submitted = 0
+        self._frames_superseded = 0
+        self._frames_refused = 0
+        self._frames_cancelled = 0
+        self._results_discarded = 0
+        self._frames_processed = 0
+        self._batches = 0
+        self._batch_size_counts: Dict[int, int] = {}
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._total_inference = 0.0
+        self._last_batch_ms = 0.0
+
+    def submit(self, sid: str, frame: bytes, options: Optional[dict] = None) -> bool:
+        """
+        Queue the latest frame of a session, replacing any frame still pending for it.
+
+        @param {str} sid - Socket.IO session id the result is sent back to
+        @param {bytes} frame - Raw encoded image bytes
+        @param {dict} options - Session options forwarded to the detection service (e.g. protocol)
+        @return {bool} - False if the frame was refused because pending frames are over `max_pending_bytes`
+        """
+        options = options or {}
+        with self._lock:
+            previous = self._pending.get(sid)
+            added = len(frame) - (len(previous[0]) if previous is not None else 0)
+            if self.max_pending_bytes and added > 0 and self._pending_bytes + added > self.max_pending_bytes:
+                self._frames_refused += 1
+                return False
+            self._pending_bytes += added
+            self._frames_submitted += 1
+            superseded = previous is not None
+            if superseded:
+                # keep the session's place in line, only the frame is replaced
+                self._frames_superseded += 1
+                self._pending[sid] = (frame, self._pending[sid][1], options)
+            else:
+                self._pending[sid] = (frame, time.monotonic(), options)
+            self._max_queue_depth = max(self._max_queue_depth, len(self._pending))
+            start = not self._running
+            self._running = True
+
+        if self.controller is not None:
+            self.controller.on_submit(sid, superseded)
+        if not start:
+            return True
+
+        try:
+            self.start_background_task(self._run)
+        except Exception as e:
+            with self._lock:
+                self._running = False
+            logger.error(f"Failed to start batch scheduler: {e}")
+        return True
+
+    def remove_session(self, sid: str) -> None:
+        """Drop the frame still pending for a session and its tracker/gate (e.g. on disconnect)."""
+        with self._lock:
+            pending = self._pending.pop(sid, None)
+            if pending is not None:
+                self._pending_bytes -= len(pending[0])
+            self._in_flight.discard(sid)
+            self._trackers.pop(sid, None)
+            gate = self._gates.pop(sid, None)
+            if gate is not None:
+                self._gate_hits += gate.hits
+                self._gate_misses += gate.misses
+
+    def get_session_ids(self) -> set:
+        """Sessions with a pending frame, a tracker or a frame gate here."""
+        with self._lock:
+            return set(self._pending) | set(self._trackers) | set(self._gates)
+
+    def get_queue_depth(self) -> int:
+        """Get number of sessions with a frame waiting for inference."""
+        return len(self._pending)
+
+    def get_buffered_bytes(self) -> int:
+        """Get the bytes of all frames waiting for inference."""
+        return self._pending_bytes
+
+    def get_stats(self) -> dict:
+        """Get queue depth and batch-fill statistics for tuning."""
+        with self._lock:
+            batches = self._batches
+            processed = self._frames_processed
+            trackers = list(self._trackers.values())
+            gate_hits = self._gate_hits + sum(g.hits for g in self._gates.values())
+            gate_misses = self._gate_misses + sum(g.misses for g in self._gates.values())
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": len(self._pending),
+                "max_queue_depth": self._max_queue_depth,
+                "buffered_bytes": self._pending_bytes,
+                "max_buffered_bytes": self.max_pending_bytes,
+                "frames_submitted": self._frames_submitted,
+                "frames_superseded": self._frames_superseded,
+                "frames_refused": self._frames_refused,
+                "frames_cancelled": self._frames_cancelled,
+                "results_discarded": self._results_discarded,
+                "frames_processed": processed,
+                "batches": batches,
+                "avg_batch_size": processed / batches if batches else 0.0,
+                "avg_batch_fill": processed / (batches * self.max_batch_size) if batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_size_counts.items())},
+                "avg_wait_ms": self._total_wait * 1000.0 / processed if processed else 0.0,
+                "avg_batch_inference_ms": self._total_inference * 1000.0 / batches if batches else 0.0,
+                "last_batch_inference_ms": self._last_batch_ms,
+                "tracking": {
+                    "sessions": len(trackers),
+                    "detected_frames": sum(t.detected_frames for t in trackers),
+                    "propagated_frames": sum(t.propagated_frames for t in trackers)
+                },
+                "frame_gate": {
+                    "threshold": self.gate_threshold,
+                    "max_stale_ms": self.gate_max_stale_ms,
+                    "sessions": len(self._gates),
+                    "hits": gate_hits,
+                    "misses": gate_misses,
+                    "hit_rate": gate_hits / (gate_hits + gate_misses) if gate_hits + gate_misses else 0.0
+                }
+            }
+
+    def _run(self) -> None:
+        """Inference loop; exits once no session has a pending frame."""
+        while True:
+            if self.pool is not None and not self.pool.has_idle_worker():
+                # frames keep coalescing per session while every worker is busy
+                with self._lock:
+                    if not self._pending:
+                        self._running = False
+                        return
+                self.sleep(0.001)
+                continue
+            batch, target_size = self._collect_batch()
+            if not batch:
+                return
+            self._process_batch(batch, target_size)
+
+    def _collect_batch(self) -> Tuple[List[Tuple[str, bytes, float, dict]], int]:
+        """
+        Wait for the batch to fill (or the oldest frame to time out) and take it.
+
+        @return {Tuple} - (batch, inference size shared by every frame of the batch)
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return [], self.target_size
+                # sessions whose previous frame is still being inferred (worker mode) wait
+                sids = [sid for sid in self._pending if sid not in self._in_flight]
+                oldest = self._pending[sids[0]][1] if sids else time.monotonic()
+                remaining = oldest + self.max_wait - time.monotonic()
+                if sids and (len(sids) >= self.max_batch_size or remaining <= 0):
+                    # the oldest session decides the batch resolution; others at that size join it
+                    target_size = self._get_target_size(sids[0])
+                    batch = []
+                    for sid in sids:
+                        if len(batch) >= self.max_batch_size:
+                            break
+                        if self._get_target_size(sid) != target_size:
+                            continue
+                        frame, enqueued_at, options = self._pending.pop(sid)
+                        self._pending_bytes -= len(frame)
+                        self._in_flight.add(sid)
+                        batch.append((sid, frame, enqueued_at, options))
+                    return batch, target_size
+            self.sleep(max(0.0, min(remaining, 0.001)))
+
+    def _get_target_size(self, sid: str) -> int:
+        if self.controller is None:
+            return self.target_size
+        return self.controller.get_target_size(sid)
+
+    def _get_tracker(self, sid: str) -> SessionTracker:
+        with self._lock:
+            tracker = self._trackers.get(sid)
+            if tracker is None:
+                tracker = self._trackers[sid] = SessionTracker(
+                    self.tracking_interval, self.tracking_motion_threshold
+                )
+            return tracker
+
+    def _get_gate(self, sid: str) -> FrameGate:
+        with self._lock:
+            gate = self._gates.get(sid)
+            if gate is None:
+                gate = self._gates[sid] = FrameGate(self.gate_threshold, self.gate_max_stale_ms)
+            return gate
+
+    def _process_batch(self, batch: List[Tuple[str, bytes, float, dict]], target_size: int) -> None:
+        """Run one batched forward pass and route every result to its session."""
+        if self.session_active is not None:
+            # sessions that closed since their frame was queued
+            live = [entry for entry in batch if self.session_active(entry[0])]
+            if len(live) < len(batch):
+                with self._lock:
+                    self._frames_cancelled += len(batch) - len(live)
+                    self._in_flight.difference_update({sid for sid, _, _, _ in batch} - {sid for sid, _, _, _ in live})
+                batch = live
+            if not batch:
+                return
+        started = time.monotonic()
+        frames = [frame for _, frame, _, _ in batch]
+        options = [options for _, _, _, options in batch]
+        slots = [self.frame_rings.acquire(sid) if self.frame_rings is not None else None for sid, _, _, _ in batch]
+        trackers = [self._get_tracker(sid) if opts.get("tracking") else None for sid, _, _, opts in batch]
+        gates = [
+            self._get_gate(sid) if tracker is None and self.gate_threshold > 0 else None
+            for (sid, _, _, _), tracker in zip(batch, trackers)
+        ]
+
+        if self.pool is not None:
+            submitted = self.pool.submit_batch(
+                frames, options, target_size,
+                lambda results, updated_trackers=None, updated_gates=None: self._finish_batch(
+                    batch, results, started, slots, updated_trackers, updated_gates
+                ),
+                slots=slots,
+                trackers=trackers,
+                gates=gates
+            )
+            if not submitted:
+                self._finish_batch(batch, [RuntimeError("No inference worker available")] * len(batch), started, slots)
+            return
+
+        detection_service = self.get_detection_service()
+        try:
+            if detection_service is None:
+                raise RuntimeError("Detection service not available")
+            results = detection_service.process_frames_bytes_live_batch(
+                frames, target_size=target_size, options=options, slots=slots, trackers=trackers, gates=gates
+            )
+        except Exception as e:
+            logger.error(f"Batch inference failed for {len(batch)} frames: {e}")
+            results = [e] * len(batch)
+        self._finish_batch(batch, results, started, slots)
+
+    def _finish_batch(
+        self,
+        batch: List[Tuple[str, bytes, float, dict]],
+        results: List,
+        started: float,
+        slots: Optional[List] = None,
+        trackers: Optional[List[Optional[SessionTracker]]] = None,
+        gates: Optional[List[Optional[FrameGate]]] = None
+    ) -> None:
+        """
+        Record batch statistics, route every result to its session and free its frame slots.
+
+        `trackers` and `gates` are the session states returned by a worker process; they
+        replace the scheduler's copies unless a newer frame of the session already updated them.
+        """
+        elapsed = time.monotonic() - started
+
+        with self._lock:
+            for states, updated in ((self._trackers, trackers), (self._gates, gates)):
+                for (sid, _, _, _), state in zip(batch, updated or []):
+                    current = states.get(sid)
+                    if state is not None and current is not None and state.frames > current.frames:
+                        states[sid] = state
+            size = len(batch)
+            self._batches += 1
+            self._frames_processed += size
+            self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+            self._total_wait += sum(started - enqueued_at for _, _, enqueued_at, _ in batch)
+            self._total_inference += elapsed
+            self._last_batch_ms = elapsed * 1000.0
+
+        for (sid, _, enqueued_at, options), result in zip(batch, results):
+            if self.session_active is not None and not self.session_active(sid):
+                # the session closed while its frame was in flight: nobody is left to receive it
+                with self._lock:
+                    self._results_discarded += 1
+                continue
+            timings = result.pop("timings", None) if isinstance(result, dict) else None
+            if timings is not None:
+                timings["queue"] = (started - enqueued_at) * 1000.0
+                if options.get("timings"):
+                    attached = dict(timings, total=(time.monotonic() - enqueued_at) * 1000.0)
+                    result["timings"] = {stage: round(ms, 3) for stage, ms in attached.items()}
+            emitting = time.monotonic()
+            try:
+                self.emit_result(sid, result)
+            except Exception as e:
+                logger.error(f"Failed to emit live result to {sid}: {e}")
+            if timings is not None and self.metrics is not None:
+                now = time.monotonic()
+                timings["emit"] = (now - emitting) * 1000.0
+                timings["total"] = (now - enqueued_at) * 1000.0
+                self.metrics.observe(sid, timings)
+            if self.controller is not None and not isinstance(result, Exception):
+                self.controller.on_result(
+                    sid, time.monotonic() - enqueued_at, len(self._pending), self.max_batch_size
+                )
+
+        if self.frame_rings is not None and slots:
+            for (sid, _, _, _), slot in zip(batch, slots):
+                self.frame_rings.release(sid, slot)
+        # only now may the sessions' next frames be collected
+        with self._lock:
+            self._in_flight.difference_update(sid for sid, _, _, _ in batch)
@@ -19,6 +19,29 @@ class Config:
     ASYNC_MODE: str = "eventlet"
     MAX_HTTP_BUFFER_SIZE: int = 100_000_000 # 100mb
 
+    # ASGI Server Settings (asgi_app.py: uvicorn + python-socketio, no eventlet)
+    # Decoding, inference and encoding run on ASGI_EXECUTOR_WORKERS threads and the event
+    # loop only does socket I/O. The live batch loop holds one of those threads while
+    # frames are pending. At most ASGI_MAX_INFLIGHT `image` frames are processed or wait
+    # for a thread at once; further ones are answered with a busy error.
+    ASGI_EXECUTOR_WORKERS: int = int(os.getenv("ASGI_EXECUTOR_WORKERS", 2))
+    ASGI_MAX_INFLIGHT: int = int(os.getenv("ASGI_MAX_INFLIGHT", 4))
+
+    # Scale-out Settings
+    # SOCKETIO_MESSAGE_QUEUE (e.g. redis://redis:6379/0) connects several live_app
+    # processes (gunicorn workers behind sticky sessions, or hosts) so each can emit to
+    # the others' clients. SESSION_STORE_URL keeps the connected sessions in Redis too
+    # ("memory://" keeps them in this process). With LIVE_WORK_QUEUE (a Redis URL) the
+    # front ends load no model: live and `image` frames are queued there and served by
+    # inference nodes (src/api/inference_node.py), which emit the results through
+    # SOCKETIO_MESSAGE_QUEUE. Queued frames expire after LIVE_QUEUE_TTL_S, and so do the
+    # session claims of an inference node that died mid-batch (live nodes refresh theirs
+    # every 2 s, keep it above that). Session tracker state is kept in Redis as JSON.
+    SOCKETIO_MESSAGE_QUEUE: str = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+    SESSION_STORE_URL: str = os.getenv("SESSION_STORE_URL", "memory://")
+    LIVE_WORK_QUEUE: str = os.getenv("LIVE_WORK_QUEUE", "")
+    LIVE_QUEUE_TTL_S: float = float(os.getenv("LIVE_QUEUE_TTL_S", 10))
+
     # Model Settings
     # In containerized deployments we expect the model to be mounted at /app/model/best.pt
     MODEL_PATH: str = os.getenv(
@@ -26,6 +49,30 @@ class Config:
         r"C:\Users\itz_n\OneDrive\Desktop\Microsoft-Hackathon\Jenji\runs\yolov11_experiment_01\weights\best.pt"
     )
 
+    # Inference backend: "auto" picks it from MODEL_PATH (.pt -> pytorch, .torchscript,
+    # .onnx, *_openvino_model). "onnx", "openvino" or "torchscript" with a .pt MODEL_PATH
+    # exports the weights once next to the .pt file and loads the exported model.
+    # "synthetic" serves random boxes without loading MODEL_PATH (benchmarks, see
+    # SYNTHETIC_DETECTIONS / SYNTHETIC_LATENCY_MS / SYNTHETIC_PER_IMAGE_MS).
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "auto")
+    # Quantized variant of the .pt weights to serve: "fp32", "fp16", "int8_dynamic" or
+    # "int8_static" (produced by src/training/quantize.py). Empty serves MODEL_PATH as is.
+    MODEL_VARIANT: str = os.getenv("MODEL_VARIANT", "")
+
+    # Warm-up Settings
+    # Before /ready reports 200 (and before a swapped-in model serves), the model runs
+    # on blank frames at every live resolution, alone and as a BATCH_MAX_SIZE batch.
+    MODEL_WARMUP: bool = os.getenv("MODEL_WARMUP", "1").lower() in ("1", "true", "yes")
+
+    # Model Swap Settings
+    # New weights are loaded and warmed up next to the serving model and swapped in
+    # between batches (POST /admin/model/reload, /admin/model/rollback). With
+    # MODEL_WATCH_INTERVAL_S > 0, replacing the file at MODEL_PATH triggers a reload.
+    # Admin endpoints require the X-Admin-Token header to match ADMIN_TOKEN; when it is
+    # empty they only answer requests from localhost.
+    MODEL_WATCH_INTERVAL_S: float = float(os.getenv("MODEL_WATCH_INTERVAL_S", 0))
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
     # Detection Settings
     BBOX_COLOR: tuple = (0, 255, 0) # Green
     BBOX_THICKNES: int = 2
@@ -33,5 +80,115 @@ class Config:
     FONT_THICKNESS: int = 1
 
     # Image Settings
+    # JPEGs are decoded/encoded with libjpeg-turbo (PyTurboJPEG) when it is installed and
+    # with OpenCV otherwise (JPEG_CODEC: "auto", "turbojpeg" or "opencv"). Live frames are
+    # reduced 1/2, 1/4 or 1/8 while decoding. Encoded frames use IMAGE_QUALITY and
+    # JPEG_SUBSAMPLING ("444", "422", "420" or "gray"); JPEG_FAST_DCT trades a little
+    # accuracy for speed in both directions (turbojpeg only).
     IMAGE_ENCODING: str = ".jpg"
-    IMAGE_QUALITY: int  = 90
\ No newline at end of file
+    IMAGE_QUALITY: int  = int(os.getenv("IMAGE_QUALITY", 90))
+    JPEG_CODEC: str = os.getenv("JPEG_CODEC", "auto")
+    JPEG_SUBSAMPLING: str = os.getenv("JPEG_SUBSAMPLING", "420")
+    JPEG_FAST_DCT: bool = os.getenv("JPEG_FAST_DCT", "0").lower() in ("1", "true", "yes")
+
+    # Live Batching Settings
+    # Frames from all live sessions are merged into one forward pass of up to
+    # BATCH_MAX_SIZE images, waiting at most BATCH_MAX_WAIT_MS for the batch to fill.
+    LIVE_TARGET_SIZE: int = int(os.getenv("LIVE_TARGET_SIZE", 320))
+    BATCH_MAX_SIZE: int = int(os.getenv("BATCH_MAX_SIZE", 8))
+    BATCH_MAX_WAIT_MS: float = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+
+    # Adaptive Live Settings
+    # With LIVE_ADAPTIVE on, each session's inference size moves between
+    # LIVE_RESOLUTIONS (starting at LIVE_TARGET_SIZE) to keep its end-to-end latency
+    # near LIVE_TARGET_LATENCY_MS, and clients get the send rate to use through the
+    # `rate_hint` event (between LIVE_MIN_FPS and LIVE_MAX_FPS).
+    LIVE_ADAPTIVE: bool = os.getenv("LIVE_ADAPTIVE", "1").lower() in ("1", "true", "yes")
+    LIVE_RESOLUTIONS: tuple = tuple(
+        int(size) for size in os.getenv("LIVE_RESOLUTIONS", "256,320,416,640").split(",") if size.strip()
+    )
+    LIVE_TARGET_LATENCY_MS: float = float(os.getenv("LIVE_TARGET_LATENCY_MS", 150))
+    LIVE_MIN_FPS: float = float(os.getenv("LIVE_MIN_FPS", 2))
+    LIVE_MAX_FPS: float = float(os.getenv("LIVE_MAX_FPS", 30))
+
+    # Tracking Settings
+    # In tracking mode (LIVE_TRACKING, or per client with `{"tracking": true}` at connect)
+    # full detection only runs every TRACKING_DETECT_INTERVAL frames or when the frame
+    # changed more than TRACKING_MOTION_THRESHOLD (mean grey-level difference of a
+    # thumbnail); in between, tracked boxes are propagated and keep stable track ids.
+    LIVE_TRACKING: bool = os.getenv("LIVE_TRACKING", "0").lower() in ("1", "true", "yes")
+    TRACKING_DETECT_INTERVAL: int = int(os.getenv("TRACKING_DETECT_INTERVAL", 5))
+    TRACKING_MOTION_THRESHOLD: float = float(os.getenv("TRACKING_MOTION_THRESHOLD", 12.0))
+
+    # Latency Instrumentation Settings
+    # Every frame's decode/inference/postprocess/draw/encode/queue/emit time is kept in
+    # rolling per-stage histograms (overall and per session), served on /metrics in the
+    # Prometheus text format. Clients that connect with `{"timings": true}` (or all
+    # clients with LIVE_TIMINGS) also receive their frame's timings in each result.
+    LATENCY_METRICS: bool = os.getenv("LATENCY_METRICS", "1").lower() in ("1", "true", "yes")
+    LATENCY_WINDOW: int = int(os.getenv("LATENCY_WINDOW", 512))
+    LIVE_TIMINGS: bool = os.getenv("LIVE_TIMINGS", "0").lower() in ("1", "true", "yes")
+
+    # Logging Settings
+    # Log records go through a bounded queue (LOG_QUEUE_SIZE, records beyond it are
+    # dropped) and are written by a background thread, as text or one JSON object per
+    # line (LOG_FORMAT=json). Per-frame INFO logs are sampled 1 in LOG_SAMPLE_EVERY;
+    # warnings/errors are limited to LOG_ERROR_BURST per call site every LOG_ERROR_INTERVAL_S.
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+    LOG_SAMPLE_EVERY: int = int(os.getenv("LOG_SAMPLE_EVERY", 100))
+    LOG_ERROR_BURST: int = int(os.getenv("LOG_ERROR_BURST", 5))
+    LOG_ERROR_INTERVAL_S: float = float(os.getenv("LOG_ERROR_INTERVAL_S", 10))
+
+    # Frame Gate Settings
+    # Outside tracking mode, a live frame whose thumbnail differs from the session's last
+    # inferred frame by at most FRAME_GATE_THRESHOLD (mean grey-level difference) reuses
+    # its detections, for at most FRAME_GATE_MAX_STALE_MS. 0 disables the gate.
+    FRAME_GATE_THRESHOLD: float = float(os.getenv("FRAME_GATE_THRESHOLD", 2.0))
+    FRAME_GATE_MAX_STALE_MS: float = float(os.getenv("FRAME_GATE_MAX_STALE_MS", 1000))
+
+    # Inference Worker Settings
+    # With INFERENCE_WORKERS > 0, decoding, inference and encoding run in that many
+    # separate processes (each loading the model once) and the Socket.IO process only
+    # does I/O. Frames are handed over through a per-worker shared-memory buffer.
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", 0))
+    WORKER_INPUT_BUFFER_MB: float = float(os.getenv("WORKER_INPUT_BUFFER_MB", 16))
+
+    # Session Lifecycle Settings
+    # Frames waiting for inference (at most one per live session) may hold at most
+    # LIVE_MAX_BUFFERED_MB in total; frames past it are refused with an error (0 = no cap).
+    # Every SESSION_SWEEP_INTERVAL_S, per-session state left behind by sessions that
+    # disconnected while their frame was in flight is dropped (0 disables the sweep).
+    LIVE_MAX_BUFFERED_MB: float = float(os.getenv("LIVE_MAX_BUFFERED_MB", 128))
+    SESSION_SWEEP_INTERVAL_S: float = float(os.getenv("SESSION_SWEEP_INTERVAL_S", 30))
+
+    # Frame Ring Settings
+    # Live frames are resized straight into preallocated per-session shared-memory
+    # slots (FRAME_RING_SLOTS per session, sized for the largest live resolution) that are
+    # reused across frames and sessions. FRAME_RING_BUDGET_MB caps the memory of all
+    # rings; past it frames fall back to ordinary arrays. 0 disables the rings.
+    FRAME_RING_BUDGET_MB: float = float(os.getenv("FRAME_RING_BUDGET_MB", 64))
+    FRAME_RING_SLOTS: int = int(os.getenv("FRAME_RING_SLOTS", 2))
+
+    # Batch Inference Settings
+    # POST /detect/batch runs many images (multipart files, or a tar/zip archive) through
+    # the model in chunks of BATCH_INFER_SIZE and streams one NDJSON line per image.
+    # At most BATCH_INFER_MAX_IN_FLIGHT chunks per request are handed to inference workers
+    # at once (keep it below INFERENCE_WORKERS so live batches still get a worker) and at
+    # most BATCH_INFER_MAX_JOBS requests run at the same time (others get 429).
+    BATCH_INFER_SIZE: int = int(os.getenv("BATCH_INFER_SIZE", 8))
+    BATCH_INFER_IMGSZ: int = int(os.getenv("BATCH_INFER_IMGSZ", 640))
+    BATCH_INFER_MAX_IN_FLIGHT: int = int(os.getenv("BATCH_INFER_MAX_IN_FLIGHT", 1))
+    BATCH_INFER_MAX_JOBS: int = int(os.getenv("BATCH_INFER_MAX_JOBS", 2))
+    BATCH_INFER_MAX_IMAGE_MB: float = float(os.getenv("BATCH_INFER_MAX_IMAGE_MB", 32))
+
+    # Result Cache Settings
+    # Still-image results (`image` event, ModelLoader.predict_bytes) are cached by a hash
+    # of the raw payload + imgsz/conf + model version. With RESULT_CACHE_FRAMES the
+    # annotated JPEG is cached too, so repeated images are never decoded.
+    # RESULT_CACHE_ENTRIES=0 disables the cache.
+    RESULT_CACHE_ENTRIES: int = int(os.getenv("RESULT_CACHE_ENTRIES", 512))
+    RESULT_CACHE_MB: float = float(os.getenv("RESULT_CACHE_MB", 64))
+    RESULT_CACHE_TTL_S: float = float(os.getenv("RESULT_CACHE_TTL_S", 600))
+    RESULT_CACHE_FRAMES: bool = os.getenv("RESULT_CACHE_FRAMES", "1").lower() in ("1", "true", "yes")
\ No newline at end of file
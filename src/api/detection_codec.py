@@ -0,0 +1,77 @@
+import struct
+import numpy as np
+from typing import Dict
+from detections import Detections
+
+# Packed detections layout (little-endian):
+#   header  : magic "JDET" (4s), version (B), reserved (3x), count N (I)
+#   boxes   : N * 4 float32  [x1, y1, x2, y2]
+#   scores  : N float32      confidence
+#   classes : N uint8        class id
+#   tracks  : N int32        track id (version 2 only, i.e. tracked detections)
+PACKED_MAGIC = b"JDET"
+PACKED_VERSION = 1
+PACKED_VERSION_TRACKED = 2
+_HEADER = struct.Struct("<4sB3xI")
+
+
+def pack_detections(detections) -> bytes:
+    """
+    Pack detections into the compact binary layout used by the binary protocol.
+
+    @param {Detections|List[Dict]} detections - Columnar detections (packed straight from
+        their arrays) or legacy detection dictionaries as returned by ModelLoader
+    @return {bytes} - Header followed by float32 boxes, float32 scores and uint8 class ids
+        (and int32 track ids for tracked detections)
+    """
+    tracks = None
+    if isinstance(detections, Detections):
+        boxes = detections.xyxy.astype("<f4", copy=False)
+        scores = detections.confidence.astype("<f4", copy=False)
+        classes = detections.class_id.astype(np.uint8)
+        if detections.track_id is not None:
+            tracks = detections.track_id.astype("<i4", copy=False)
+    else:
+        boxes = np.array([det.get("bbox", (0.0, 0.0, 0.0, 0.0)) for det in detections], dtype="<f4").reshape(-1, 4)
+        scores = np.array([det.get("confidence", 0.0) for det in detections], dtype="<f4")
+        classes = np.array([det.get("class_Id", 0) for det in detections], dtype=np.uint8)
+
+    parts = [
+        _HEADER.pack(PACKED_MAGIC, PACKED_VERSION if tracks is None else PACKED_VERSION_TRACKED, len(scores)),
+        boxes.tobytes(),
+        scores.tobytes(),
+        classes.tobytes()
+    ]
+    if tracks is not None:
+        parts.append(tracks.tobytes())
+    return b"".join(parts)
+
+
+def unpack_detections(payload: bytes) -> Dict[str, np.ndarray]:
+    """
+    Decode a packed detections payload (reference implementation for clients and tools).
+
+    @param {bytes} payload - Bytes produced by `pack_detections`
+    @return {Dict[str, np.ndarray]} - "bbox" (N, 4), "confidence" (N,) and "class_id" (N,) arrays,
+        plus "track_id" (N,) for tracked detections
+    @raises {ValueError} - If the payload is not a packed detections buffer
+    """
+    if len(payload) < _HEADER.size:
+        raise ValueError("Packed detections payload is truncated")
+
+    magic, version, count = _HEADER.unpack_from(payload, 0)
+    if magic != PACKED_MAGIC or version not in (PACKED_VERSION, PACKED_VERSION_TRACKED):
+        raise ValueError("Unsupported packed detections payload")
+
+    offset = _HEADER.size
+    boxes = np.frombuffer(payload, dtype="<f4", count=count * 4, offset=offset).reshape(count, 4)
+    offset += count * 16
+    scores = np.frombuffer(payload, dtype="<f4", count=count, offset=offset)
+    offset += count * 4
+    classes = np.frombuffer(payload, dtype=np.uint8, count=count, offset=offset)
+    offset += count
+
+    unpacked = {"bbox": boxes, "confidence": scores, "class_id": classes}
+    if version == PACKED_VERSION_TRACKED:
+        unpacked["track_id"] = np.frombuffer(payload, dtype="<i4", count=count, offset=offset)
+    return unpacked
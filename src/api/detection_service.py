@@ -1,66 +1,139 @@
+import logging
+import time
 import numpy as np
 import cv2
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from model_loader import ModelLoader
 from detection_visuallizer import DetectionVisualizer
 from image_processor import ImageProcessor
+from jpeg_codec import JpegCodec
+from detection_codec import pack_detections
+from detections import Detections
+from frame_ring import FrameSlot
+from tracker import SessionTracker
+from frame_gate import FrameGate
+from result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
 
 
 class DetectionService:
     """Service layer for object detection operations."""
+
+    # inference size and confidence of `image` requests (process_frame), part of their cache key
+    image_imgsz: int = 320
+    image_conf: float = 0.25
     
-    def __init__(self, model_path: str):
+    def __init__(
+        self,
+        model_path: str,
+        backend: str = "auto",
+        variant: Optional[str] = None,
+        result_cache: Optional[ResultCache] = None,
+        cache_frames: bool = True,
+        codec: Optional[JpegCodec] = None
+    ):
         """
         Initialize detection service with YOLO model.
         
         @param {str} model_path - Path to YOLO model weights
+        @param {str} backend - Inference backend passed to ModelLoader (see Config.INFERENCE_BACKEND)
+        @param {str} variant - Quantized model variant passed to ModelLoader (see Config.MODEL_VARIANT)
+        @param {ResultCache} result_cache - Optional cache for repeated still images (`image` event, predict_bytes)
+        @param {bool} cache_frames - Also cache the annotated JPEG, so hits skip decoding entirely
+        @param {JpegCodec} codec - JPEG codec for decoding and encoding frames (see create_jpeg_codec)
         """
-        self.model = ModelLoader(model_path)
+        self.model = ModelLoader(model_path, backend=backend, variant=variant, result_cache=result_cache)
+        self.cache_frames = cache_frames
         self.visualizer = DetectionVisualizer()
-        self.image_processor = ImageProcessor()
+        self.image_processor = ImageProcessor(codec)
     
+    def warmup(self, sizes: Tuple[int, ...] = (320,), batch_size: int = 1) -> float:
+        """
+        Run the model on blank frames at every inference size (alone and as a full
+        batch) and encode one result, so the first real frames do not pay for lazy
+        backend initialization, layer fusing and first buffer allocations.
+
+        @param {Tuple[int, ...]} sizes - Inference sizes to warm up
+        @param {int} batch_size - Largest live batch (BATCH_MAX_SIZE)
+        @return {float} - Seconds spent warming up
+        """
+        started = time.perf_counter()
+        for size in sizes:
+            blank = np.zeros((size, size, 3), dtype=np.uint8)
+            self.model.detect(blank, imagesz=size)
+            if batch_size > 1:
+                self.model.detect_batch([blank] * batch_size, imagesz=size)
+        if sizes:
+            self.image_processor.encode_image_to_bytes(blank, quality=80)
+        return time.perf_counter() - started
+
     def process_frame(self, base64_data: str) -> Dict:
         """
         Process a single frame: decode, detect, annotate, encode.
         
+        Repeated images are served from the result cache: with cached frames the
+        stored response is returned as is, otherwise only inference is skipped.
+        
         @param {str} base64_data - Base64-encoded image data
         @return {Dict} - Processed result with frame and detections
         @raises {Exception} - If processing fails
         """
         try:
+            cache = self.model.result_cache
+            cached, key = None, None
+            if cache is not None:
+                key = ResultCache.make_key(
+                    base64_data, self.image_imgsz, self.image_conf, self.model.model_version, kind="image"
+                )
+                cached = cache.get(key)
+                if cached is not None and cached["frame"] is not None:
+                    detections = cached["detections"]
+                    return {"frame": cached["frame"], "detections": detections.to_list(), "count": len(detections)}
+
             #  Decode image
+            timings = {}
+            started = time.perf_counter()
             frame = self.image_processor.decode_base64_image(base64_data)
+            started = _lap(timings, "decode", started)
             
             # Validate decoded frame
             if frame is None or frame.size == 0:
                 raise ValueError("Decoded frame is empty")
             
-            print(f"Frame decoded successfully: shape={frame.shape}, dtype={frame.dtype}")
+            # per-frame detail: debug only, with lazy arguments so it costs nothing when disabled
+            logger.debug("Frame decoded: shape=%s, dtype=%s", frame.shape, frame.dtype)
             
             #  Run detection
-            result = self.model.predict_ndarray(frame)
-            detections = result.get("detections", [])
+            detections = cached["detections"] if cached is not None else self.model.detect(
+                frame, imagesz=self.image_imgsz, conf=self.image_conf
+            )
+            started = _lap(timings, "inference", started)
             
-            print(f"Detections found: {len(detections)}")
+            logger.debug("Detections found: %d", len(detections))
             
-            #  Annotate frame
-            annotated_frame = self.visualizer.draw_detections(frame, detections)
+            #  Annotate frame (the decoded frame is private to this call, so draw on it directly)
+            annotated_frame = self.visualizer.draw_detections(frame, detections, in_place=True)
+            started = _lap(timings, "draw", started)
             
             # Validate annotated frame
             if annotated_frame is None or annotated_frame.size == 0:
                 raise ValueError("Annotated frame is empty")
             
-            print(f"Frame annotated successfully:{annotated_frame.shape}")
-            
             #  Encode result
             encoded_frame = self.image_processor.encode_image_to_base64(annotated_frame)
+            _lap(timings, "encode", started)
             
-            print(f"Frame encoded successfully")
+            if key is not None and cached is None:
+                frame_to_cache = encoded_frame if self.cache_frames else None
+                size = detections.nbytes() + (len(frame_to_cache) if frame_to_cache else 0)
+                cache.put(key, {"detections": detections, "frame": frame_to_cache}, size)
             
             return {
                 "frame": encoded_frame,
-                "detections": detections,
-                "count": len(detections)
+                "detections": detections.to_list(),
+                "count": len(detections),
+                "timings": timings
             }
         
         except ValueError as e:
@@ -77,33 +150,26 @@ class DetectionService:
         
         try:
             # decode bytes into cv2 image
-            npimg = np.frombuffer(image_bytes, dtype=np.uint8)
-            frame = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+            frame, _ = self.image_processor.decode_image_bytes(image_bytes)
 
-            if frame is None or frame.size == 0:
-                raise ValueError("Decoded frame is empty")
-
-            print(f"Frame decoded successfully: shape={frame.shape}, dtype={frame.dtype}")
+            logger.debug("Frame decoded: shape=%s, dtype=%s", frame.shape, frame.dtype)
 
             # Run detection
-            result = self.model.predict_ndarray(frame)
-            detections = result.get("detections", [])
+            detections = self.model.detect(frame)
 
-            print(f"Detections found: {len(detections)}")
+            logger.debug("Detections found: %d", len(detections))
 
             # Annotate frame
-            annotated_frame = self.visualizer.draw_detections(frame, detections)
+            annotated_frame = self.visualizer.draw_detections(frame, detections, in_place=True)
 
             if annotated_frame is None or annotated_frame.size == 0:
                 raise ValueError("Annotated frame is empty")
 
             encoded_frame = self.image_processor.encode_image_to_base64(annotated_frame)
 
-            print(f"Frame encoded successfully")
-
             return {
                 "frame": encoded_frame,
-                "detections": detections,
+                "detections": detections.to_list(),
                 "count": len(detections)
             }
 
@@ -117,38 +183,273 @@ class DetectionService:
         This path sacrifices output resolution for speed and lower latency.
         """
         try:
-            npimg = np.frombuffer(image_bytes, dtype=np.uint8)
-            frame = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+            small, original_size = self._decode_live_frame(image_bytes, target_size)
 
-            if frame is None or frame.size == 0:
-                raise ValueError("Decoded frame is empty")
+            logger.debug("Live frame decoded and resized: shape=%s", small.shape)
 
-            # Resize to smaller target to speed up inference while preserving aspect ratio
-            h, w = frame.shape[:2]
-            if max(h, w) > target_size:
-                scale = target_size / max(h, w)
-                new_w = int(w * scale)
-                new_h = int(h * scale)
-                small = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-            else:
-                small = frame
+            # Run detection on the small image (model_loader will convert to RGB and adjust imgsz)
+            detections = self.model.detect(small, imagesz=target_size)
 
-            print(f"Live frame decoded and resized: shape={small.shape}, dtype={small.dtype}")
+            logger.debug("Live detections found: %d", len(detections))
 
-            # Run detection on the small image (model_loader will convert to RGB and adjust imgsz)
-            result = self.model.predict_ndarray(small, imagesz=target_size)
-            detections = result.get("detections", [])
+            return self._render_live_result(small, detections, {}, original_size)
 
-            print(f"Live detections found: {len(detections)}")
+        except Exception as e:
+            raise Exception(f"Live frame processing failed: {str(e)}")
 
-            # Annotate the small image
-            annotated = self.visualizer.draw_detections(small, detections)
-            if annotated is None or annotated.size == 0:
-                raise ValueError("Annotated frame is empty")
+    def detect_frame_bytes_live(self, image_bytes: bytes, target_size: int = 320) -> Dict:
+        """
+        Metadata-only live path: decode, resize to target_size and detect.
 
-            encoded_frame = self.image_processor.encode_image_to_base64(annotated)
+        The frame is never copied, annotated or re-encoded; clients draw the boxes
+        themselves over the frame they already have. Boxes are returned in the
+        coordinates of the original (un-resized) frame.
 
-            return {"frame": encoded_frame, "detections": detections, "count": len(detections)}
+        @param {bytes} image_bytes - raw image bytes (as sent from browser Blob)
+        @param {int} target_size - longest side used for resizing and inference
+        @return {Dict} - detections, count and the original frame width/height
+        """
+        try:
+            small, original_size = self._decode_live_frame(image_bytes, target_size)
+            detections = self.model.detect(small, imagesz=target_size)
+            return self._render_live_result(small, detections, {"mode": "metadata"}, original_size)
 
         except Exception as e:
-            raise Exception(f"Live frame processing failed: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Live frame processing failed: {str(e)}")
+
+    def process_frames_bytes_live_batch(
+        self,
+        frames: List[bytes],
+        target_size: int = 320,
+        options: Optional[List[Dict]] = None,
+        slots: Optional[List[Optional[FrameSlot]]] = None,
+        trackers: Optional[List[Optional[SessionTracker]]] = None,
+        gates: Optional[List[Optional[FrameGate]]] = None
+    ) -> List:
+        """
+        Batched variant of `process_frame_bytes_live` used by the live batch scheduler.
+
+        All decodable frames are run through the model as one forward pass. A frame that
+        fails to decode or render does not fail the rest of the batch: its entry in the
+        returned list holds the exception instead of a result.
+
+        Frames with a session tracker (tracking mode) only join the forward pass when the
+        tracker asks for a detection frame (every N frames or on motion); otherwise their
+        tracked boxes are propagated. Tracked results carry persistent track ids and the
+        trackers are updated in place. Frames with a frame gate skip the forward pass when
+        they are near duplicates of the session's last inferred frame and reuse its detections.
+
+        Every result carries the per-stage "timings" (ms) of its frame: decode (incl. resize),
+        inference (the forward pass it was part of), postprocess (motion thumbnail,
+        tracker/gate), draw and encode. The caller records them and strips them before emitting.
+
+        @param {List[bytes]} frames - raw image bytes, one per live session
+        @param {int} target_size - longest side used for resizing and inference
+        @param {List[Dict]} options - per-frame session options, e.g. {"protocol": "binary", "mode": "metadata"}
+        @param {List[FrameSlot]} slots - optional per-frame shared-memory slots (see frame_ring);
+            a frame with a slot is resized straight into it and annotated there
+        @param {List[SessionTracker]} trackers - optional per-frame session trackers (see tracker)
+        @param {List[FrameGate]} gates - optional per-frame change detectors (see frame_gate)
+        @return {List} - one result dict (or Exception) per input frame, in input order
+        """
+        options = options or [{}] * len(frames)
+        slots = slots or [None] * len(frames)
+        trackers = trackers or [None] * len(frames)
+        gates = gates or [None] * len(frames)
+        outputs: List = [None] * len(frames)
+        to_detect = []
+        timings = [{} for _ in frames]
+        for index, image_bytes in enumerate(frames):
+            try:
+                started = time.perf_counter()
+                small, original_size = self._decode_live_frame(image_bytes, target_size, slots[index])
+                started = _lap(timings[index], "decode", started)
+                tracker, gate = trackers[index], gates[index]
+                size = (small.shape[1], small.shape[0])
+                thumbnail = None
+                if tracker is not None or gate is not None:
+                    thumbnail = self.image_processor.motion_thumbnail(small)
+                detections = None
+                if tracker is not None:
+                    if not tracker.needs_detection(thumbnail):
+                        detections = tracker.propagate(size, self.model.class_names)
+                elif gate is not None:
+                    detections = gate.lookup(thumbnail, size)
+                _lap(timings[index], "postprocess", started)
+                if detections is not None:
+                    outputs[index] = self._render_live_result(
+                        small, detections, options[index], original_size, timings[index]
+                    )
+                    continue
+                to_detect.append((index, small, original_size, thumbnail))
+            except Exception as e:
+                outputs[index] = Exception(f"Live frame processing failed: {str(e)}")
+
+        if to_detect:
+            started = time.perf_counter()
+            results = self.model.detect_batch([small for _, small, _, _ in to_detect], imagesz=target_size)
+            inference_ms = (time.perf_counter() - started) * 1000.0
+            for (index, small, original_size, thumbnail), detections in zip(to_detect, results):
+                try:
+                    timings[index]["inference"] = inference_ms
+                    started = time.perf_counter()
+                    tracker, gate = trackers[index], gates[index]
+                    size = (small.shape[1], small.shape[0])
+                    if tracker is not None:
+                        detections = tracker.update(detections, size, thumbnail)
+                    elif gate is not None:
+                        gate.store(thumbnail, detections, size)
+                    timings[index]["postprocess"] += (time.perf_counter() - started) * 1000.0
+                    outputs[index] = self._render_live_result(
+                        small, detections, options[index], original_size, timings[index]
+                    )
+                except Exception as e:
+                    outputs[index] = Exception(f"Live frame processing failed: {str(e)}")
+
+        return outputs
+
+    def detect_images(
+        self,
+        images: List[bytes],
+        imagesz: int = 640,
+        conf: float = 0.25,
+        annotate: bool = False
+    ) -> List:
+        """
+        Run a chunk of still images (HTTP batch endpoint) through the model as one forward pass.
+
+        JPEGs are reduced while decoding as far as `imagesz` allows, and boxes are
+        returned in the coordinates of the original image. With `annotate`, the boxes
+        are drawn on the decoded (possibly reduced) image and it is returned as a
+        base64 JPEG data URI. An image that fails to decode only fails its own entry.
+
+        @param {List[bytes]} images - Encoded images (JPEG, PNG, ...)
+        @param {int} imagesz - Inference size
+        @param {float} conf - Confidence threshold
+        @param {bool} annotate - Also return the annotated image
+        @return {List} - One result dict (or Exception) per image, in input order
+        """
+        outputs: List = [None] * len(images)
+        decoded = []
+        for index, image_bytes in enumerate(images):
+            try:
+                frame, original_size = self.image_processor.decode_image_bytes(image_bytes, imagesz)
+                decoded.append((index, frame, original_size))
+            except Exception as e:
+                outputs[index] = Exception(f"Image processing failed: {str(e)}")
+
+        if decoded:
+            results = self.model.detect_batch([frame for _, frame, _ in decoded], imagesz=imagesz, conf=conf)
+            for (index, frame, (width, height)), detections in zip(decoded, results):
+                try:
+                    result = {
+                        "detections": detections.scaled(width / frame.shape[1], height / frame.shape[0]).to_list(),
+                        "count": len(detections),
+                        "width": width,
+                        "height": height
+                    }
+                    if annotate:
+                        annotated = self.visualizer.draw_detections(frame, detections, in_place=True)
+                        result["frame"] = self.image_processor.encode_image_to_base64(annotated)
+                    outputs[index] = result
+                except Exception as e:
+                    outputs[index] = Exception(f"Image processing failed: {str(e)}")
+
+        return outputs
+
+    def _decode_live_frame(
+        self,
+        image_bytes: bytes,
+        target_size: int,
+        slot: Optional[FrameSlot] = None
+    ) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Decode raw image bytes and shrink so the longest side is at most target_size.
+
+        JPEGs are reduced while decoding (see JpegCodec.decode), so only the last,
+        small resize step runs on pixels. With a slot, the resized frame is written directly into the slot's buffer
+        instead of a new array (frames that fit without resizing keep the decoded array).
+
+        @return {Tuple} - (resized frame, (original width, original height))
+        """
+        frame, original_size = self.image_processor.decode_image_bytes(image_bytes, target_size)
+
+        # Resize to smaller target to speed up inference while preserving aspect ratio
+        h, w = frame.shape[:2]
+        if max(h, w) > target_size:
+            scale = target_size / max(h, w)
+            new_w = int(w * scale)
+            new_h = int(h * scale)
+            if slot is not None and slot.fits((new_h, new_w, 3)):
+                small = slot.array((new_h, new_w, 3))
+                cv2.resize(frame, (new_w, new_h), dst=small, interpolation=cv2.INTER_LINEAR)
+                return small, original_size
+            return cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR), original_size
+        return frame, original_size
+
+    def _render_live_result(
+        self,
+        small: np.ndarray,
+        detections: Detections,
+        options: Dict,
+        original_size: Tuple[int, int],
+        timings: Optional[Dict[str, float]] = None
+    ) -> Dict:
+        """
+        Build the response payload of a live frame according to the session options.
+
+        The "json" protocol returns a base64 data URI and a detection list; the "binary"
+        protocol returns raw JPEG bytes and packed detections (see detection_codec).
+        In "metadata" mode no frame is drawn or encoded at all and the boxes are
+        scaled back to the original frame the client sent. The legacy detection
+        dictionaries are only built for JSON clients. With `timings`, the draw and
+        encode times are added to it and it is returned as the result's "timings".
+        """
+        protocol = options.get("protocol", "json")
+        started = time.perf_counter()
+
+        if options.get("mode") == "metadata":
+            width, height = original_size
+            detections = detections.scaled(width / small.shape[1], height / small.shape[0])
+            result = {
+                "detections": pack_detections(detections) if protocol == "binary" else detections.to_list(),
+                "count": len(detections),
+                "width": width,
+                "height": height
+            }
+            if timings is not None:
+                _lap(timings, "encode", started)
+                result["timings"] = timings
+            return result
+
+        # the live frame is private to this request, so boxes are drawn on it directly
+        annotated = self.visualizer.draw_detections(small, detections, in_place=True)
+        if annotated is None or annotated.size == 0:
+            raise ValueError("Annotated frame is empty")
+        if timings is not None:
+            started = _lap(timings, "draw", started)
+
+        if protocol == "binary":
+            h, w = annotated.shape[:2]
+            result = {
+                "frame": self.image_processor.encode_image_to_bytes(annotated),
+                "detections": pack_detections(detections),
+                "count": len(detections),
+                "width": w,
+                "height": h
+            }
+        else:
+            encoded_frame = self.image_processor.encode_image_to_base64(annotated)
+            result = {"frame": encoded_frame, "detections": detections.to_list(), "count": len(detections)}
+
+        if timings is not None:
+            _lap(timings, "encode", started)
+            result["timings"] = timings
+        return result
+
+
+def _lap(timings: Dict[str, float], stage: str, started: float) -> float:
+    """Store the milliseconds since `started` as a stage timing and return the current time."""
+    now = time.perf_counter()
+    timings[stage] = (now - started) * 1000.0
+    return now
@@ -1,6 +1,10 @@
+import logging
 import cv2
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Union
+from detections import Detections
+
+logger = logging.getLogger(__name__)
 
 
 class DetectionVisualizer:
@@ -29,26 +33,65 @@ class DetectionVisualizer:
     def draw_detections(
         self,
         frame: np.ndarray,
-        detections: List[Dict]
+        detections: Union[Detections, List[Dict]],
+        in_place: bool = False
     ) -> np.ndarray:
         """
         Draw bounding boxes and labels on the frame.
         
         @param {np.ndarray} frame - Input image (BGR format)
-        @param {List[Dict]} detections - List of detection dictionaries
+        @param {Detections|List[Dict]} detections - Columnar detections or list of detection dictionaries
+        @param {bool} in_place - Draw directly on `frame` (e.g. a live frame buffer that is not reused)
         @return {np.ndarray} - Annotated image
         """
         # Validate frame is not empty
         if frame is None or frame.size == 0:
             raise ValueError("Input frame is empty or None")
         
-        # Create a copy to avoid modifying original
-        annotated_frame = frame.copy()
+        # Create a copy to avoid modifying original, unless the caller owns the buffer
+        annotated_frame = frame if in_place else frame.copy()
         
         # If no detections, return the original frame
-        if not detections:
+        if detections is None or len(detections) == 0:
             return annotated_frame
+
+        h, w = annotated_frame.shape[:2]
+        if isinstance(detections, Detections):
+            # Clip and convert every box at once instead of per detection
+            boxes = detections.xyxy.astype(np.int32)
+            np.clip(boxes, 0, np.array([w, h, w, h], dtype=np.int32), out=boxes)
+            names = detections.class_names
+            items = (
+                (x1, y1, x2, y2, conf, names.get(class_id) or f"ID:{class_id}")
+                for (x1, y1, x2, y2), conf, class_id in zip(
+                    boxes.tolist(), detections.confidence.tolist(), detections.class_id.tolist()
+                )
+            )
+            if detections.track_id is not None:
+                # prefix labels with the persistent track id
+                items = (
+                    (x1, y1, x2, y2, conf, f"#{track_id} {class_name}")
+                    for (x1, y1, x2, y2, conf, class_name), track_id in zip(items, detections.track_id.tolist())
+                )
+        else:
+            items = self._iter_legacy(detections, w, h)
+
+        for x1, y1, x2, y2, conf, class_name in items:
+            try:
+                # Skipping invalid boxes
+                if x2 <= x1 or y2 <= y1:
+                    continue
+                self._draw_box(annotated_frame, x1, y1, x2, y2, f"{class_name} ({conf:.2f})", w)
+            except Exception as e:
+                # Skip problematic detections but continue with others
+                logger.warning(f"Failed to draw detection: {e}")
+                continue
         
+        return annotated_frame
+
+    @staticmethod
+    def _iter_legacy(detections: List[Dict], w: int, h: int):
+        """Yield clipped (x1, y1, x2, y2, confidence, class_name) from detection dictionaries."""
         for det in detections:
             try:
                 # Extract detection info with error checking
@@ -61,61 +104,55 @@ class DetectionVisualizer:
                 class_id: int = det.get("class_Id", 0)
                 
                 # Validating coordinates
-                h, w = annotated_frame.shape[:2]
                 x1, y1 = max(0, x1), max(0, y1)
                 x2, y2 = min(w, x2), min(h, y2)
                 
-                # Skipping invalid boxes
-                if x2 <= x1 or y2 <= y1:
-                    continue
-                
                 # Prefer class_name when available for more informative labels
                 class_name = det.get("class_name") or f"ID:{class_id}"
-                label: str = f"{class_name} ({conf:.2f})"
-                
-                # Draw bounding box
-                cv2.rectangle(
-                    annotated_frame,
-                    (x1, y1),
-                    (x2, y2),
-                    self.bbox_color,
-                    self.bbox_thickness
-                )
-                
-                # Calculate text size for background
-                (text_width, text_height), baseline = cv2.getTextSize(
-                    label,
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    self.font_scale,
-                    self.font_thickness
-                )
-                
-                # Draw text background
-                bg_y1 = max(0, y1 - text_height - baseline - 5)
-                bg_y2 = y1
-                cv2.rectangle(
-                    annotated_frame,
-                    (x1, bg_y1),
-                    (min(x1 + text_width, w), bg_y2),
-                    self.bbox_color,
-                    -1
-                )
-                
-                # Draw text
-                text_y = max(text_height + baseline, y1 - 5)
-                cv2.putText(
-                    annotated_frame,
-                    label,
-                    (x1, text_y),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    self.font_scale,
-                    (0, 0, 0),  # Black text on colored background
-                    self.font_thickness,
-                    cv2.LINE_AA
-                )
+                yield x1, y1, x2, y2, conf, class_name
             except Exception as e:
-                # Skip problematic detections but continue with others
-                print(f"Warning: Failed to draw detection: {e}")
+                logger.warning(f"Failed to draw detection: {e}")
                 continue
+
+    def _draw_box(self, annotated_frame: np.ndarray, x1: int, y1: int, x2: int, y2: int, label: str, w: int) -> None:
+        """Draw one bounding box with its label on a filled background."""
+        # Draw bounding box
+        cv2.rectangle(
+            annotated_frame,
+            (x1, y1),
+            (x2, y2),
+            self.bbox_color,
+            self.bbox_thickness
+        )
+        
+        # Calculate text size for background
+        (text_width, text_height), baseline = cv2.getTextSize(
+            label,
+            cv2.FONT_HERSHEY_SIMPLEX,
+            self.font_scale,
+            self.font_thickness
+        )
+        
+        # Draw text background
+        bg_y1 = max(0, y1 - text_height - baseline - 5)
+        bg_y2 = y1
+        cv2.rectangle(
+            annotated_frame,
+            (x1, bg_y1),
+            (min(x1 + text_width, w), bg_y2),
+            self.bbox_color,
+            -1
+        )
         
-        return annotated_frame
\ No newline at end of file
+        # Draw text
+        text_y = max(text_height + baseline, y1 - 5)
+        cv2.putText(
+            annotated_frame,
+            label,
+            (x1, text_y),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            self.font_scale,
+            (0, 0, 0),  # Black text on colored background
+            self.font_thickness,
+            cv2.LINE_AA
+        )
\ No newline at end of file
@@ -0,0 +1,147 @@
+import base64
+import numpy as np
+from typing import Dict, List, Optional
+
+
+def pack_array(array: np.ndarray) -> dict:
+    """JSON-serializable form of a numeric array (dtype, shape and base64 raw bytes)."""
+    array = np.ascontiguousarray(array)
+    return {"dtype": array.dtype.str, "shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def unpack_array(packed: dict) -> np.ndarray:
+    """
+    Rebuild an array packed by `pack_array` (a writable copy).
+
+    @raises {ValueError} - On a non-numeric dtype or data not matching the shape
+    """
+    dtype = np.dtype(packed["dtype"])
+    if dtype.kind not in "biuf":
+        raise ValueError(f"Unsupported packed array dtype '{dtype}'")
+    return np.frombuffer(base64.b64decode(packed["data"]), dtype=dtype).reshape(packed["shape"]).copy()
+
+
+class Detections:
+    """
+    Columnar detection results for one image.
+
+    Boxes, scores and class ids are kept as NumPy arrays so the visualizer, the
+    binary codec and box rescaling work on whole columns. The legacy
+    list-of-dicts view (`to_list`) is only built when a JSON consumer asks for
+    it, and is cached afterwards. Tracked results also carry a `track_id` column.
+    """
+
+    __slots__ = ("xyxy", "confidence", "class_id", "class_names", "track_id", "_list")
+
+    def __init__(
+        self,
+        xyxy: np.ndarray,
+        confidence: np.ndarray,
+        class_id: np.ndarray,
+        class_names: Optional[Dict[int, str]] = None,
+        track_id: Optional[np.ndarray] = None
+    ):
+        """
+        @param {np.ndarray} xyxy - (N, 4) float32 boxes [x1, y1, x2, y2]
+        @param {np.ndarray} confidence - (N,) float32 scores
+        @param {np.ndarray} class_id - (N,) int32 class ids
+        @param {Dict[int, str]} class_names - class id -> name mapping used by `to_list`
+        @param {np.ndarray} track_id - Optional (N,) int32 persistent object ids (tracking mode)
+        """
+        self.xyxy = xyxy
+        self.confidence = confidence
+        self.class_id = class_id
+        self.class_names = class_names or {}
+        self.track_id = track_id
+        self._list: Optional[List[Dict]] = None
+
+    @classmethod
+    def from_array(cls, boxes: Optional[np.ndarray], class_names: Optional[Dict[int, str]] = None) -> "Detections":
+        """
+        Build from a backend (N, 6) array of rows [x1, y1, x2, y2, confidence, class_id].
+
+        @param {np.ndarray} boxes - Backend output (None or malformed arrays give no detections)
+        @param {Dict[int, str]} class_names - class id -> name mapping
+        """
+        if boxes is None or boxes.ndim != 2 or boxes.shape[1] < 6 or len(boxes) == 0:
+            return cls.empty(class_names)
+        return cls(
+            np.ascontiguousarray(boxes[:, :4], dtype=np.float32),
+            np.ascontiguousarray(boxes[:, 4], dtype=np.float32),
+            boxes[:, 5].astype(np.int32),
+            class_names
+        )
+
+    @classmethod
+    def empty(cls, class_names: Optional[Dict[int, str]] = None) -> "Detections":
+        """Detections for an image without any box."""
+        return cls(
+            np.zeros((0, 4), dtype=np.float32),
+            np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=np.int32),
+            class_names
+        )
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form (see `from_dict`), e.g. to keep session state in Redis."""
+        return {
+            "xyxy": pack_array(self.xyxy),
+            "confidence": pack_array(self.confidence),
+            "class_id": pack_array(self.class_id),
+            "track_id": pack_array(self.track_id) if self.track_id is not None else None,
+            "class_names": {str(k): v for k, v in self.class_names.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Detections":
+        """Rebuild detections from `to_dict` output."""
+        return cls(
+            unpack_array(data["xyxy"]),
+            unpack_array(data["confidence"]),
+            unpack_array(data["class_id"]),
+            {int(k): v for k, v in data["class_names"].items()},
+            track_id=unpack_array(data["track_id"]) if data["track_id"] is not None else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.confidence)
+
+    def nbytes(self) -> int:
+        """Approximate memory footprint (arrays plus the legacy list once built), for cache accounting."""
+        arrays = self.xyxy.nbytes + self.confidence.nbytes + self.class_id.nbytes
+        if self.track_id is not None:
+            arrays += self.track_id.nbytes
+        return arrays + 256 * len(self) + 128
+
+    def scaled(self, scale_x: float, scale_y: float) -> "Detections":
+        """Return a copy with boxes scaled (e.g. from a resized frame back to the original)."""
+        if scale_x == 1.0 and scale_y == 1.0:
+            return self
+        xyxy = self.xyxy * np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+        return Detections(xyxy, self.confidence, self.class_id, self.class_names, self.track_id)
+
+    def to_list(self) -> List[Dict]:
+        """
+        Legacy `{"detections": [...]}` entries, built lazily for JSON clients.
+
+        @return {List[Dict]} - [{"class_Id", "class_name", "confidence", "bbox"}, ...],
+            plus "track_id" when the detections are tracked
+        """
+        if self._list is None:
+            names = self.class_names
+            entries = [
+                {
+                    "class_Id": class_id,
+                    "class_name": names.get(class_id, str(class_id)),
+                    "confidence": confidence,
+                    "bbox": bbox
+                }
+                for class_id, confidence, bbox in zip(
+                    self.class_id.tolist(), self.confidence.tolist(), self.xyxy.tolist()
+                )
+            ]
+            if self.track_id is not None:
+                for entry, track_id in zip(entries, self.track_id.tolist()):
+                    entry["track_id"] = track_id
+            self._list = entries
+        return self._list
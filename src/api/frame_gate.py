@@ -0,0 +1,88 @@
+import time
+import numpy as np
+from typing import Optional, Tuple
+from detections import Detections, pack_array, unpack_array
+
+
+class FrameGate:
+    """
+    Per-session change detector in front of the model.
+
+    Keeps the motion thumbnail of the last frame that went through inference
+    and its detections (boxes normalized to the frame size). A new frame whose
+    thumbnail differs from it by at most `threshold` (mean absolute grey-level
+    difference) reuses those detections instead of running the model, until
+    they are older than `max_stale_ms`. Small and picklable, so it can travel
+    to an inference worker with the frame and come back updated; `to_dict`
+    gives a JSON form for state kept outside the process (the Redis work queue).
+    """
+
+    def __init__(self, threshold: float = 2.0, max_stale_ms: float = 1000):
+        """
+        @param {float} threshold - Largest thumbnail difference (0-255) still treated as the same frame
+        @param {float} max_stale_ms - Age after which cached detections are no longer reused
+        """
+        self.threshold = threshold
+        self.max_stale = max_stale_ms / 1000.0
+        self.thumbnail: Optional[np.ndarray] = None
+        self.detections: Optional[Detections] = None
+        self.inferred_at = 0.0
+        self.frames = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, thumbnail: np.ndarray, size: Tuple[int, int]) -> Optional[Detections]:
+        """
+        Get the cached detections if the frame is a near duplicate of the last inferred one.
+
+        @param {np.ndarray} thumbnail - Motion thumbnail (see ImageProcessor.motion_thumbnail)
+        @param {Tuple[int, int]} size - (width, height) of the frame to express the boxes in
+        @return {Detections} - Cached detections, or None when the frame has to be inferred
+        """
+        self.frames += 1
+        if (
+            self.thumbnail is None
+            or self.thumbnail.shape != thumbnail.shape
+            or time.monotonic() - self.inferred_at > self.max_stale
+            or float(np.mean(np.abs(thumbnail.astype(np.int16) - self.thumbnail))) > self.threshold
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.detections.scaled(size[0], size[1])
+
+    def store(self, thumbnail: np.ndarray, detections: Detections, size: Tuple[int, int]) -> None:
+        """Remember an inferred frame and its detections (in (width, height) pixel coordinates)."""
+        self.thumbnail = thumbnail
+        self.detections = detections.scaled(1.0 / size[0], 1.0 / size[1])
+        self.inferred_at = time.monotonic()
+
+    def to_dict(self) -> dict:
+        """
+        JSON-serializable state (see `from_dict`).
+
+        The inference time is stored as wall-clock time: monotonic clocks of other
+        processes (inference nodes) are unrelated.
+        """
+        return {
+            "threshold": self.threshold,
+            "max_stale_ms": self.max_stale * 1000.0,
+            "thumbnail": pack_array(self.thumbnail) if self.thumbnail is not None else None,
+            "detections": self.detections.to_dict() if self.detections is not None else None,
+            "inferred_at": time.time() - (time.monotonic() - self.inferred_at),
+            "frames": self.frames,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FrameGate":
+        """Rebuild a frame gate from `to_dict` output."""
+        gate = cls(data["threshold"], data["max_stale_ms"])
+        gate.thumbnail = unpack_array(data["thumbnail"]) if data["thumbnail"] is not None else None
+        gate.detections = Detections.from_dict(data["detections"]) if data["detections"] is not None else None
+        gate.inferred_at = time.monotonic() - (time.time() - float(data["inferred_at"]))
+        gate.frames = int(data["frames"])
+        gate.hits = int(data["hits"])
+        gate.misses = int(data["misses"])
+        return gate
@@ -0,0 +1,263 @@
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from frame_gate import FrameGate
+from session_store import connect_redis
+from tracker import SessionTracker
+
+logger = logging.getLogger(__name__)
+
+# sids with a live frame waiting, in arrival order
+WORK_KEY = "live:work"
+# `image` requests (JSON), each one answered
+IMAGES_KEY = "live:images"
+# latest live frame of a session: {"frame", "options", "enqueued_at"}
+FRAME_KEY = "live:frame:{sid}"
+# set while a session is in WORK_KEY (CLAIM_QUEUED, no expiry: the sid is listed exactly
+# once until a node takes it) or being processed by a node (CLAIM_TAKEN, expires unless
+# the node keeps extending it)
+CLAIM_KEY = "live:claim:{sid}"
+CLAIM_QUEUED = b"queued"
+CLAIM_TAKEN = b"taken"
+# {"tracker", "gate"} of a session as JSON (their to_dict forms, never pickle: anyone able
+# to write to Redis could otherwise run code on every inference node)
+STATE_KEY = "live:state:{sid}"
+# inference node id -> time of its last heartbeat
+NODES_KEY = "live:inference_nodes"
+# {"class_names", "model_version"} of the model the nodes serve
+MODEL_KEY = "live:model"
+
+# tracker/gate state of a session outlives pauses in its stream this long
+STATE_TTL_S = 300
+# an inference node that missed its heartbeats this long no longer counts
+NODE_TIMEOUT_S = 15
+
+# (sid, frame bytes, session options, enqueued at (epoch s), tracker, gate)
+LiveFrame = Tuple[str, bytes, dict, float, object, object]
+
+
+class FrameQueue:
+    """
+    Redis work queue between Socket.IO front ends and inference nodes.
+
+    Front ends only queue frames; inference nodes (inference_node.py) pull them,
+    run the model and emit the results through the Socket.IO message queue, so
+    any node can serve any session. Like the in-process BatchScheduler, every
+    session keeps at most one pending live frame: a newer frame overwrites it
+    in place. A session is claimed from the moment its frame is queued until a
+    node finished it, so its frames are processed by one node at a time and in
+    order, and its tracker/frame-gate state (kept here between frames) always
+    reflects the previous frame. A queued session's claim never expires, so it
+    cannot be listed twice however long the backlog; taking it starts a `ttl_s`
+    expiry that the processing node keeps extending (`extend_claims`), so the
+    claim only lapses once its node died, stalling its sessions that long.
+    Queued frames also expire after `ttl_s`.
+    """
+
+    def __init__(self, url: str, ttl_s: float = 10.0):
+        """
+        @param {str} url - Redis URL (see session_store.connect_redis)
+        @param {float} ttl_s - Lifetime of queued frames, and of taken claims their node stopped extending
+        """
+        self.redis = connect_redis(url)
+        self.ttl = max(1, int(ttl_s))
+        self._lock = threading.Lock()
+        # count_nodes/get_model_info are asked on every frame; answered from here for a second
+        self._nodes_cache: Tuple[float, int] = (0.0, 0)
+        self._model_cache: Tuple[float, dict] = (0.0, {})
+
+        # statistics (this process)
+        self._frames_submitted = 0
+        self._frames_superseded = 0
+        self._images_submitted = 0
+
+    # -- front end -----------------------------------------------------------------
+
+    def submit(self, sid: str, frame: bytes, options: Optional[dict] = None) -> None:
+        """
+        Queue the latest live frame of a session, replacing any frame still pending for it.
+
+        @param {str} sid - Socket.IO session id the result is sent back to
+        @param {bytes} frame - Raw encoded image bytes
+        @param {dict} options - Session options (protocol, mode, tracking, timings)
+        """
+        frame_key = FRAME_KEY.format(sid=sid)
+        pipe = self.redis.pipeline()
+        pipe.hset(frame_key, mapping={
+            "frame": frame,
+            "options": json.dumps(options or {}),
+            "enqueued_at": repr(time.time())
+        })
+        pipe.expire(frame_key, self.ttl)
+        pipe.set(CLAIM_KEY.format(sid=sid), CLAIM_QUEUED, nx=True)
+        added, _, claimed = pipe.execute()
+        if claimed:
+            self.redis.rpush(WORK_KEY, sid)
+        with self._lock:
+            self._frames_submitted += 1
+            # all fields already existed: the pending frame was replaced
+            self._frames_superseded += added == 0
+
+    def submit_image(self, sid: str, data: str, options: Optional[dict] = None) -> None:
+        """Queue a base64 `image` request; unlike live frames, every request is answered."""
+        self.redis.rpush(IMAGES_KEY, json.dumps({
+            "sid": sid, "data": data, "options": options or {}, "enqueued_at": time.time()
+        }))
+        with self._lock:
+            self._images_submitted += 1
+
+    def remove_session(self, sid: str) -> None:
+        """Drop the pending frame, the tracker/gate state and the claim of a session."""
+        self.redis.delete(FRAME_KEY.format(sid=sid), STATE_KEY.format(sid=sid), CLAIM_KEY.format(sid=sid))
+
+    def count_nodes(self) -> int:
+        """Number of inference nodes with a recent heartbeat."""
+        checked_at, nodes = self._nodes_cache
+        if time.monotonic() - checked_at < 1.0:
+            return nodes
+        nodes = self.redis.zcount(NODES_KEY, time.time() - NODE_TIMEOUT_S, "+inf")
+        self._nodes_cache = (time.monotonic(), nodes)
+        return nodes
+
+    def get_model_info(self) -> dict:
+        """{"class_names", "model_version"} published by the inference nodes (empty before the first)."""
+        checked_at, info = self._model_cache
+        if time.monotonic() - checked_at < 1.0:
+            return info
+        raw = self.redis.get(MODEL_KEY)
+        info = json.loads(raw) if raw else {}
+        self._model_cache = (time.monotonic(), info)
+        return info
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "live_queue_depth": self.redis.llen(WORK_KEY),
+                "image_queue_depth": self.redis.llen(IMAGES_KEY),
+                "inference_nodes": self.count_nodes(),
+                "frames_submitted": self._frames_submitted,
+                "frames_superseded": self._frames_superseded,
+                "images_submitted": self._images_submitted
+            }
+
+    # -- inference node ------------------------------------------------------------
+
+    def heartbeat(self, node_id: str, model_info: Optional[dict] = None) -> None:
+        """Announce a live inference node (and the model it serves)."""
+        pipe = self.redis.pipeline()
+        pipe.zadd(NODES_KEY, {node_id: time.time()})
+        pipe.zremrangebyscore(NODES_KEY, "-inf", time.time() - NODE_TIMEOUT_S)
+        if model_info is not None:
+            pipe.set(MODEL_KEY, json.dumps(model_info))
+        pipe.execute()
+
+    def leave(self, node_id: str) -> None:
+        self.redis.zrem(NODES_KEY, node_id)
+
+    def take(self, max_batch_size: int, max_wait_s: float, timeout_s: float = 1.0):
+        """
+        Wait for work: a batch of live frames, or one `image` request.
+
+        @param {int} max_batch_size - Maximum number of live frames taken
+        @param {float} max_wait_s - How long to wait for more frames once the first one arrived
+        @param {float} timeout_s - How long to block when both queues are empty
+        @return {tuple} - ("live", [LiveFrame, ...]), ("image", request dict) or None on timeout
+        """
+        popped = self.redis.blpop([WORK_KEY, IMAGES_KEY], timeout=timeout_s)
+        if popped is None:
+            return None
+        key, value = popped
+        if key.decode() == IMAGES_KEY:
+            return "image", json.loads(value)
+
+        sids = [value.decode()]
+        deadline = time.monotonic() + max_wait_s
+        while len(sids) < max_batch_size:
+            more = self.redis.lpop(WORK_KEY, max_batch_size - len(sids))
+            if more:
+                sids.extend(sid.decode() for sid in more)
+            elif time.monotonic() >= deadline:
+                break
+            else:
+                time.sleep(0.002)
+        pipe = self.redis.pipeline()
+        for sid in sids:
+            pipe.hgetall(FRAME_KEY.format(sid=sid))
+            pipe.delete(FRAME_KEY.format(sid=sid))
+            pipe.get(STATE_KEY.format(sid=sid))
+            # the claim now expires unless this node keeps extending it
+            pipe.set(CLAIM_KEY.format(sid=sid), CLAIM_TAKEN, ex=self.ttl)
+        replies = pipe.execute()
+
+        frames: List[LiveFrame] = []
+        gone = []
+        for sid, entry, state in zip(sids, replies[0::4], replies[2::4]):
+            if not entry:
+                # the session disconnected (or its frame expired) while queued
+                gone.append(sid)
+                continue
+            tracker, gate = self._load_state(sid, state)
+            frames.append((
+                sid, entry[b"frame"], json.loads(entry[b"options"]), float(entry[b"enqueued_at"]), tracker, gate
+            ))
+        if gone:
+            self.release(gone)
+        return "live", frames
+
+    def extend_claims(self, sids: List[str]) -> None:
+        """Keep the claims of sessions still being processed from expiring (called every few seconds)."""
+        if not sids:
+            return
+        claims = self.redis.mget([CLAIM_KEY.format(sid=sid) for sid in sids])
+        pipe = self.redis.pipeline(transaction=False)
+        for sid, claim in zip(sids, claims):
+            # a claim that lapsed and was queued again must not start expiring while listed
+            if claim == CLAIM_TAKEN:
+                pipe.expire(CLAIM_KEY.format(sid=sid), self.ttl)
+        pipe.execute()
+
+    def save_states(self, states: Dict[str, tuple]) -> None:
+        """Store the (tracker, gate) of every session of a finished batch."""
+        if not states:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for sid, (tracker, gate) in states.items():
+            pipe.set(STATE_KEY.format(sid=sid), json.dumps({
+                "tracker": tracker.to_dict() if tracker is not None else None,
+                "gate": gate.to_dict() if gate is not None else None
+            }), ex=STATE_TTL_S)
+        pipe.execute()
+
+    @staticmethod
+    def _load_state(sid: str, raw: Optional[bytes]) -> tuple:
+        """(SessionTracker, FrameGate) stored by `save_states`; unreadable state starts over."""
+        if not raw:
+            return None, None
+        try:
+            state = json.loads(raw)
+            return (
+                SessionTracker.from_dict(state["tracker"]) if state.get("tracker") else None,
+                FrameGate.from_dict(state["gate"]) if state.get("gate") else None
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Dropping unreadable tracker/gate state of {sid}: {e}")
+            return None, None
+
+    def release(self, sids: List[str]) -> None:
+        """
+        Give up the claims of finished sessions.
+
+        Sessions that received a newer frame meanwhile (their front end could not queue
+        them while claimed) are queued again right away.
+        """
+        pipe = self.redis.pipeline()
+        for sid in sids:
+            pipe.exists(FRAME_KEY.format(sid=sid))
+            pipe.delete(CLAIM_KEY.format(sid=sid))
+        replies = pipe.execute()
+        for sid, pending in zip(sids, replies[0::2]):
+            if pending and self.redis.set(CLAIM_KEY.format(sid=sid), CLAIM_QUEUED, nx=True):
+                self.redis.rpush(WORK_KEY, sid)
@@ -0,0 +1,213 @@
+import logging
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Shared-memory blocks this process created or attached to, by name. Workers attach
+# to a ring the first time one of its slots shows up in a task and keep it, since
+# rings are reused for the lifetime of the server rather than freed.
+_segments: Dict[str, shared_memory.SharedMemory] = {}
+
+
+class FrameSlot:
+    """
+    One fixed-size frame buffer inside a session's shared-memory ring.
+
+    Slots are small picklable references (segment name + byte range), so the
+    same slot can be handed to an inference worker process, which resolves it
+    to a NumPy view over the shared memory without copying the frame.
+    """
+
+    __slots__ = ("name", "offset", "nbytes", "index")
+
+    def __init__(self, name: str, offset: int, nbytes: int, index: int):
+        """
+        @param {str} name - Shared-memory segment name of the ring
+        @param {int} offset - Byte offset of the slot inside the segment
+        @param {int} nbytes - Slot capacity in bytes
+        @param {int} index - Slot index inside its ring
+        """
+        self.name = name
+        self.offset = offset
+        self.nbytes = nbytes
+        self.index = index
+
+    def fits(self, shape: Tuple[int, ...]) -> bool:
+        """Whether a uint8 frame of this shape fits in the slot."""
+        return int(np.prod(shape)) <= self.nbytes
+
+    def array(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Contiguous uint8 view of the slot with the given shape.
+
+        @param {Tuple[int, ...]} shape - Frame shape, e.g. (h, w, 3)
+        @return {np.ndarray} - Writable view backed by the shared memory
+        @raises {ValueError} - If the frame does not fit in the slot
+        """
+        if not self.fits(shape):
+            raise ValueError(f"Frame of shape {shape} does not fit in a {self.nbytes} byte slot")
+        segment = _segments.get(self.name)
+        if segment is None:
+            segment = _segments[self.name] = shared_memory.SharedMemory(name=self.name)
+        return np.ndarray(shape, dtype=np.uint8, buffer=segment.buf, offset=self.offset)
+
+
+class _FrameRing:
+    """A session's ring: `slots` frame buffers in one shared-memory segment."""
+
+    def __init__(self, slots: int, slot_bytes: int):
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        _segments[self.shm.name] = self.shm
+        self.slots = [FrameSlot(self.shm.name, i * slot_bytes, slot_bytes, i) for i in range(slots)]
+        self.busy = [False] * slots
+        self.next = 0
+
+    def acquire(self) -> Optional[FrameSlot]:
+        """Take the next free slot in round-robin order."""
+        for step in range(len(self.slots)):
+            index = (self.next + step) % len(self.slots)
+            if not self.busy[index]:
+                self.busy[index] = True
+                self.next = (index + 1) % len(self.slots)
+                return self.slots[index]
+        return None
+
+    def idle(self) -> bool:
+        return not any(self.busy)
+
+
+class FrameRingPool:
+    """
+    Preallocated per-session rings of shared-memory frame slots.
+
+    Live frames are resized straight into a slot of their session's ring and
+    inference, drawing and encoding then work on that buffer in place, in this
+    process or in an inference worker. Rings of disconnected sessions are kept
+    and handed to new sessions, and no ring is created past the memory budget
+    (frames then fall back to ordinary arrays), so memory stays flat however
+    many frames and sessions come through.
+    """
+
+    def __init__(self, budget_mb: float, slots_per_session: int = 2, max_side: int = 320):
+        """
+        @param {float} budget_mb - Upper bound on the shared memory used by all rings
+        @param {int} slots_per_session - Frames of one session that can be in flight at once
+        @param {int} max_side - Longest frame side a slot must hold (frames are max_side x max_side at most)
+        """
+        self.slots_per_session = max(1, int(slots_per_session))
+        self.slot_bytes = max_side * max_side * 3
+        self.ring_bytes = self.slots_per_session * self.slot_bytes
+        self.max_rings = int(budget_mb * 1024 * 1024) // self.ring_bytes
+
+        self._rings: Dict[str, _FrameRing] = {}
+        self._free: List[_FrameRing] = []
+        # rings of disconnected sessions that still have a frame in flight
+        self._orphans: List[_FrameRing] = []
+        self._allocated = 0
+        self._lock = threading.Lock()
+
+        self._slots_acquired = 0
+        self._fallbacks = 0
+
+    def acquire(self, sid: str) -> Optional[FrameSlot]:
+        """
+        Get a free slot of the session's ring, creating or reusing a ring on first use.
+
+        @param {str} sid - Session the frame belongs to
+        @return {FrameSlot} - None when the budget is exhausted or every slot of the ring is in flight
+        """
+        with self._lock:
+            ring = self._rings.get(sid)
+            if ring is None:
+                ring = self._take_ring()
+                if ring is None:
+                    self._fallbacks += 1
+                    return None
+                self._rings[sid] = ring
+
+            slot = ring.acquire()
+            if slot is None:
+                self._fallbacks += 1
+            else:
+                self._slots_acquired += 1
+            return slot
+
+    def release(self, sid: str, slot: Optional[FrameSlot]) -> None:
+        """Return a slot once its frame has been processed and emitted."""
+        if slot is None:
+            return
+        with self._lock:
+            ring = self._rings.get(sid)
+            if ring is not None and ring.shm.name == slot.name:
+                ring.busy[slot.index] = False
+                return
+            for ring in self._orphans:
+                if ring.shm.name == slot.name:
+                    ring.busy[slot.index] = False
+                    if ring.idle():
+                        self._orphans.remove(ring)
+                        self._free.append(ring)
+                    return
+
+    def remove_session(self, sid: str) -> None:
+        """Detach the session's ring; it is reused once no frame of it is in flight."""
+        with self._lock:
+            ring = self._rings.pop(sid, None)
+            if ring is None:
+                return
+            if ring.idle():
+                self._free.append(ring)
+            else:
+                self._orphans.append(ring)
+
+    def get_session_ids(self) -> list:
+        """Sessions with a ring attached."""
+        with self._lock:
+            return list(self._rings)
+
+    def close(self) -> None:
+        """Release every ring's shared memory."""
+        with self._lock:
+            rings = list(self._rings.values()) + self._free + self._orphans
+            self._rings.clear()
+            self._free.clear()
+            self._orphans.clear()
+        for ring in rings:
+            _segments.pop(ring.shm.name, None)
+            try:
+                ring.shm.close()
+            except BufferError:
+                # a view handed out for an in-flight frame still exists; unlink anyway
+                pass
+            ring.shm.unlink()
+
+    def get_stats(self) -> dict:
+        """Ring allocation and slot usage."""
+        with self._lock:
+            return {
+                "slot_bytes": self.slot_bytes,
+                "slots_per_session": self.slots_per_session,
+                "max_rings": self.max_rings,
+                "rings_allocated": self._allocated,
+                "rings_in_use": len(self._rings),
+                "rings_free": len(self._free),
+                "allocated_mb": self._allocated * self.ring_bytes / (1024 * 1024),
+                "slots_acquired": self._slots_acquired,
+                "fallbacks": self._fallbacks
+            }
+
+    def _take_ring(self) -> Optional[_FrameRing]:
+        if self._free:
+            return self._free.pop()
+        if self._allocated >= self.max_rings:
+            return None
+        try:
+            ring = _FrameRing(self.slots_per_session, self.slot_bytes)
+        except OSError as e:
+            logger.error(f"Failed to allocate frame ring: {e}")
+            return None
+        self._allocated += 1
+        return ring
@@ -2,15 +2,37 @@ import base64
 import io
 import cv2
 import numpy as np
-from PIL import Image
-from typing import Tuple
+from typing import Optional, Tuple
+from jpeg_codec import JpegCodec
 
 
 class ImageProcessor:
     """Handles image encoding, decoding, and processing operations."""
-    
-    @staticmethod
-    def decode_base64_image(data: str) -> np.ndarray:
+
+    def __init__(self, codec: Optional[JpegCodec] = None):
+        """
+        @param {JpegCodec} codec - JPEG codec (turbojpeg or OpenCV) used for decoding and .jpg encoding
+        """
+        self.codec = codec or JpegCodec()
+
+    def decode_image_bytes(self, image_bytes: bytes, max_side: Optional[int] = None) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Decode raw image bytes to a BGR array.
+
+        With `max_side`, JPEGs are reduced while decoding (1/2, 1/4 or 1/8) as far
+        as possible while keeping the longest side at least `max_side`.
+
+        @param {bytes} image_bytes - Encoded image (JPEG, PNG, ...)
+        @param {int} max_side - Longest side the caller will shrink the image to (None: full size)
+        @return {Tuple} - (BGR array, (original width, original height))
+        @raises {ValueError} - If image decoding fails
+        """
+        frame, original_size = self.codec.decode(image_bytes, max_side)
+        if frame is None or frame.size == 0:
+            raise ValueError("Decoded frame is empty")
+        return frame, original_size
+
+    def decode_base64_image(self, data: str) -> np.ndarray:
         """
         Decode base64-encoded image data to numpy array.
         
@@ -21,32 +43,61 @@ class ImageProcessor:
         try:
             # Remove data URI prefix and decode
             imageBytes: bytes = base64.b64decode(data.split(",")[1])
-            image: Image.Image = Image.open(io.BytesIO(imageBytes))  # Fixed: BytesIO (capital I)
-            frame: np.ndarray = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            frame, _ = self.codec.decode(imageBytes)
+            if frame is None:
+                # formats OpenCV cannot read (e.g. GIF) still go through PIL
+                from PIL import Image
+                image = Image.open(io.BytesIO(imageBytes)).convert("RGB")
+                frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
             return frame
         except Exception as e:
             raise ValueError(f"Failed to decode image: {str(e)}")  # Fixed: removed comma, added {str(e)}
     
-    @staticmethod
-    def encode_image_to_base64(frame: np.ndarray, encoding: str = ".jpg", quality: int = 90) -> str:
+    def encode_image_to_base64(self, frame: np.ndarray, encoding: str = ".jpg", quality: Optional[int] = None) -> str:
         """
         Encode numpy array image to base64 data URI.
         
         @param {np.ndarray} frame - OpenCV image array (BGR format)
         @param {str} encoding - Image encoding format (default: .jpg)
-        @param {int} quality - JPEG quality (1-100, default: 90)
+        @param {int} quality - JPEG quality (1-100, default: the codec's, Config.IMAGE_QUALITY)
         @return {str} - Base64-encoded data URI
         @raises {ValueError} - If image encoding fails
         """
+        frame_base64: str = base64.b64encode(
+            self.encode_image_to_bytes(frame, encoding, quality)
+        ).decode("utf-8")
+        return f"data:image/jpeg;base64,{frame_base64}"
+
+    def encode_image_to_bytes(self, frame: np.ndarray, encoding: str = ".jpg", quality: Optional[int] = None) -> bytes:
+        """
+        Encode numpy array image to raw image bytes (sent as a Socket.IO binary attachment).
+        
+        @param {np.ndarray} frame - OpenCV image array (BGR format)
+        @param {str} encoding - Image encoding format (default: .jpg)
+        @param {int} quality - JPEG quality (1-100, default: the codec's, Config.IMAGE_QUALITY)
+        @return {bytes} - Encoded image bytes
+        @raises {ValueError} - If image encoding fails
+        """
         try:
-            # Encode with quality parameter for JPEG
-            encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality] if encoding == ".jpg" else []
-            success, buffer = cv2.imencode(encoding, frame, encode_params)
+            if encoding == ".jpg":
+                return self.codec.encode(frame, quality)
+            success, buffer = cv2.imencode(encoding, frame)
             
             if not success:
                 raise ValueError("Image encoding failed")
             
-            frame_base64: str = base64.b64encode(buffer).decode("utf-8")
-            return f"data:image/jpeg;base64,{frame_base64}"
+            return buffer.tobytes()
         except Exception as e:
-            raise ValueError(f"Failed to encode image: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Failed to encode image: {str(e)}")
+
+    @staticmethod
+    def motion_thumbnail(frame: np.ndarray, size: Tuple[int, int] = (32, 24)) -> np.ndarray:
+        """
+        Tiny grayscale version of a frame used to measure motion between frames.
+        
+        @param {np.ndarray} frame - OpenCV image array (BGR format)
+        @param {Tuple[int, int]} size - Thumbnail (width, height)
+        @return {np.ndarray} - uint8 grayscale thumbnail
+        """
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
\ No newline at end of file
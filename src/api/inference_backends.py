@@ -0,0 +1,502 @@
+import ast
+import glob
+import logging
+import os
+import threading
+import time
+import numpy as np
+import cv2
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Backend names accepted by Config.INFERENCE_BACKEND / create_backend
+BACKENDS = ("auto", "pytorch", "torchscript", "onnx", "openvino", "synthetic")
+
+# Quantized ONNX variants written next to the weights by src/training/quantize.py
+# (best.pt -> best.onnx, best.fp16.onnx, best.int8_dynamic.onnx, best.int8_static.onnx)
+MODEL_VARIANTS = {
+    "fp32": ".onnx",
+    "fp16": ".fp16.onnx",
+    "int8_dynamic": ".int8_dynamic.onnx",
+    "int8_static": ".int8_static.onnx"
+}
+
+
+class InferenceBackend:
+    """
+    Common interface of the model runtimes used by ModelLoader.
+
+    A backend takes a list of images and returns, for every image, a float32
+    array of shape (N, 6) with rows [x1, y1, x2, y2, confidence, class_id] in
+    the pixel coordinates of that image.
+
+    Channel-order contract: images are handed over exactly as decoded, BGR
+    HWC uint8 (OpenCV order), and the backend converts them to the model's
+    layout in its own single pre-processing pass (ultralytics flips BGR numpy
+    inputs itself, exported graphs in `letterbox`). Callers never convert.
+    """
+
+    name: str = "base"
+    stride: int = 32
+    names: Dict[int, str] = {}
+
+    def predict(self, imgs: List[np.ndarray], imgsz: int, conf: float) -> List[np.ndarray]:
+        """
+        Run detection on a batch of images.
+
+        @param {List[np.ndarray]} imgs - Input images, BGR HWC uint8
+        @param {int} imgsz - Inference size (already a multiple of `stride`)
+        @param {float} conf - Confidence threshold
+        @return {List[np.ndarray]} - One (N, 6) float32 array per image
+        """
+        raise NotImplementedError
+
+
+class UltralyticsBackend(InferenceBackend):
+    """Runs `.pt` (PyTorch) or `.torchscript` weights through `ultralytics.YOLO`."""
+
+    def __init__(self, model_path: str):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.name = "torchscript" if model_path.endswith(".torchscript") else "pytorch"
+        try:
+            self.stride = int(max(np.ravel(getattr(self.model.model, "stride", 32))))
+        except Exception:
+            self.stride = 32
+        self.names = {int(k): v for k, v in (getattr(self.model, "names", None) or {}).items()}
+
+    def predict(self, imgs: List[np.ndarray], imgsz: int, conf: float) -> List[np.ndarray]:
+        results = self.model.predict(source=imgs, imgsz=imgsz, conf=conf, verbose=False)
+        outputs = []
+        for result in results:
+            boxes = getattr(result, "boxes", None)
+            if boxes is None:
+                outputs.append(np.zeros((0, 6), dtype=np.float32))
+                continue
+            data = boxes.data
+            data = data.cpu().numpy() if hasattr(data, "cpu") else np.asarray(data)
+            outputs.append(data[:, :6].astype(np.float32, copy=False))
+        return outputs
+
+
+class ExportedModelBackend(InferenceBackend):
+    """
+    Shared pre/post-processing for exported YOLO graphs (ONNX Runtime, OpenVINO).
+
+    Pre-processing mirrors ultralytics: letterbox to a square `imgsz` canvas padded
+    with gray (114), BGR -> RGB, HWC -> CHW, scale to [0, 1]. Every image is
+    letterboxed straight into its slot of a batch tensor that is allocated once
+    per input size (and thread) and reused for every later batch. Post-processing
+    decodes the raw (B, 4 + nc, anchors) head output and runs vectorized NumPy NMS.
+    """
+
+    iou_threshold: float = 0.7
+    max_det: int = 300
+
+    # Fixed input size / batch of the exported graph (None when dynamic)
+    fixed_imgsz: Optional[int] = None
+    fixed_batch: Optional[int] = None
+
+    def __init__(self):
+        # imgsz -> (uint8 canvas, float32 batch tensor), per thread calling predict
+        self._buffers = threading.local()
+
+    def predict(self, imgs: List[np.ndarray], imgsz: int, conf: float) -> List[np.ndarray]:
+        imgsz = self.fixed_imgsz or imgsz
+        step = self.fixed_batch or len(imgs)
+        canvas, batch = self._input_buffers(imgsz, step)
+
+        raw_outputs, letterboxes = [], []
+        for start in range(0, len(imgs), step):
+            chunk = imgs[start:start + step]
+            for index, img in enumerate(chunk):
+                _, ratio, pad = letterbox(img, imgsz, out=batch[index], canvas=canvas)
+                letterboxes.append((ratio, pad))
+            if self.fixed_batch:
+                # a fixed-batch graph only takes exactly fixed_batch rows: pad a short chunk
+                # with blank images and drop their outputs
+                batch[len(chunk):step].fill(0.0)
+                raw_outputs.extend(self._run(batch[:step])[:len(chunk)])
+            else:
+                raw_outputs.extend(self._run(batch[:len(chunk)]))
+
+        outputs = []
+        for raw, (ratio, pad), img in zip(raw_outputs, letterboxes, imgs):
+            outputs.append(postprocess(raw, conf, self.iou_threshold, self.max_det, ratio, pad, img.shape[:2]))
+        return outputs
+
+    def _input_buffers(self, imgsz: int, batch_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Get this thread's letterbox canvas and (at least batch_size, 3, imgsz, imgsz) input tensor."""
+        buffers = getattr(self._buffers, "by_size", None)
+        if buffers is None:
+            buffers = self._buffers.by_size = {}
+        canvas, batch = buffers.get(imgsz, (None, None))
+        if canvas is None:
+            canvas = np.empty((imgsz, imgsz, 3), dtype=np.uint8)
+        if batch is None or len(batch) < batch_size:
+            batch = np.empty((batch_size, 3, imgsz, imgsz), dtype=np.float32)
+        buffers[imgsz] = (canvas, batch)
+        return canvas, batch
+
+    def _run(self, batch: np.ndarray) -> List[np.ndarray]:
+        """Run the graph on a (B, 3, H, W) float32 batch; return one (4 + nc, anchors) array per image."""
+        raise NotImplementedError
+
+    def _read_metadata(self, metadata: Dict[str, str]) -> None:
+        """Pick up stride and class names written by the ultralytics exporter."""
+        try:
+            self.stride = int(metadata.get("stride", self.stride))
+        except (TypeError, ValueError):
+            pass
+        names = metadata.get("names")
+        if names:
+            try:
+                parsed = ast.literal_eval(names) if isinstance(names, str) else names
+                self.names = {int(k): v for k, v in parsed.items()}
+            except Exception:
+                pass
+
+
+class OnnxRuntimeBackend(ExportedModelBackend):
+    """Runs an exported `.onnx` graph with ONNX Runtime (CPU by default)."""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, providers: Optional[List[str]] = None):
+        super().__init__()
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The 'onnx' backend requires the onnxruntime package (pip install onnxruntime)") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=providers or ["CPUExecutionProvider"]
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, _ = model_input.shape
+        self.fixed_batch = batch if isinstance(batch, int) else None
+        self.fixed_imgsz = height if isinstance(height, int) else None
+        self._read_metadata(self.session.get_modelmeta().custom_metadata_map)
+
+    def _run(self, batch: np.ndarray) -> List[np.ndarray]:
+        return list(self.session.run(None, {self.input_name: batch})[0])
+
+
+class OpenVINOBackend(ExportedModelBackend):
+    """Runs an exported `*_openvino_model/` directory (or `.xml` file) with OpenVINO on CPU."""
+
+    name = "openvino"
+
+    def __init__(self, model_path: str, device: str = "CPU"):
+        super().__init__()
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise ImportError("The 'openvino' backend requires the openvino package (pip install openvino)") from e
+
+        xml_path = model_path
+        if os.path.isdir(model_path):
+            candidates = sorted(glob.glob(os.path.join(model_path, "*.xml")))
+            if not candidates:
+                raise FileNotFoundError(f"No OpenVINO .xml model found in {model_path}")
+            xml_path = candidates[0]
+
+        core = ov.Core()
+        model = core.read_model(xml_path)
+        model_input = model.inputs[0]
+        shape = model_input.get_partial_shape()
+        self.fixed_batch = shape[0].get_length() if shape[0].is_static else None
+        self.fixed_imgsz = shape[2].get_length() if shape[2].is_static else None
+        self.compiled = core.compile_model(model, device)
+        self._read_metadata(_read_openvino_metadata(os.path.dirname(xml_path)))
+
+    def _run(self, batch: np.ndarray) -> List[np.ndarray]:
+        return list(self.compiled(batch)[self.compiled.output(0)])
+
+
+class SyntheticBackend(InferenceBackend):
+    """
+    Model-free backend for load tests and benchmarks on CPU-only machines.
+
+    Returns SYNTHETIC_DETECTIONS random boxes per image after sleeping
+    SYNTHETIC_LATENCY_MS per batch plus SYNTHETIC_PER_IMAGE_MS per image, so the
+    rest of the pipeline (decode, batching, drawing, encoding, transport) can be
+    measured without weights or a deep learning runtime. The model file is not read.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, detections: int = 5, latency_ms: float = 0.0, per_image_ms: float = 0.0, seed: int = 0):
+        """
+        @param {int} detections - Boxes returned per image
+        @param {float} latency_ms - Simulated time of one forward pass
+        @param {float} per_image_ms - Simulated extra time per image of the batch
+        @param {int} seed - Seed of the box generator
+        """
+        self.detections = detections
+        self.latency = latency_ms / 1000.0
+        self.per_image = per_image_ms / 1000.0
+        self.names = {i: f"class_{i}" for i in range(10)}
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_env(cls) -> "SyntheticBackend":
+        """Build the backend from the SYNTHETIC_* environment variables (inherited by workers)."""
+        return cls(
+            detections=int(os.getenv("SYNTHETIC_DETECTIONS", 5)),
+            latency_ms=float(os.getenv("SYNTHETIC_LATENCY_MS", 0)),
+            per_image_ms=float(os.getenv("SYNTHETIC_PER_IMAGE_MS", 0))
+        )
+
+    def predict(self, imgs: List[np.ndarray], imgsz: int, conf: float) -> List[np.ndarray]:
+        delay = self.latency + self.per_image * len(imgs)
+        if delay > 0:
+            time.sleep(delay)
+        results = []
+        for img in imgs:
+            h, w = img.shape[:2]
+            xy = self._rng.random((self.detections, 2)) * (w * 0.8, h * 0.8)
+            wh = self._rng.random((self.detections, 2)) * (w * 0.2, h * 0.2) + 4
+            boxes = np.empty((self.detections, 6), dtype=np.float32)
+            boxes[:, 0:2] = xy
+            boxes[:, 2:4] = np.minimum(xy + wh, (w - 1, h - 1))
+            boxes[:, 4] = self._rng.uniform(max(conf, 0.01), 1.0, self.detections)
+            boxes[:, 5] = self._rng.integers(0, len(self.names), self.detections)
+            results.append(boxes)
+        return results
+
+
+def letterbox(
+    img: np.ndarray,
+    imgsz: int,
+    out: Optional[np.ndarray] = None,
+    canvas: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resize with unchanged aspect ratio and pad to a square imgsz canvas.
+
+    The image is resized straight into the canvas, only the padding is filled,
+    and BGR -> RGB, HWC -> CHW and the [0, 1] scaling happen in one pass into `out`.
+
+    @param {np.ndarray} img - HWC uint8 image (BGR, flipped to RGB here like ultralytics)
+    @param {int} imgsz - Side of the square model input
+    @param {np.ndarray} out - Optional (3, imgsz, imgsz) float32 array to write the tensor into
+    @param {np.ndarray} canvas - Optional (imgsz, imgsz, 3) uint8 scratch buffer
+    @return {Tuple} - (CHW float32 tensor in [0, 1], scale ratio, (pad_x, pad_y))
+    """
+    h, w = img.shape[:2]
+    ratio = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+
+    if canvas is None:
+        canvas = np.empty((imgsz, imgsz, 3), dtype=np.uint8)
+    canvas[:top] = 114
+    canvas[top + new_h:] = 114
+    canvas[top:top + new_h, :left] = 114
+    canvas[top:top + new_h, left + new_w:] = 114
+
+    region = canvas[top:top + new_h, left:left + new_w]
+    if (new_w, new_h) != (w, h):
+        cv2.resize(img, (new_w, new_h), dst=region, interpolation=cv2.INTER_LINEAR)
+    else:
+        region[...] = img
+
+    if out is None:
+        out = np.empty((3, imgsz, imgsz), dtype=np.float32)
+    np.divide(canvas[..., ::-1].transpose(2, 0, 1), np.float32(255.0), out=out)
+    return out, ratio, (pad_x, pad_y)
+
+
+def postprocess(
+    raw: np.ndarray,
+    conf: float,
+    iou_threshold: float,
+    max_det: int,
+    ratio: float,
+    pad: Tuple[float, float],
+    shape: Tuple[int, int]
+) -> np.ndarray:
+    """
+    Decode a raw YOLO head output into (N, 6) boxes in original image coordinates.
+
+    @param {np.ndarray} raw - (4 + nc, anchors) array of cx, cy, w, h and class scores
+    @param {float} conf - Confidence threshold
+    @param {float} iou_threshold - IoU threshold for class-aware NMS
+    @param {int} max_det - Maximum number of detections kept
+    @param {float} ratio - Letterbox scale ratio
+    @param {Tuple} pad - Letterbox padding (pad_x, pad_y)
+    @param {Tuple} shape - Original image (height, width)
+    @return {np.ndarray} - (N, 6) float32 rows [x1, y1, x2, y2, confidence, class_id]
+    """
+    predictions = raw.T
+    class_scores = predictions[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+    keep = scores > conf
+    if not keep.any():
+        return np.zeros((0, 6), dtype=np.float32)
+    predictions, scores, class_ids = predictions[keep], scores[keep], class_ids[keep]
+
+    boxes = np.empty((len(scores), 4), dtype=np.float32)
+    half_w, half_h = predictions[:, 2] / 2, predictions[:, 3] / 2
+    boxes[:, 0] = predictions[:, 0] - half_w
+    boxes[:, 1] = predictions[:, 1] - half_h
+    boxes[:, 2] = predictions[:, 0] + half_w
+    boxes[:, 3] = predictions[:, 1] + half_h
+
+    indices = nms(boxes, scores, class_ids, iou_threshold)[:max_det]
+    boxes, scores, class_ids = boxes[indices], scores[indices], class_ids[indices]
+
+    # undo letterbox
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / ratio
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / ratio
+    height, width = shape
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+
+    return np.concatenate(
+        [boxes, scores[:, None], class_ids[:, None].astype(np.float32)], axis=1
+    ).astype(np.float32)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Class-aware non-maximum suppression with vectorized IoU.
+
+    Boxes of different classes never suppress each other: each class is shifted
+    into its own coordinate range before a single greedy pass.
+
+    @return {np.ndarray} - Indices of kept boxes, highest score first
+    """
+    offsets = class_ids.astype(np.float32)[:, None] * (float(boxes.max()) + 1.0)
+    shifted = boxes + offsets
+    x1, y1, x2, y2 = shifted[:, 0], shifted[:, 1], shifted[:, 2], shifted[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        inter_w = (np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])).clip(0)
+        inter_h = (np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])).clip(0)
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def export_model(model_path: str, backend: str, imgsz: int = 640) -> str:
+    """
+    Export `.pt` weights for a runtime once and reuse the exported file afterwards.
+
+    The export is skipped when an exported model newer than the weights already
+    sits next to them.
+
+    @param {str} model_path - Path to the `.pt` weights
+    @param {str} backend - "onnx", "openvino" or "torchscript"
+    @param {int} imgsz - Export input size (ONNX is exported with dynamic axes)
+    @return {str} - Path of the exported model
+    """
+    stem = os.path.splitext(model_path)[0]
+    exported = {
+        "onnx": stem + ".onnx",
+        "openvino": stem + "_openvino_model",
+        "torchscript": stem + ".torchscript"
+    }[backend]
+
+    if os.path.exists(exported) and os.path.getmtime(exported) >= os.path.getmtime(model_path):
+        return exported
+
+    from ultralytics import YOLO
+
+    logger.info(f"Exporting {model_path} to {backend} (one-time)...")
+    kwargs = {"dynamic": True, "simplify": True} if backend == "onnx" else {}
+    return str(YOLO(model_path).export(format=backend, imgsz=imgsz, **kwargs))
+
+
+def resolve_variant_path(model_path: str, variant: Optional[str]) -> str:
+    """
+    Map `.pt` weights to one of their quantized ONNX variants.
+
+    @param {str} model_path - Path to the `.pt` weights (other paths are returned unchanged)
+    @param {str} variant - Key of MODEL_VARIANTS, or None/"" for the weights themselves
+    @return {str} - Path of the variant model
+    @raises FileNotFoundError - If the variant has not been produced yet
+    """
+    if not variant or not model_path.endswith(".pt"):
+        return model_path
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{variant}', expected one of {tuple(MODEL_VARIANTS)}")
+
+    variant_path = os.path.splitext(model_path)[0] + MODEL_VARIANTS[variant]
+    if not os.path.exists(variant_path):
+        raise FileNotFoundError(
+            f"Model variant '{variant}' not found at {variant_path}; run src/training/quantize.py first"
+        )
+    return variant_path
+
+
+def resolve_backend(model_path: str, backend: str = "auto") -> str:
+    """Pick the backend for a model path; "auto" infers it from the file name."""
+    backend = (backend or "auto").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+    if backend != "auto":
+        return backend
+
+    path = model_path.rstrip("/\\")
+    if path.endswith(".onnx"):
+        return "onnx"
+    if path.endswith("_openvino_model") or path.endswith(".xml"):
+        return "openvino"
+    if path.endswith(".torchscript"):
+        return "torchscript"
+    return "pytorch"
+
+
+def create_backend(model_path: str, backend: str = "auto") -> InferenceBackend:
+    """
+    Load a model with the requested backend, exporting `.pt` weights first if needed.
+
+    @param {str} model_path - `.pt`, `.torchscript`, `.onnx` or `*_openvino_model` path
+    @param {str} backend - One of BACKENDS
+    @return {InferenceBackend} - Ready-to-use backend
+    """
+    backend = resolve_backend(model_path, backend)
+
+    if backend == "synthetic":
+        return SyntheticBackend.from_env()
+    if backend != "pytorch" and model_path.endswith(".pt"):
+        model_path = export_model(model_path, backend)
+
+    if backend == "onnx":
+        return OnnxRuntimeBackend(model_path)
+    if backend == "openvino":
+        return OpenVINOBackend(model_path)
+    return UltralyticsBackend(model_path)
+
+
+def _read_openvino_metadata(model_dir: str) -> Dict[str, str]:
+    """Read the metadata.yaml the ultralytics exporter writes next to OpenVINO models."""
+    metadata_path = os.path.join(model_dir, "metadata.yaml")
+    if not os.path.exists(metadata_path):
+        return {}
+    try:
+        import yaml
+
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    except Exception:
+        return {}
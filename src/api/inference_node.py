@@ -0,0 +1,197 @@
+import logging
+import signal
+import threading
+import time
+import uuid
+from typing import List
+
+import socketio
+
+from config import Config
+from frame_queue import FrameQueue, LiveFrame
+from frame_gate import FrameGate
+from model_registry import ModelRegistry
+from tracker import SessionTracker
+from log_setup import configure_logging
+
+configure_logging(Config)
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceNode:
+    """
+    Serves the frames queued by Socket.IO front ends in scale-out mode (LIVE_WORK_QUEUE).
+
+    Pulls batches of live frames (or single `image` requests) from the FrameQueue,
+    runs them through an in-process DetectionService exactly like the live batch
+    scheduler does, and emits every result to its session through the Socket.IO
+    message queue, so it reaches the client whichever front end holds it. Run as
+    many nodes as the model needs; the front ends hold no model at all.
+    """
+
+    def __init__(self, config: Config):
+        """
+        @param {Config} config - Application configuration (model, live batching and scale-out settings)
+        """
+        if not config.SOCKETIO_MESSAGE_QUEUE or not config.LIVE_WORK_QUEUE:
+            raise ValueError("An inference node needs both SOCKETIO_MESSAGE_QUEUE and LIVE_WORK_QUEUE")
+        self.config = config
+        self.node_id = uuid.uuid4().hex[:12]
+        self.queue = FrameQueue(config.LIVE_WORK_QUEUE, ttl_s=config.LIVE_QUEUE_TTL_S)
+        # emits into the message queue the front ends listen on (Flask-SocketIO's default channel)
+        self.emitter = socketio.RedisManager(config.SOCKETIO_MESSAGE_QUEUE, channel="flask-socketio", write_only=True)
+        self.registry = ModelRegistry(config)
+        self.max_batch_size = max(1, config.BATCH_MAX_SIZE)
+        self.max_wait = max(0.0, config.BATCH_MAX_WAIT_MS) / 1000.0
+        self.stop_event = threading.Event()
+        # sessions of the batch being processed, whose claims the heartbeat keeps alive
+        self._in_flight: List[str] = []
+
+        # statistics
+        self._frames = 0
+        self._images = 0
+        self._batches = 0
+        self._inference_seconds = 0.0
+
+    def run(self) -> None:
+        """Load the model, then serve queued frames until `stop_event` is set."""
+        self.registry.load_initial()
+        logger.info(f"✓ Inference node {self.node_id} ready: {self.registry.current}, startup {self.registry.startup}")
+        if self.config.MODEL_WATCH_INTERVAL_S > 0:
+            self.registry.watch(self.config.MODEL_WATCH_INTERVAL_S)
+        threading.Thread(target=self._heartbeat, daemon=True, name="node-heartbeat").start()
+
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    work = self.queue.take(self.max_batch_size, self.max_wait)
+                except Exception as e:
+                    logger.error(f"Failed to take work from the queue: {e}")
+                    self.stop_event.wait(1.0)
+                    continue
+                if work is None:
+                    continue
+                kind, items = work
+                if kind == "image":
+                    self._run_image(items)
+                elif items:
+                    self._run_live(items)
+        finally:
+            self.queue.leave(self.node_id)
+            self.registry.stop()
+            logger.info(f"Inference node {self.node_id} stopped after {self._frames} live frames, {self._images} images")
+
+    def _run_live(self, batch: List[LiveFrame]) -> None:
+        """One batched forward pass over the taken frames, like BatchScheduler._process_batch."""
+        config = self.config
+        sids = [sid for sid, _, _, _, _, _ in batch]
+        self._in_flight = sids
+        options = [opts for _, _, opts, _, _, _ in batch]
+        trackers, gates = [], []
+        for _, _, opts, _, tracker, gate in batch:
+            if opts.get("tracking"):
+                trackers.append(tracker or SessionTracker(config.TRACKING_DETECT_INTERVAL, config.TRACKING_MOTION_THRESHOLD))
+                gates.append(None)
+            elif config.FRAME_GATE_THRESHOLD > 0:
+                trackers.append(None)
+                gates.append(gate or FrameGate(config.FRAME_GATE_THRESHOLD, config.FRAME_GATE_MAX_STALE_MS))
+            else:
+                trackers.append(None)
+                gates.append(None)
+
+        started = time.time()
+        try:
+            service = self.registry.get_service()
+            results = service.process_frames_bytes_live_batch(
+                [frame for _, frame, _, _, _, _ in batch],
+                target_size=config.LIVE_TARGET_SIZE,
+                options=options,
+                trackers=trackers,
+                gates=gates
+            )
+        except Exception as e:
+            logger.error(f"Batch inference failed for {len(batch)} frames: {e}")
+            results = [e] * len(batch)
+        self._inference_seconds += time.time() - started
+        self._batches += 1
+        self._frames += len(batch)
+
+        try:
+            self.queue.save_states({
+                sid: (tracker, gate) for sid, tracker, gate in zip(sids, trackers, gates)
+                if tracker is not None or gate is not None
+            })
+        except Exception as e:
+            logger.error(f"Failed to store session state: {e}")
+
+        for (sid, _, opts, enqueued_at, _, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                self._emit("response_back", {"error": str(result)}, sid)
+                continue
+            timings = result.pop("timings", None)
+            if timings is not None and opts.get("timings"):
+                attached = dict(timings, queue=(started - enqueued_at) * 1000.0, total=(time.time() - enqueued_at) * 1000.0)
+                result["timings"] = {stage: round(ms, 3) for stage, ms in attached.items()}
+            self._emit("response_binary" if opts.get("protocol") == "binary" else "response_back", result, sid)
+
+        # only now may the sessions' next frames be taken (by any node)
+        self._in_flight = []
+        self.queue.release(sids)
+
+    def _run_image(self, request: dict) -> None:
+        """Answer one base64 `image` request like SocketIOHandlers.handle_image."""
+        sid = request["sid"]
+        self._images += 1
+        try:
+            result = self.registry.get_service().process_frame(request["data"])
+        except Exception as e:
+            logger.error(f"Error processing frame: {e}")
+            self._emit("response_back", {"error": str(e)}, sid)
+            return
+        timings = result.pop("timings", None)
+        if timings is not None and request["options"].get("timings"):
+            result["timings"] = {stage: round(ms, 3) for stage, ms in timings.items()}
+        self._emit("response_back", result, sid)
+
+    def _emit(self, event: str, data: dict, sid: str) -> None:
+        try:
+            self.emitter.emit(event, data, to=sid)
+        except Exception as e:
+            logger.error(f"Failed to emit live result to {sid}: {e}")
+
+    def _heartbeat(self) -> None:
+        """Keep this node counted by the front ends, its claims alive, and log throughput every 30 s."""
+        last_log, last_frames = time.monotonic(), 0
+        while not self.stop_event.is_set():
+            current = self.registry.current or {}
+            service = self.registry.get_service()
+            try:
+                self.queue.heartbeat(self.node_id, {
+                    "class_names": dict(service.model.class_names) if service is not None else {},
+                    "model_version": current.get("model_version")
+                })
+                self.queue.extend_claims(self._in_flight)
+            except Exception as e:
+                logger.warning(f"Inference node heartbeat failed: {e}")
+            if time.monotonic() - last_log >= 30:
+                elapsed = time.monotonic() - last_log
+                logger.info(
+                    f"Inference node {self.node_id}: {(self._frames - last_frames) / elapsed:.1f} live frames/s, "
+                    f"{self._batches} batches, avg batch inference "
+                    f"{self._inference_seconds * 1000.0 / max(1, self._batches):.1f} ms, {self._images} images"
+                )
+                last_log, last_frames = time.monotonic(), self._frames
+            self.stop_event.wait(2.0)
+
+
+def main():
+    """Main entry point of an inference node"""
+    node = InferenceNode(Config())
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: node.stop_event.set())
+    node.run()
+
+
+if __name__ == "__main__":
+    main()
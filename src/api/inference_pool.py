@@ -0,0 +1,637 @@
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _model_info(service) -> dict:
+    return {"class_names": dict(service.model.class_names), "model_version": service.model.model_version}
+
+
+def _worker_main(
+    worker_id: int,
+    conn,
+    shm_name: str,
+    warmup: tuple,
+    model_path: str,
+    backend: str,
+    variant: str
+) -> None:
+    """
+    Entry point of an inference worker process.
+
+    Loads and warms up the model once (`warmup` is (sizes, batch_size)), then serves tasks sent over `conn` until it receives None:
+      ("live", [(offset, length, options, slot, tracker, gate), ...], target_size)
+                                                              -> ("live", (results, trackers, gates))
+      ("image", base64_data)                                  -> ("stats", {...}), ("image", result)
+      ("images", [(offset, length), ...], (imagesz, conf, annotate))  -> ("images", results)
+    and model swap control messages (answered as they come, between tasks):
+      ("stage", (model_path, backend, variant, warmup))       -> ("staged", {"ok", ...})
+      ("activate",) / ("rollback",) / ("undo_activate",)      -> ("activated", {"ok", ...})
+      ("discard",)                                            -> (no reply)
+    Live frame bytes are read straight out of the worker's shared-memory input buffer
+    and resized into the session's frame-ring slot when the task carries one.
+    """
+    # spawned workers share the parent's resource tracker, so attaching does not take ownership
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        from config import Config
+        from detection_service import DetectionService
+        from result_cache import create_result_cache
+        from jpeg_codec import create_jpeg_codec
+        from log_setup import configure_logging
+
+        configure_logging(Config)
+
+        # one cache per worker, shared by the models it swaps between (keys carry the model version)
+        result_cache = create_result_cache(Config)
+        codec = create_jpeg_codec(Config)
+
+        def build_service(path, model_backend, model_variant):
+            return DetectionService(
+                path,
+                backend=model_backend,
+                variant=model_variant or None,
+                result_cache=result_cache,
+                cache_frames=Config.RESULT_CACHE_FRAMES,
+                codec=codec
+            )
+
+        service = build_service(model_path, backend, variant)
+        warmup_seconds = service.warmup(*warmup)
+        conn.send(("ready", {**_model_info(service), "warmup_seconds": warmup_seconds}))
+    except Exception as e:
+        conn.send(("error", f"Worker {worker_id} failed to load model: {e}"))
+        shm.close()
+        return
+
+    # `restore` is the `previous` replaced by the last activation, for undo_activate
+    staged = previous = restore = None
+
+    try:
+        while True:
+            task = conn.recv()
+            if task is None:
+                break
+
+            kind = task[0]
+            if kind == "live":
+                _, items, target_size = task
+                frames = [shm.buf[offset:offset + length] for offset, length, _, _, _, _ in items]
+                trackers = [tracker for _, _, _, _, tracker, _ in items]
+                gates = [gate for _, _, _, _, _, gate in items]
+                try:
+                    results = service.process_frames_bytes_live_batch(
+                        frames,
+                        target_size=target_size,
+                        options=[options for _, _, options, _, _, _ in items],
+                        slots=[slot for _, _, _, slot, _, _ in items],
+                        trackers=trackers,
+                        gates=gates
+                    )
+                except Exception as e:
+                    results = [e] * len(items)
+                finally:
+                    # memoryviews into the shared buffer must be released before the next write
+                    for frame in frames:
+                        try:
+                            frame.release()
+                        except BufferError:
+                            pass
+                results = [Exception(str(r)) if isinstance(r, Exception) else r for r in results]
+                # trackers and gates were updated in place and travel back to the scheduler
+                conn.send(("live", (results, trackers, gates)))
+            elif kind == "images":
+                _, items, (imagesz, conf, annotate) = task
+                images = [shm.buf[offset:offset + length] for offset, length in items]
+                try:
+                    results = service.detect_images(images, imagesz=imagesz, conf=conf, annotate=annotate)
+                except Exception as e:
+                    results = [e] * len(items)
+                finally:
+                    for image in images:
+                        try:
+                            image.release()
+                        except BufferError:
+                            pass
+                conn.send(("images", [Exception(str(r)) if isinstance(r, Exception) else r for r in results]))
+            elif kind == "image":
+                try:
+                    result = service.process_frame(task[1])
+                except Exception as e:
+                    result = Exception(str(e))
+                if service.model.result_cache is not None:
+                    conn.send(("stats", {"result_cache": service.model.result_cache.get_stats()}))
+                conn.send(("image", result))
+            elif kind == "stage":
+                path, model_backend, model_variant, staged_warmup = task[1]
+                try:
+                    staged = build_service(path, model_backend, model_variant)
+                    staged.warmup(*staged_warmup)
+                    conn.send(("staged", {"ok": True, **_model_info(staged)}))
+                except Exception as e:
+                    staged = None
+                    conn.send(("staged", {"ok": False, "error": f"Worker {worker_id}: {e}"}))
+            elif kind == "activate":
+                if staged is None:
+                    # e.g. respawned after staging: it would keep serving the old model
+                    conn.send(("activated", {"ok": False, "error": f"Worker {worker_id}: no staged model"}))
+                else:
+                    restore = previous
+                    service, previous, staged = staged, service, None
+                    conn.send(("activated", {"ok": True, **_model_info(service)}))
+            elif kind == "undo_activate":
+                if previous is not None:
+                    service, previous, restore = previous, restore, None
+                conn.send(("activated", {"ok": True, **_model_info(service)}))
+            elif kind == "rollback":
+                if previous is None:
+                    conn.send(("activated", {"ok": False, "error": f"Worker {worker_id}: no previous model"}))
+                else:
+                    service, previous = previous, service
+                    conn.send(("activated", {"ok": True, **_model_info(service)}))
+            elif kind == "discard":
+                staged = None
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        shm.close()
+
+
+class _Worker:
+    """Parent-side handle of one worker process."""
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.process = None
+        self.conn = None
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.ready = False
+        self.failed = False
+        self.busy = False
+        self.callback: Optional[Callable] = None
+        self.task_kind = ""
+        self.task_size = 0
+        self.batches = 0
+        self.frames = 0
+        self.restarts = 0
+        # latest statistics reported by the worker (e.g. its result cache)
+        self.reported: dict = {}
+        self.model_version: Optional[str] = None
+        # model swap: a staging worker gets no tasks while it loads the new model
+        self.staging = False
+        self.control_event = threading.Event()
+        self.control_reply: Optional[dict] = None
+        # tasks (event loop) and control messages (registry thread) share the pipe
+        self.send_lock = threading.Lock()
+
+
+class InferencePool:
+    """
+    Pool of inference worker processes.
+
+    Each worker loads the model once and owns a shared-memory input buffer.
+    The Socket.IO process only copies incoming frame bytes into an idle
+    worker's buffer, sends a small task message over a pipe and routes the
+    results back by `sid` when they arrive, so decoding, inference and
+    encoding never run on (or block) the eventlet hub.
+
+    New weights are swapped in two phases: `stage_model` loads and warms them
+    up in one worker at a time (that worker takes no tasks meanwhile, the
+    others keep serving), then `activate_model` switches every worker between
+    two batches. The previous model stays loaded for `rollback_model`.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        model_path: str,
+        start_background_task: Callable,
+        sleep: Callable[[float], None] = time.sleep,
+        backend: str = "auto",
+        variant: str = "",
+        input_buffer_mb: float = 16,
+        warmup_sizes: tuple = (),
+        warmup_batch: int = 1
+    ):
+        """
+        @param {int} num_workers - Number of worker processes
+        @param {str} model_path - Model weights loaded by every worker
+        @param {Callable} start_background_task - Starts the result listener (e.g. socketio.start_background_task)
+        @param {Callable} sleep - Cooperative sleep used while polling worker pipes
+        @param {str} backend - Inference backend (Config.INFERENCE_BACKEND)
+        @param {str} variant - Quantized model variant (Config.MODEL_VARIANT)
+        @param {float} input_buffer_mb - Size of each worker's shared-memory frame buffer
+        @param {tuple} warmup_sizes - Inference sizes every worker warms up before reporting ready
+        @param {int} warmup_batch - Batch size also warmed up at each of those sizes
+        """
+        self.num_workers = max(1, int(num_workers))
+        # weights workers are (re)spawned with, and those active before the last activation
+        self.model_args = (model_path, backend, variant)
+        self.previous_model_args: Optional[tuple] = None
+        self._staged_args: Optional[tuple] = None
+        self.start_background_task = start_background_task
+        self.sleep = sleep
+        self.buffer_size = int(input_buffer_mb * 1024 * 1024)
+        self.warmup = (tuple(warmup_sizes), warmup_batch)
+
+        self.ready = threading.Event()
+        self.class_names: Dict[int, str] = {}
+        self.model_version: Optional[str] = None
+        self.load_error: Optional[str] = None
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = [_Worker(i) for i in range(self.num_workers)]
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self) -> None:
+        """Spawn the worker processes and start listening for their results."""
+        for worker in self._workers:
+            worker.shm = shared_memory.SharedMemory(create=True, size=self.buffer_size)
+            self._spawn(worker)
+        self.start_background_task(self._listen)
+
+    def close(self) -> None:
+        """Stop the workers and release their shared-memory buffers."""
+        self._closed = True
+        for worker in self._workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except Exception:
+                pass
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            if worker.shm is not None:
+                worker.shm.close()
+                worker.shm.unlink()
+                worker.shm = None
+
+    def has_idle_worker(self) -> bool:
+        """Whether a batch can be submitted right now."""
+        return any(w.ready and not w.busy and not w.staging for w in self._workers)
+
+    def submit_batch(
+        self,
+        frames: List[bytes],
+        options: List[dict],
+        target_size: int,
+        callback: Callable,
+        slots: Optional[List] = None,
+        trackers: Optional[List] = None,
+        gates: Optional[List] = None
+    ) -> bool:
+        """
+        Hand a live batch to an idle worker.
+
+        Frames that do not fit in the worker's input buffer get an error result instead.
+
+        @param {List[bytes]} frames - Raw encoded frames
+        @param {List[dict]} options - Per-frame session options
+        @param {int} target_size - Longest side used for live inference
+        @param {Callable} callback - Called as callback(results, trackers, gates) with one result (dict
+            or Exception) per frame and the updated session trackers and gates (None if the worker failed)
+        @param {List[FrameSlot]} slots - Optional per-frame frame-ring slots the worker decodes into
+        @param {List[SessionTracker]} trackers - Optional per-frame session trackers (tracking mode)
+        @param {List[FrameGate]} gates - Optional per-frame near-duplicate frame gates
+        @return {bool} - False if no worker was idle
+        """
+        worker = self._acquire()
+        if worker is None:
+            return False
+
+        slots = slots or [None] * len(frames)
+        trackers = trackers or [None] * len(frames)
+        gates = gates or [None] * len(frames)
+        items, placement = [], []
+        for position, frame_options, slot, tracker, gate in zip(
+            self._copy_to_buffer(worker, frames), options, slots, trackers, gates
+        ):
+            if position is None:
+                placement.append(None)
+                continue
+            items.append((*position, frame_options, slot, tracker, gate))
+            placement.append(len(items) - 1)
+
+        def unplace(values):
+            return [values[i] if i is not None else None for i in placement] if values is not None else None
+
+        def on_done(payload):
+            results, updated_trackers, updated_gates = payload if isinstance(payload, tuple) else (payload, None, None)
+            callback(
+                [results[i] if i is not None else ValueError("Frame exceeds worker input buffer") for i in placement],
+                unplace(updated_trackers),
+                unplace(updated_gates)
+            )
+
+        if not items:
+            self._release(worker)
+            on_done(([], [], []))
+            return True
+
+        return self._send(worker, ("live", items, target_size), on_done, len(items))
+
+    def submit_image(self, data: str, callback: Callable) -> bool:
+        """
+        Run a base64 frame (text `image` event) on an idle worker.
+
+        @param {str} data - Base64-encoded image data
+        @param {Callable} callback - Called with the result dict or Exception
+        @return {bool} - False if no worker was idle
+        """
+        worker = self._acquire()
+        if worker is None:
+            return False
+        return self._send(worker, ("image", data), callback, 1)
+
+    def submit_images(
+        self,
+        images: List[bytes],
+        imagesz: int,
+        conf: float,
+        annotate: bool,
+        callback: Callable
+    ) -> bool:
+        """
+        Hand a chunk of still images (HTTP batch endpoint) to an idle worker.
+
+        Images that do not fit in the worker's input buffer get an error result instead.
+
+        @param {List[bytes]} images - Encoded images
+        @param {int} imagesz - Inference size
+        @param {float} conf - Confidence threshold
+        @param {bool} annotate - Also return annotated images
+        @param {Callable} callback - Called with one result (dict or Exception) per image
+        @return {bool} - False if no worker was idle
+        """
+        worker = self._acquire()
+        if worker is None:
+            return False
+
+        positions = self._copy_to_buffer(worker, images)
+        items = [position for position in positions if position is not None]
+
+        def on_done(results):
+            results = iter(results)
+            callback([
+                next(results) if position is not None else ValueError("Image exceeds worker input buffer")
+                for position in positions
+            ])
+
+        if not items:
+            self._release(worker)
+            on_done([])
+            return True
+
+        return self._send(worker, ("images", items, (imagesz, conf, annotate)), on_done, len(items))
+
+    def get_stats(self) -> dict:
+        """Per-worker state and throughput."""
+        return {
+            "workers": self.num_workers,
+            "ready": self.ready.is_set(),
+            "idle": sum(1 for w in self._workers if w.ready and not w.busy),
+            "per_worker": [
+                {
+                    "worker_id": w.worker_id,
+                    "pid": w.process.pid if w.process is not None else None,
+                    "ready": w.ready,
+                    "failed": w.failed,
+                    "busy": w.busy,
+                    "batches": w.batches,
+                    "frames": w.frames,
+                    "restarts": w.restarts,
+                    "model_version": w.model_version,
+                    "staging": w.staging,
+                    **w.reported
+                }
+                for w in self._workers
+            ]
+        }
+
+    def stage_model(
+        self,
+        model_path: str,
+        backend: str,
+        variant: str,
+        warmup_sizes: tuple = (320,),
+        timeout: float = 600
+    ) -> None:
+        """
+        Load and warm up new weights next to the active model in every worker, one worker
+        at a time. Blocking; call it from a background thread.
+
+        @raises {RuntimeError} - If any worker failed to load the model (staged copies are discarded)
+        """
+        for worker in self._workers:
+            worker.staging = True
+            try:
+                # wait for the worker's current batch, it gets no new one while staging
+                while worker.busy and not self._closed:
+                    time.sleep(0.005)
+                reply = self._control(worker, ("stage", (model_path, backend, variant, (tuple(warmup_sizes), self.warmup[1]))), timeout)
+            finally:
+                worker.staging = False
+            if not reply.get("ok"):
+                self._broadcast(("discard",))
+                raise RuntimeError(reply.get("error", "Model staging failed"))
+        self._staged_args = (model_path, backend, variant)
+
+    def activate_model(self) -> None:
+        """
+        Switch every worker to its staged model (between two of its batches).
+
+        @raises {RuntimeError} - If any worker could not switch (the others are switched back)
+        """
+        self._switch(("activate",), ("undo_activate",))
+        # workers restarted from now on load the new weights
+        self.previous_model_args, self.model_args = self.model_args, self._staged_args
+        self._staged_args = None
+
+    def rollback_model(self) -> None:
+        """
+        Switch every worker back to the model it ran before the last activation.
+
+        @raises {RuntimeError} - If any worker could not switch back, e.g. one restarted after
+            the activation and holds no previous model (the others are switched forward again)
+        """
+        if self.previous_model_args is None:
+            raise RuntimeError("No previous model to roll back to")
+        self._switch(("rollback",), ("rollback",))
+        self.model_args, self.previous_model_args = self.previous_model_args, self.model_args
+
+    def _switch(self, message: tuple, undo: tuple) -> None:
+        """
+        Send a model switch to every worker; if any of them fails, send `undo` to those that
+        already switched, so the pool never serves two models at once.
+        """
+        switched, errors, reply = [], [], {}
+        for worker in self._workers:
+            reply = self._control(worker, message, 60)
+            if not reply.get("ok"):
+                errors.append(reply.get("error", ""))
+                break
+            switched.append(worker)
+        if errors:
+            for worker in switched:
+                undone = self._control(worker, undo, 60)
+                if not undone.get("ok"):
+                    # the crash handler respawns it on model_args, the weights the pool still serves
+                    logger.error(f"Worker {worker.worker_id} could not undo {message[0]}, restarting it")
+                    worker.process.terminate()
+            raise RuntimeError("; ".join(errors))
+        self.class_names = reply["class_names"]
+        self.model_version = reply["model_version"]
+
+    def _control(self, worker: _Worker, message: tuple, timeout: float) -> dict:
+        """Send a control message to a worker and wait for its reply."""
+        worker.control_event.clear()
+        worker.control_reply = None
+        try:
+            with worker.send_lock:
+                worker.conn.send(message)
+        except Exception as e:
+            return {"ok": False, "error": f"Worker {worker.worker_id}: {e}"}
+        if not worker.control_event.wait(timeout):
+            return {"ok": False, "error": f"Worker {worker.worker_id} did not answer {message[0]}"}
+        return worker.control_reply or {"ok": False, "error": "No reply"}
+
+    def _broadcast(self, message: tuple) -> None:
+        for worker in self._workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(message)
+            except Exception:
+                pass
+
+    def _spawn(self, worker: _Worker) -> None:
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        worker.conn = parent_conn
+        worker.ready = False
+        worker.busy = False
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.worker_id, child_conn, worker.shm.name, self.warmup, *self.model_args),
+            daemon=True,
+            name=f"inference-worker-{worker.worker_id}"
+        )
+        worker.process.start()
+        child_conn.close()
+
+    def _copy_to_buffer(self, worker: _Worker, frames: List[bytes]) -> List[Optional[tuple]]:
+        """Copy frames back to back into the worker's input buffer; (offset, length) or None if it did not fit."""
+        positions, offset = [], 0
+        for frame in frames:
+            length = len(frame)
+            if offset + length > self.buffer_size:
+                positions.append(None)
+                continue
+            worker.shm.buf[offset:offset + length] = frame
+            positions.append((offset, length))
+            offset += length
+        return positions
+
+    def _acquire(self) -> Optional[_Worker]:
+        with self._lock:
+            for worker in self._workers:
+                if worker.ready and not worker.busy and not worker.staging:
+                    worker.busy = True
+                    return worker
+        return None
+
+    def _release(self, worker: _Worker) -> None:
+        with self._lock:
+            worker.busy = False
+            worker.callback = None
+
+    def _send(self, worker: _Worker, task: tuple, callback: Callable, size: int) -> bool:
+        worker.callback = callback
+        worker.task_kind = task[0]
+        worker.task_size = size
+        try:
+            with worker.send_lock:
+                worker.conn.send(task)
+        except Exception as e:
+            logger.error(f"Failed to send task to worker {worker.worker_id}: {e}")
+            self._release(worker)
+            return False
+        return True
+
+    def _listen(self) -> None:
+        """Poll worker pipes for results without blocking the event loop."""
+        while not self._closed:
+            handled = False
+            for worker in self._workers:
+                try:
+                    if worker.conn.poll(0):
+                        self._handle_message(worker, worker.conn.recv())
+                        handled = True
+                    elif not worker.process.is_alive():
+                        self._handle_crash(worker)
+                except (EOFError, OSError):
+                    self._handle_crash(worker)
+            if not handled:
+                self.sleep(0.002)
+
+    def _handle_message(self, worker: _Worker, message: tuple) -> None:
+        kind, payload = message
+        if kind == "ready":
+            worker.ready = True
+            worker.model_version = payload["model_version"]
+            worker.reported["warmup_seconds"] = round(payload["warmup_seconds"], 3)
+            self.class_names = payload["class_names"]
+            self.model_version = payload["model_version"]
+            if all(w.ready for w in self._workers):
+                self.ready.set()
+                logger.info(f"✓ {self.num_workers} inference workers ready")
+            return
+        if kind == "error":
+            worker.failed = True
+            self.load_error = payload
+            logger.error(payload)
+            return
+        if kind == "stats":
+            worker.reported.update(payload)
+            return
+        if kind in ("staged", "activated"):
+            if kind == "activated" and payload.get("ok"):
+                worker.model_version = payload["model_version"]
+            worker.control_reply = payload
+            worker.control_event.set()
+            return
+
+        callback = worker.callback
+        worker.batches += 1
+        worker.frames += worker.task_size
+        self._release(worker)
+        if callback is not None:
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Result callback failed for worker {worker.worker_id}: {e}")
+
+    def _handle_crash(self, worker: _Worker) -> None:
+        """Fail the task a dead worker was running and start a replacement process."""
+        if self._closed or worker.failed:
+            return
+        logger.error(f"Inference worker {worker.worker_id} died, restarting")
+        callback, kind, size = worker.callback, worker.task_kind, worker.task_size
+        self._release(worker)
+        if callback is not None:
+            error = RuntimeError("Inference worker crashed")
+            try:
+                callback([error] * size if kind in ("live", "images") else error)
+            except Exception as e:
+                logger.error(f"Result callback failed for worker {worker.worker_id}: {e}")
+        worker.restarts += 1
+        if worker.staging:
+            worker.control_reply = {"ok": False, "error": f"Worker {worker.worker_id} crashed"}
+            worker.control_event.set()
+        self._spawn(worker)
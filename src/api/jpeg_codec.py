@@ -0,0 +1,207 @@
+import logging
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# DCT-domain reduction factors both libjpeg-turbo and OpenCV's IMREAD_REDUCED_* support
+REDUCTIONS = (8, 4, 2)
+
+SUBSAMPLINGS = ("444", "422", "420", "gray")
+
+# OpenCV rotates by the EXIF orientation by default; libjpeg-turbo does not, and the
+# size read from the start-of-frame header is that of the unrotated image
+_CV2_COLOR = cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+_CV2_REDUCED = {
+    2: cv2.IMREAD_REDUCED_COLOR_2 | cv2.IMREAD_IGNORE_ORIENTATION,
+    4: cv2.IMREAD_REDUCED_COLOR_4 | cv2.IMREAD_IGNORE_ORIENTATION,
+    8: cv2.IMREAD_REDUCED_COLOR_8 | cv2.IMREAD_IGNORE_ORIENTATION
+}
+
+# start-of-frame markers (baseline, progressive, ...); C4/C8/CC are DHT/JPG/DAC
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read the (width, height) of a JPEG from its start-of-frame header without decoding it.
+
+    @param {bytes} data - Encoded image
+    @return {Tuple[int, int]} - None when `data` is not a (parsable) JPEG
+    """
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    position = 2
+    while position + 9 < len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:  # fill byte
+            position += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height = (data[position + 5] << 8) | data[position + 6]
+            width = (data[position + 7] << 8) | data[position + 8]
+            return (width, height) if width and height else None
+        if marker == 0xD9 or marker == 0xDA:  # end of image / start of scan before any SOF
+            return None
+        position += 2 + ((data[position + 2] << 8) | data[position + 3])
+    return None
+
+
+def pick_reduction(width: int, height: int, max_side: int) -> int:
+    """
+    Largest DCT reduction factor that keeps the longest side at least `max_side`,
+    so the decoded image only ever needs to be shrunk further, never enlarged.
+
+    @return {int} - 1, 2, 4 or 8
+    """
+    longest = max(width, height)
+    for factor in REDUCTIONS:
+        if -(-longest // factor) >= max_side:
+            return factor
+    return 1
+
+
+class JpegCodec:
+    """
+    JPEG encoding and decoding through libjpeg-turbo (PyTurboJPEG) when it is
+    installed, OpenCV otherwise.
+
+    `decode(data, max_side)` uses libjpeg's DCT-domain scaling (1/2, 1/4, 1/8):
+    a 1080p frame needed at 320 px is decoded straight to 480x270 instead of
+    building the full image and shrinking it. Both paths produce BGR arrays and,
+    like PIL, ignore EXIF orientation. Images that are not JPEG (PNG, WebP, ...)
+    always go through OpenCV.
+    """
+
+    def __init__(
+        self,
+        quality: int = 90,
+        subsampling: str = "420",
+        fast_dct: bool = False,
+        backend: str = "auto"
+    ):
+        """
+        @param {int} quality - Default JPEG quality (1-100)
+        @param {str} subsampling - Chroma subsampling of encoded frames: "444", "422", "420" or "gray"
+        @param {bool} fast_dct - Use the faster, slightly less accurate integer DCT (and fast upsampling)
+        @param {str} backend - "auto" (turbojpeg if available), "turbojpeg" or "opencv"
+        @raises {ValueError} - On an unknown subsampling or backend
+        """
+        if subsampling not in SUBSAMPLINGS:
+            raise ValueError(f"Unknown JPEG subsampling '{subsampling}' (expected one of {', '.join(SUBSAMPLINGS)})")
+        if backend not in ("auto", "turbojpeg", "opencv"):
+            raise ValueError(f"Unknown JPEG codec backend '{backend}'")
+        self.quality = quality
+        self.subsampling = subsampling
+        self.fast_dct = fast_dct
+        self._turbo = self._load_turbojpeg() if backend != "opencv" else None
+        if self._turbo is None and backend == "turbojpeg":
+            logger.warning("turbojpeg requested but not available, falling back to OpenCV for JPEG")
+        self.backend = "turbojpeg" if self._turbo is not None else "opencv"
+
+        if self._turbo is not None:
+            import turbojpeg
+            self._turbo_bgr = turbojpeg.TJPF_BGR
+            self._turbo_subsampling = {
+                "444": turbojpeg.TJSAMP_444,
+                "422": turbojpeg.TJSAMP_422,
+                "420": turbojpeg.TJSAMP_420,
+                "gray": turbojpeg.TJSAMP_GRAY
+            }[subsampling]
+            self._turbo_flags = turbojpeg.TJFLAG_FASTDCT | turbojpeg.TJFLAG_FASTUPSAMPLE if fast_dct else 0
+        else:
+            sampling = {
+                "444": getattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR_444", None),
+                "422": getattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR_422", None),
+                "420": getattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR_420", None)
+            }.get(subsampling)
+            # "gray" and OpenCV builds without the sampling option keep OpenCV's default (4:2:0)
+            self._cv2_params = (
+                [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, sampling]
+                if sampling is not None and hasattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR") else []
+            )
+
+    @staticmethod
+    def _load_turbojpeg():
+        try:
+            from turbojpeg import TurboJPEG
+            return TurboJPEG()
+        except (ImportError, RuntimeError, OSError):
+            # PyTurboJPEG missing, or installed without the libturbojpeg shared library
+            return None
+
+    def decode(self, data: bytes, max_side: Optional[int] = None) -> Tuple[Optional[np.ndarray], Tuple[int, int]]:
+        """
+        Decode an image to a BGR array, reduced in the DCT domain when only a smaller
+        version is needed.
+
+        The result's longest side is at least `max_side` (or the original size if it
+        is smaller); callers resize the rest of the way.
+
+        @param {bytes} data - Encoded image (JPEG, PNG, ...)
+        @param {int} max_side - Longest side the caller will shrink the image to (None: full size)
+        @return {Tuple} - (BGR array or None if undecodable, (original width, original height))
+        """
+        size = jpeg_dimensions(data)
+        factor = pick_reduction(size[0], size[1], max_side) if size is not None and max_side else 1
+
+        if size is not None and self._turbo is not None:
+            try:
+                frame = self._turbo.decode(
+                    data,
+                    pixel_format=self._turbo_bgr,
+                    scaling_factor=(1, factor) if factor > 1 else None,
+                    flags=self._turbo_flags
+                )
+                return frame, size
+            except (OSError, ValueError) as e:
+                # e.g. CMYK or truncated JPEGs; OpenCV is more lenient
+                logger.debug("turbojpeg decode failed (%s), retrying with OpenCV", e)
+
+        npimg = np.frombuffer(data, dtype=np.uint8)
+        frame = cv2.imdecode(npimg, _CV2_REDUCED[factor] if factor > 1 else _CV2_COLOR)
+        if frame is None:
+            return None, size or (0, 0)
+        return frame, size or (frame.shape[1], frame.shape[0])
+
+    def encode(self, frame: np.ndarray, quality: Optional[int] = None) -> bytes:
+        """
+        Encode a BGR array as JPEG with the codec's subsampling.
+
+        @param {np.ndarray} frame - BGR image
+        @param {int} quality - JPEG quality (1-100, default: the codec's)
+        @return {bytes} - JPEG bytes
+        @raises {ValueError} - If encoding fails
+        """
+        quality = self.quality if quality is None else quality
+        if self._turbo is not None:
+            return self._turbo.encode(
+                np.ascontiguousarray(frame),
+                quality=quality,
+                pixel_format=self._turbo_bgr,
+                jpeg_subsample=self._turbo_subsampling,
+                flags=self._turbo_flags
+            )
+        success, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality] + self._cv2_params)
+        if not success:
+            raise ValueError("Image encoding failed")
+        return buffer.tobytes()
+
+
+def create_jpeg_codec(config) -> JpegCodec:
+    """
+    Build the JPEG codec described by the configuration.
+
+    @param {Config} config - Application configuration (IMAGE_QUALITY and JPEG_* settings)
+    @return {JpegCodec}
+    """
+    return JpegCodec(
+        quality=config.IMAGE_QUALITY,
+        subsampling=config.JPEG_SUBSAMPLING,
+        fast_dct=config.JPEG_FAST_DCT,
+        backend=config.JPEG_CODEC
+    )
@@ -0,0 +1,175 @@
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+# Pipeline stages timed per frame, in pipeline order ("total" is submit -> emitted)
+STAGES = ("queue", "decode", "inference", "postprocess", "draw", "encode", "emit", "total")
+
+# Upper bounds (ms) of the Prometheus histogram buckets
+BUCKETS_MS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500, 1000, 2500, 5000)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """
+    Latency distribution of one stage.
+
+    Keeps cumulative Prometheus buckets (count/sum since start) and a rolling
+    window of the latest samples from which p50/p95/p99 are computed on read,
+    so recording a sample is a deque append and a short bucket scan.
+    """
+
+    def __init__(self, window: int = 512, buckets: bool = True):
+        """
+        @param {int} window - Number of latest samples the percentiles are computed over
+        @param {bool} buckets - Also keep cumulative buckets (only needed for /metrics)
+        """
+        self.samples = deque(maxlen=window)
+        self.bucket_counts = [0] * (len(BUCKETS_MS) + 1) if buckets else None
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        """Record one sample (milliseconds)."""
+        self.samples.append(value_ms)
+        self.count += 1
+        self.sum += value_ms
+        if self.bucket_counts is not None:
+            for i, bound in enumerate(BUCKETS_MS):
+                if value_ms <= bound:
+                    self.bucket_counts[i] += 1
+                    return
+            self.bucket_counts[-1] += 1
+
+    def quantiles(self) -> Dict[float, float]:
+        """Get p50/p95/p99 (ms) of the rolling window."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+    def get_stats(self) -> dict:
+        """Percentiles of the rolling window plus the all-time count and mean."""
+        quantiles = self.quantiles()
+        return {
+            "count": self.count,
+            "mean_ms": self.sum / self.count if self.count else 0.0,
+            "p50_ms": quantiles[0.5],
+            "p95_ms": quantiles[0.95],
+            "p99_ms": quantiles[0.99]
+        }
+
+
+class LatencyMetrics:
+    """
+    Per-stage latency of live frames, overall and per session.
+
+    Stages are timed where they run (the detection service, possibly in a worker
+    process, reports decode/inference/postprocess/draw/encode in the result's
+    "timings"; the scheduler adds queue, emit and total) and recorded here once
+    the result was emitted. Exposed as JSON (`get_stats`) and in the Prometheus
+    text format (`render_prometheus`).
+    """
+
+    def __init__(self, window: int = 512, session_window: int = 128):
+        """
+        @param {int} window - Samples per stage the overall percentiles are computed over
+        @param {int} session_window - Samples per stage kept for each session
+        """
+        self.window = window
+        self.session_window = session_window
+        self._overall: Dict[str, LatencyHistogram] = {stage: LatencyHistogram(window) for stage in STAGES}
+        self._sessions: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, sid: Optional[str], timings: Dict[str, float]) -> None:
+        """
+        Record the stage timings of one frame.
+
+        @param {str} sid - Session the frame belongs to (None for overall only)
+        @param {Dict[str, float]} timings - Stage -> milliseconds; stages a frame skipped are absent
+        """
+        with self._lock:
+            session = None
+            if sid is not None:
+                session = self._sessions.get(sid)
+                if session is None:
+                    session = self._sessions[sid] = {}
+            for stage, value in timings.items():
+                histogram = self._overall.get(stage)
+                if histogram is None:
+                    continue
+                histogram.observe(value)
+                if session is not None:
+                    if stage not in session:
+                        session[stage] = LatencyHistogram(self.session_window, buckets=False)
+                    session[stage].observe(value)
+
+    def remove_session(self, sid: str) -> None:
+        """Forget the per-session histograms of a disconnected session."""
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def get_session_ids(self) -> list:
+        """Sessions with per-session histograms."""
+        with self._lock:
+            return list(self._sessions)
+
+    def get_stats(self, sessions: bool = True) -> dict:
+        """
+        Get per-stage percentiles.
+
+        @param {bool} sessions - Include the per-session breakdown
+        @return {dict} - {"overall": {stage: stats}, "sessions": {sid: {stage: stats}}}
+        """
+        with self._lock:
+            stats = {"overall": {stage: h.get_stats() for stage, h in self._overall.items() if h.count}}
+            if sessions:
+                stats["sessions"] = {
+                    sid: {stage: h.get_stats() for stage, h in stages.items()}
+                    for sid, stages in self._sessions.items()
+                }
+            return stats
+
+    def render_prometheus(self, gauges: Optional[Iterable] = None) -> str:
+        """
+        Render the overall histograms in the Prometheus text exposition format.
+
+        Stage latencies are exported in seconds as the histogram
+        `live_frame_stage_seconds` and the summary `live_frame_stage_quantile_seconds`
+        (percentiles of the rolling window).
+
+        @param {Iterable} gauges - Extra (name, help, value) gauges to append (e.g. queue depth)
+        @return {str} - Exposition text
+        """
+        lines = [
+            "# HELP live_frame_stage_seconds Latency of each live pipeline stage per frame.",
+            "# TYPE live_frame_stage_seconds histogram"
+        ]
+        quantile_lines = [
+            "# HELP live_frame_stage_quantile_seconds Rolling percentiles of each live pipeline stage.",
+            "# TYPE live_frame_stage_quantile_seconds summary"
+        ]
+        with self._lock:
+            for stage, histogram in self._overall.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS_MS, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'live_frame_stage_seconds_bucket{{stage="{stage}",le="{bound / 1000:g}"}} {cumulative}')
+                lines.append(f'live_frame_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'live_frame_stage_seconds_sum{{stage="{stage}"}} {histogram.sum / 1000:.6f}')
+                lines.append(f'live_frame_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+                for q, value in histogram.quantiles().items():
+                    quantile_lines.append(
+                        f'live_frame_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} {value / 1000:.6f}'
+                    )
+            active_sessions = len(self._sessions)
+        lines.extend(quantile_lines)
+
+        gauges = list(gauges or []) + [("live_sessions_tracked", "Sessions with latency samples.", active_sessions)]
+        for name, help_text, value in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
@@ -1,30 +1,58 @@
-from flask import Flask
+import time
+
+# taken before the heavy imports below, so startup timings include them
+PROCESS_STARTED = time.perf_counter()
+
+from flask import Flask, Response, abort, request, stream_with_context
 from flask_socketio import SocketIO
 from config import Config 
-from detection_service import DetectionService 
 from socket_handlers import SocketIOHandlers
+from inference_pool import InferencePool
+from frame_ring import FrameRingPool
+from frame_queue import FrameQueue
+from session_store import create_session_store
+from session_manager import session_gauges
+from model_registry import ModelRegistry, warmup_sizes
+from batch_inference import BatchInferenceRunner, iter_request_images
+from log_setup import configure_logging
+import atexit
 import logging
+import os
 import threading
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+configure_logging(Config)
 
 logger = logging.getLogger(__name__)
 
 # Global variables for lazy loading
-detection_service = None
+model_registry = None
+inference_pool = None
+frame_rings = None
+frame_queue = None
 service_ready = threading.Event()
 
 def load_model_async(config: Config):
     """Load model asynchronously to avoid blocking server startup."""
-    global detection_service
     try:
-        logger.info("Loading detection model in background...")
-        detection_service = DetectionService(config.MODEL_PATH)
+        if frame_queue is not None:
+            # scale-out front end: the inference nodes serve the model
+            logger.info("Waiting for an inference node...")
+            while frame_queue.count_nodes() == 0:
+                time.sleep(1.0)
+            service_ready.set()
+            logger.info(f"✓ Inference nodes available: {frame_queue.count_nodes()}")
+            return
+        if inference_pool is not None:
+            logger.info(f"Starting {config.INFERENCE_WORKERS} inference workers in background...")
+        else:
+            logger.info("Loading detection model in background...")
+        model_registry.load_initial()
+        model_registry.startup["ready_seconds"] = round(time.perf_counter() - PROCESS_STARTED, 3)
         service_ready.set()
-        logger.info("✓ Detection model loaded successfully!")
+        logger.info(f"✓ Detection model loaded successfully! Startup timings: {model_registry.startup}")
+        if config.MODEL_WATCH_INTERVAL_S > 0:
+            model_registry.watch(config.MODEL_WATCH_INTERVAL_S)
+            logger.info(f"Watching {config.MODEL_PATH} for new weights")
     except Exception as e:
         logger.error(f"✗ Failed to load model: {e}")
 
@@ -40,9 +68,19 @@ def create_app(config: Config) -> tuple[Flask, SocketIO]:
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'your-secret-key-here'
 
+    # Several front ends share their clients through SOCKETIO_MESSAGE_QUEUE
+    global frame_queue
+    if config.LIVE_WORK_QUEUE:
+        if not config.SOCKETIO_MESSAGE_QUEUE:
+            raise ValueError("LIVE_WORK_QUEUE requires SOCKETIO_MESSAGE_QUEUE (inference nodes emit through it)")
+        frame_queue = FrameQueue(config.LIVE_WORK_QUEUE, ttl_s=config.LIVE_QUEUE_TTL_S)
+    session_store = create_session_store(config)
+    atexit.register(session_store.close)
+
     # Initialize SocketIO with optimized settings
     socketio = SocketIO(
         app, 
+        message_queue=config.SOCKETIO_MESSAGE_QUEUE or None,
         cors_allowed_origins=config.CORS_ALLOWED_ORIGINS,
         async_mode=config.ASYNC_MODE,
         max_http_buffer_size=config.MAX_HTTP_BUFFER_SIZE,
@@ -52,13 +90,57 @@ def create_app(config: Config) -> tuple[Flask, SocketIO]:
         engineio_logger=False
     )
 
+    # Preallocated shared-memory slots live frames are decoded into (closed after the workers)
+    global frame_rings
+    if config.FRAME_RING_BUDGET_MB > 0 and frame_queue is None:
+        frame_rings = FrameRingPool(
+            config.FRAME_RING_BUDGET_MB,
+            slots_per_session=config.FRAME_RING_SLOTS,
+            max_side=max((config.LIVE_TARGET_SIZE,) + (config.LIVE_RESOLUTIONS if config.LIVE_ADAPTIVE else ()))
+        )
+        atexit.register(frame_rings.close)
+
+    # Optionally move decoding/inference/encoding into separate worker processes
+    global inference_pool
+    if config.INFERENCE_WORKERS > 0 and frame_queue is None:
+        inference_pool = InferencePool(
+            config.INFERENCE_WORKERS,
+            config.MODEL_PATH,
+            socketio.start_background_task,
+            sleep=socketio.sleep,
+            backend=config.INFERENCE_BACKEND,
+            variant=config.MODEL_VARIANT,
+            input_buffer_mb=config.WORKER_INPUT_BUFFER_MB,
+            warmup_sizes=warmup_sizes(config),
+            warmup_batch=config.BATCH_MAX_SIZE
+        )
+        atexit.register(inference_pool.close)
+
+    # Owns the served model; reloads swap new weights in between batches
+    global model_registry
+    model_registry = ModelRegistry(config, pool=inference_pool)
+    model_registry.startup["import_seconds"] = round(time.perf_counter() - PROCESS_STARTED, 3)
+
     # Start model loading in background thread
     model_thread = threading.Thread(target=load_model_async, args=(config,), daemon=True)
     model_thread.start()
 
-    # Create handlers (will use global detection_service)
+    # Create handlers (fetch the current detection service from the registry)
     # Pass socketio so handlers can start background tasks and emit to sessions
-    handlers = SocketIOHandlers(lambda: detection_service, service_ready, socketio)
+    handlers = SocketIOHandlers(
+        model_registry.get_service, service_ready, socketio, config, pool=inference_pool, frame_rings=frame_rings,
+        session_store=session_store, frame_queue=frame_queue
+    )
+
+    # Runs uploaded image collections for POST /detect/batch
+    batch_runner = BatchInferenceRunner(
+        model_registry.get_service,
+        pool=inference_pool,
+        sleep=socketio.sleep,
+        batch_size=config.BATCH_INFER_SIZE,
+        max_in_flight=config.BATCH_INFER_MAX_IN_FLIGHT,
+        max_jobs=config.BATCH_INFER_MAX_JOBS
+    )
 
     @app.route("/")
     def home() -> str:
@@ -72,7 +154,9 @@ def create_app(config: Config) -> tuple[Flask, SocketIO]:
         return {
             "status": "healthy",
             "model_status": model_status,
-            "model_loaded": detection_service is not None and detection_service.model is not None,
+            "model_loaded": model_registry.current is not None,
+            "model_version": model_registry.current["model_version"] if model_registry.current else None,
+            "startup": model_registry.startup,
             "version": "1.0.0"
         }
     
@@ -100,6 +184,135 @@ def create_app(config: Config) -> tuple[Flask, SocketIO]:
             "status": "running"
         }
 
+    @app.route("/stats")
+    def stats() -> dict:
+        """Get live pipeline statistics (queue depth, batch fill)."""
+        return {
+            "batching": handlers.scheduler.get_stats(),
+            "workers": inference_pool.get_stats() if inference_pool is not None else None,
+            "frame_rings": frame_rings.get_stats() if frame_rings is not None else None,
+            "adaptive": handlers.controller.get_stats() if handlers.controller is not None else None,
+            # in worker mode every worker has its own cache, reported under workers.per_worker
+            "result_cache": (
+                model_registry.result_cache.get_stats() if model_registry.result_cache is not None else None
+            ),
+            "model": model_registry.get_status(),
+            "latency": handlers.metrics.get_stats() if handlers.metrics is not None else None,
+            "batch_inference": batch_runner.get_stats(),
+            "frame_queue": frame_queue.get_stats() if frame_queue is not None else None,
+            "sessions": handlers.get_session_stats()
+        }
+
+    @app.route("/metrics")
+    def metrics() -> Response:
+        """Per-stage frame latency histograms and pipeline gauges in the Prometheus text format."""
+        if handlers.metrics is None:
+            return Response("latency metrics are disabled (LATENCY_METRICS=0)\n", status=404, mimetype="text/plain")
+        text = handlers.metrics.render_prometheus([
+            ("live_queue_depth", "Sessions with a frame waiting for inference.", handlers.scheduler.get_queue_depth()),
+            ("live_active_clients", "Connected Socket.IO clients.", handlers.get_active_client_count()),
+            ("live_model_ready", "1 once the model is loaded and warmed up.", int(service_ready.is_set())),
+            *session_gauges(handlers.get_session_stats())
+        ])
+        return Response(text, mimetype="text/plain; version=0.0.4")
+
+    @app.route("/detect/batch", methods=["POST"])
+    def detect_batch():
+        """
+        Run many images through the model and stream one NDJSON line per image.
+
+        Body: multipart/form-data files (images and/or .tar/.zip archives), a raw tar
+        (application/x-tar, application/gzip) or zip (application/zip) archive, or one
+        raw image. Query: imgsz, conf, annotate=1 (adds the annotated image as "frame").
+        """
+        if frame_queue is not None:
+            return {"error": "The model is served by the inference nodes, run batches there (batch_infer.py)"}, 409
+        if not service_ready.is_set():
+            return {"error": "Model still loading..."}, 503
+        try:
+            imagesz = int(request.args.get("imgsz", config.BATCH_INFER_IMGSZ))
+            conf = float(request.args.get("conf", 0.25))
+        except ValueError:
+            return {"error": "imgsz must be an integer and conf a number"}, 400
+        if not 32 <= imagesz <= 4096 or not 0.0 <= conf <= 1.0:
+            return {"error": "imgsz must be within 32-4096 and conf within 0-1"}, 400
+        annotate = request.args.get("annotate", "0").lower() in ("1", "true", "yes")
+        if not batch_runner.try_start_job():
+            return {"error": "Too many batch requests in progress"}, 429
+
+        entries = iter_request_images(request, int(config.BATCH_INFER_MAX_IMAGE_MB * 1024 * 1024))
+        response = Response(
+            stream_with_context(batch_runner.run(entries, imagesz=imagesz, conf=conf, annotate=annotate)),
+            mimetype="application/x-ndjson"
+        )
+        response.call_on_close(batch_runner.finish_job)
+        return response
+
+    def require_admin() -> None:
+        """Reject admin requests without the configured token (localhost only when unset)."""
+        if config.ADMIN_TOKEN:
+            if request.headers.get("X-Admin-Token") != config.ADMIN_TOKEN:
+                abort(401)
+        elif request.remote_addr not in ("127.0.0.1", "::1"):
+            abort(403)
+
+    @app.route("/admin/model")
+    def model_status() -> dict:
+        """Get the serving and previous model and the state of any reload."""
+        require_admin()
+        return model_registry.get_status()
+
+    @app.route("/admin/model/reload", methods=["POST"])
+    def reload_model() -> tuple:
+        """
+        Load new weights in the background and swap them in once warmed up.
+
+        Body (JSON, all optional): {"model_path", "backend", "variant"}
+        """
+        require_admin()
+        if frame_queue is not None:
+            return {"error": "The model is served by the inference nodes, reload it there"}, 409
+        if not service_ready.is_set():
+            return {"error": "Model still loading..."}, 503
+        body = request.get_json(silent=True) or {}
+        if body.get("model_path") and not os.path.exists(body["model_path"]):
+            return {"error": f"Model not found: {body['model_path']}"}, 400
+        if not model_registry.reload(body.get("model_path"), body.get("backend"), body.get("variant")):
+            return {"error": "A model reload is already in progress"}, 409
+        return {"status": "loading", **model_registry.get_status()}, 202
+
+    @app.route("/admin/model/rollback", methods=["POST"])
+    def rollback_model() -> tuple:
+        """Switch back to the model that served before the last swap."""
+        require_admin()
+        if frame_queue is not None:
+            return {"error": "The model is served by the inference nodes, roll it back there"}, 409
+        try:
+            if not model_registry.rollback():
+                return {"error": "No previous model, or a reload is in progress"}, 409
+        except RuntimeError as e:
+            return {"error": str(e)}, 500
+        return model_registry.get_status(), 200
+
+    def announce_model_swaps() -> None:
+        """Tell connected clients when a reload or rollback switched the model."""
+        swaps = 0
+        while True:
+            socketio.sleep(1.0)
+            if model_registry.swaps != swaps:
+                swaps = model_registry.swaps
+                handlers.emit_model_changed(model_registry.current)
+
+    def sweep_sessions() -> None:
+        """Drop per-session state left behind by sessions that disconnected mid-frame."""
+        while True:
+            socketio.sleep(config.SESSION_SWEEP_INTERVAL_S)
+            handlers.sessions.sweep()
+
+    socketio.start_background_task(announce_model_swaps)
+    if config.SESSION_SWEEP_INTERVAL_S > 0:
+        socketio.start_background_task(sweep_sessions)
+
     logger.info("✓ Application initialized successfully (model loading in background)")
 
     return app, socketio
@@ -0,0 +1,148 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Optional
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is a structured field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and every `extra=` field."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record)
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The usual text format with `extra=` fields appended as key=value pairs."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = _fields(record)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `burst` WARNING-or-worse records per call site through every
+    `interval_s`, so a failure repeated on every frame logs a few lines instead
+    of thousands. The first record after a suppressed stretch carries the number
+    of dropped records as its `suppressed` field.
+    """
+
+    def __init__(self, burst: int = 5, interval_s: float = 10.0):
+        """
+        @param {int} burst - Records per call site and interval (0 disables the limit)
+        @param {float} interval_s - Length of the rate-limit window
+        """
+        super().__init__()
+        self.burst = burst
+        self.interval = interval_s
+        # (logger, file, line) -> [window start, records passed, records suppressed]
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                if site is not None and site[2]:
+                    record.suppressed = site[2]
+                self._sites[key] = [now, 1, 0]
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking (or raising) when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogSampler:
+    """
+    Lets one in `every` events through, for logs that would otherwise be written
+    for every frame. Call it and only log when it returns True.
+    """
+
+    def __init__(self, every: int = 100):
+        """
+        @param {int} every - Log 1 in `every` events (1 logs all of them)
+        """
+        self.every = max(1, int(every))
+        self._counter = itertools.count()
+
+    def __call__(self) -> bool:
+        return next(self._counter) % self.every == 0
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(config) -> None:
+    """
+    Route all logging through a bounded queue drained by a background thread.
+
+    Callers (the eventlet hub, the batch scheduler, inference workers) only pay
+    for building the record and a non-blocking put; formatting and the write
+    to stderr happen on the listener thread. WARNING-or-worse records are rate
+    limited per call site. Safe to call more than once per process.
+
+    @param {Config} config - Application configuration (LOG_* settings)
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL.upper())
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if config.LOG_FORMAT == "json" else TextFormatter(TEXT_FORMAT))
+
+    handler = DroppingQueueHandler(queue.Queue(config.LOG_QUEUE_SIZE))
+    handler.addFilter(RateLimitFilter(config.LOG_ERROR_BURST, config.LOG_ERROR_INTERVAL_S))
+    root.handlers[:] = [handler]
+
+    _listener = logging.handlers.QueueListener(handler.queue, output)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -1,8 +1,13 @@
+import logging
 import numpy as np
 import os
 import cv2
-import yaml
-from ultralytics import YOLO
+import hashlib
+from inference_backends import InferenceBackend, create_backend, resolve_variant_path
+from detections import Detections
+from result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
 
 class ModelLoader:
     """
@@ -10,28 +15,42 @@ class ModelLoader:
 
     This class abstracts model initialization, input preprocessing,
     and output postprocessing for both NumPy arrays and raw image bytes.
+    The model itself runs on a pluggable backend (see inference_backends):
+    PyTorch/TorchScript through ultralytics, or an exported ONNX Runtime /
+    OpenVINO graph with its own letterbox and NumPy NMS.
     """
-    def __init__(self, model_path):
+    def __init__(self, model_path, backend: str = "auto", variant: str = None, result_cache: ResultCache = None):
         """
         Initialize the YOLO model loader
 
-        @param {str} model_path - Absolute or relative path to the best trained YOLO model file __.pt. 
+        @param {str} model_path - Absolute or relative path to the best trained YOLO model file __.pt,
+            or to an exported model (.torchscript, .onnx, *_openvino_model).
+        @param {str} [backend="auto"] - "auto", "pytorch", "torchscript", "onnx", "openvino" or "synthetic".
+            "auto" picks the backend from the model file; any other backend exports __.pt weights once.
+        @param {str} [variant=None] - Quantized variant of __.pt weights to load instead
+            ("fp32", "fp16", "int8_dynamic", "int8_static"), as produced by src/training/quantize.py.
+        @param {ResultCache} [result_cache=None] - Optional cache of still-image results, keyed on the
+            image bytes, inference parameters and `model_version`.
         @raises FileNotFoundError - if the model file not exist in the path given.
         """
         model_path = os.path.abspath(model_path)
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model Path not found.. ${model_path}")
-        print(f"Loading Model Path from ${model_path} ... ")
-        self.model = YOLO(model_path)
+        model_path = resolve_variant_path(model_path, variant)
+        logger.info(f"Loading model from {model_path} ...")
+        self.backend: InferenceBackend = create_backend(model_path, backend)
+        self.model_path = model_path
+        self.model_version = self._compute_model_version(model_path, backend)
+        self.result_cache = result_cache
         # Attempt to load class names mapping from environment or dataset yaml
-        self.class_names = self._load_class_names()
+        self.class_names = self._load_class_names() or dict(self.backend.names)
         # print(self.model)
 
     def predict_ndarray(self, img: np.ndarray, imagesz: int = 320, conf: float = 0.25):
         """
         Perform Object Detection on NumPy array image.
 
-        @param {np.ndarray} img - Input image in RGB format (as read by OpenCV)
+        @param {np.ndarray} img - Input image in BGR format (as read by OpenCV)
         @param {int} imagesz - image size which should be resized after the input before inference
         @param {float} conf - confidence threshold for the model predictions.
 
@@ -48,53 +67,69 @@ class ModelLoader:
             }  
         """
 
-        # Ensure color space is RGB for the YOLO model (OpenCV gives BGR)
-        if img is not None and img.dtype == "uint8":
-            try:
-                img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            except Exception:
-                # if conversion fails, fall back to original
-                img_rgb = img
-        else:
-            img_rgb = img
-
-        # Adjust imagesz to be a multiple of model stride (common 32 for YOLO)
-        try:
-            stride = int(getattr(self.model.model, 'stride', 32))
-        except Exception:
-            stride = 32
+        return {"detections": self.detect(img, imagesz=imagesz, conf=conf).to_list()}
+
+    def predict_batch(self, imgs: list, imagesz: int = 320, conf: float = 0.25) -> list:
+        """
+        Perform Object Detection on several NumPy images in a single forward pass.
+
+        @param {list} imgs - Input images in BGR format (as read by OpenCV)
+        @param {int} imagesz - image size used for every image of the batch
+        @param {float} conf - confidence threshold for the model predictions.
+
+        @return {list} One result object per input image, in input order,
+            each with the same schema as `predict_ndarray`.
+        """
+        return [
+            {"detections": detections.to_list()}
+            for detections in self.detect_batch(imgs, imagesz=imagesz, conf=conf)
+        ]
+
+    def detect(self, img: np.ndarray, imagesz: int = 320, conf: float = 0.25) -> Detections:
+        """
+        Perform Object Detection and return columnar results.
+
+        Unlike `predict_ndarray`, no per-box dictionaries are built; call
+        `Detections.to_list()` only where the legacy schema is needed.
+
+        @param {np.ndarray} img - Input image in BGR format (as read by OpenCV)
+        @param {int} imagesz - image size which should be resized after the input before inference
+        @param {float} conf - confidence threshold for the model predictions.
+        @return {Detections} - xyxy / confidence / class_id arrays
+        """
+        return self.detect_batch([img], imagesz=imagesz, conf=conf)[0]
+
+    def detect_batch(self, imgs: list, imagesz: int = 320, conf: float = 0.25) -> list:
+        """
+        Columnar variant of `predict_batch`: one forward pass, one `Detections` per image.
+
+        Images go to the backend untouched: every backend takes BGR and converts
+        to the model's layout in its own pre-processing (see InferenceBackend).
+
+        @param {list} imgs - Input images in BGR format (as read by OpenCV)
+        @param {int} imagesz - image size used for every image of the batch
+        @param {float} conf - confidence threshold for the model predictions.
+        @return {list} - `Detections` per input image, in input order
+        """
+        if not imgs:
+            return []
+
+        results = self.backend.predict(imgs, imgsz=self._adjust_imgsz(imagesz), conf=conf)
+        return [Detections.from_array(boxes, self.class_names) for boxes in results]
+
+    @staticmethod
+    def _compute_model_version(model_path: str, backend: str) -> str:
+        """Short id of the loaded weights; changes whenever the weights file is replaced."""
+        stat = os.stat(model_path)
+        ident = f"{model_path}:{stat.st_size}:{stat.st_mtime_ns}:{backend}"
+        return hashlib.blake2b(ident.encode("utf-8"), digest_size=8).hexdigest()
+
+    def _adjust_imgsz(self, imagesz: int) -> int:
+        """Round imagesz up to a multiple of the model stride (common 32 for YOLO)."""
+        stride = self.backend.stride or 32
         if imagesz % stride != 0:
-            imagesz_adj = ((imagesz + stride - 1) // stride) * stride
-        else:
-            imagesz_adj = imagesz
-
-        results = self.model.predict(source=img_rgb, imgsz=imagesz_adj, conf=conf, verbose=False)
-        seggregated_result = results[0]
-        boxes = getattr(seggregated_result, "boxes", None)
-        detections = []
-
-        if boxes is None:
-            return {
-                "detections": [] 
-            }
-        
-        # Boxes are usually in format [x1, y1, x2, y2, conf, cls]
-        for box in boxes.data.tolist():
-            # be defensive about ordering; try to unpack common formats
-            if len(box) >= 6:
-                x1, y1, x2, y2, conf_score, cls = box[:6]
-            else:
-                # fallback: pad or skip malformed
-                continue
-            class_id = int(cls)
-            detections.append({
-                "class_Id": class_id,
-                "class_name": self.class_names.get(class_id, str(class_id)),
-                "confidence": float(conf_score),
-                "bbox": [float(x1), float(y1), float(x2), float(y2)]
-            })
-
-        return {"detections": detections}
+            return ((imagesz + stride - 1) // stride) * stride
+        return imagesz
 
     def _load_class_names(self) -> dict:
         """Try to load a class id -> name mapping.
@@ -104,6 +139,7 @@ class ModelLoader:
         - Else look for dataset/data.yaml in repo root
         - Else return an empty dict so we fall back to numeric ids
         """
+        import yaml  # only needed here, kept off the import path of the server
         # 1) env override
         class_path = os.getenv("CLASS_NAMES_PATH", "/app/model/classes.yaml")
         if class_path and os.path.exists(class_path):
@@ -136,7 +172,8 @@ class ModelLoader:
         """
         Perform object detection directly on raw image bytes
 
-        This method automatically decodes bytes into and openCv image.
+        This method automatically decodes bytes into and openCv image. With a result cache,
+        repeated images are answered from the cache without decoding or inference.
 
         @param {bytes} image_bytes - Image data in bytes form.
         @param {int} [imagesz=640] - image size which should be resized after the input before YOLO inference.
@@ -150,10 +187,20 @@ class ModelLoader:
    
             }
         """
+        key = None
+        if self.result_cache is not None:
+            key = ResultCache.make_key(image_bytes, imagesz, conf, self.model_version)
+            detections = self.result_cache.get(key)
+            if detections is not None:
+                return {"detections": detections.to_list()}
+
         npimg = np.frombuffer(image_bytes, dtype=np.uint8)
         img = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
 
         if img is None:
             return {"error": "could not decode image"}
 
-        return self.predict_ndarray(img, imgsz=imagesz, conf=conf)
\ No newline at end of file
+        detections = self.detect(img, imagesz=imagesz, conf=conf)
+        if key is not None:
+            self.result_cache.put(key, detections, detections.nbytes())
+        return {"detections": detections.to_list()}
@@ -0,0 +1,266 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+from config import Config
+from detection_service import DetectionService
+from inference_pool import InferencePool
+from result_cache import create_result_cache
+from jpeg_codec import create_jpeg_codec
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Owns the served model and swaps it without dropping connections.
+
+    A reload loads the new weights (or exported variant) in the background and
+    warms them up while the current model keeps serving, then switches them in
+    with a single reference swap. The batch scheduler fetches the service once
+    per batch, so a swap always lands between two batches and no frame is
+    lost. In worker mode the swap is delegated to the InferencePool (staged
+    per worker, activated everywhere at once). The previous model stays loaded
+    for an immediate rollback. Reloads are triggered through the admin
+    endpoints or by watching MODEL_PATH for new weights; `swaps` counts the
+    switches so the Socket.IO side can announce them from its own loop.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        pool: Optional[InferencePool] = None
+    ):
+        """
+        @param {Config} config - Application configuration (model and warm-up settings)
+        @param {InferencePool} pool - Optional worker pool that serves the model instead of this process
+        """
+        self.config = config
+        self.pool = pool
+        self.warmup_sizes = warmup_sizes(config)
+        self.warmup_batch = config.BATCH_MAX_SIZE
+
+        # shared by every loaded model; cache keys carry the model version
+        self.result_cache = create_result_cache(config) if pool is None else None
+        self.codec = create_jpeg_codec(config) if pool is None else None
+        self._service: Optional[DetectionService] = None
+        self._previous: Optional[DetectionService] = None
+        self.current: Optional[dict] = None
+        self.previous: Optional[dict] = None
+        self.swaps = 0
+
+        self._swap_lock = threading.Lock()
+        self.loading = False
+        self.last_error: Optional[str] = None
+        # seconds spent in each startup phase (see load_initial)
+        self.startup: dict = {}
+        self._watch_stop = threading.Event()
+
+    def get_service(self) -> Optional[DetectionService]:
+        """Get the detection service currently serving in this process (None in worker mode)."""
+        return self._service
+
+    def load_initial(self) -> None:
+        """
+        Load and warm up the configured model at startup (blocking).
+
+        Fills `startup` with the load and warm-up time; in worker mode both happen
+        inside the workers, which report their warm-up time in the pool stats.
+
+        @raises {Exception} - If the model (or any inference worker) failed to load
+        """
+        config = self.config
+        info = self._describe(config.MODEL_PATH, config.INFERENCE_BACKEND, config.MODEL_VARIANT)
+        started = time.perf_counter()
+        if self.pool is not None:
+            self.pool.start()
+            while not self.pool.ready.wait(0.5):
+                if self.pool.load_error:
+                    raise RuntimeError(self.pool.load_error)
+            info["model_version"] = self.pool.model_version
+            self.startup["workers_ready_seconds"] = round(time.perf_counter() - started, 3)
+        else:
+            service = self._build(config.MODEL_PATH, config.INFERENCE_BACKEND, config.MODEL_VARIANT)
+            self.startup["load_seconds"] = round(time.perf_counter() - started, 3)
+            if config.MODEL_WARMUP:
+                self.startup["warmup_seconds"] = round(service.warmup(self.warmup_sizes, self.warmup_batch), 3)
+            self._service = service
+            info["model_version"] = service.model.model_version
+        self.current = info
+
+    def reload(
+        self,
+        model_path: Optional[str] = None,
+        backend: Optional[str] = None,
+        variant: Optional[str] = None,
+        wait: bool = False
+    ) -> bool:
+        """
+        Load new weights in the background and swap them in once warmed up.
+
+        Arguments left out keep the values of the current model.
+
+        @param {str} model_path - New weights (.pt or exported model)
+        @param {str} backend - Inference backend for the new weights
+        @param {str} variant - Quantized variant of the new weights
+        @param {bool} wait - Block until the swap finished (or failed)
+        @return {bool} - False if another reload or rollback is still in progress
+        """
+        current = self.current or {}
+        args = (
+            model_path or current.get("model_path") or self.config.MODEL_PATH,
+            backend if backend is not None else current.get("backend", self.config.INFERENCE_BACKEND),
+            variant if variant is not None else current.get("variant", self.config.MODEL_VARIANT)
+        )
+        if not self._begin():
+            return False
+        thread = threading.Thread(target=self._reload, args=args, daemon=True, name="model-reload")
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def rollback(self) -> bool:
+        """
+        Switch back to the model that served before the last swap.
+
+        @return {bool} - False if there is no previous model or a reload is in progress
+        @raises {RuntimeError} - If the workers failed to switch back
+        """
+        if self.previous is None or not self._begin():
+            return False
+        try:
+            if self.pool is not None:
+                self.pool.rollback_model()
+            else:
+                self._service, self._previous = self._previous, self._service
+            self.current, self.previous = self.previous, self.current
+            self.swaps += 1
+            logger.info(f"✓ Rolled back to model {self.current['model_version']} ({self.current['model_path']})")
+        finally:
+            self.loading = False
+        return True
+
+    def watch(self, interval_s: float) -> None:
+        """
+        Reload automatically when the weights at MODEL_PATH are replaced.
+
+        A change is picked up once the file has been stable for one interval, so
+        weights still being copied are not loaded half-written.
+
+        @param {float} interval_s - Polling interval in seconds
+        """
+        thread = threading.Thread(target=self._watch, args=(interval_s,), daemon=True, name="model-watch")
+        thread.start()
+
+    def stop(self) -> None:
+        """Stop watching MODEL_PATH."""
+        self._watch_stop.set()
+
+    def get_status(self) -> dict:
+        """Current and previous model, and whether a reload is in progress."""
+        return {
+            "current": self.current,
+            "previous": self.previous,
+            "swaps": self.swaps,
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "startup": self.startup,
+            "worker_mode": self.pool is not None
+        }
+
+    def _begin(self) -> bool:
+        with self._swap_lock:
+            if self.loading:
+                return False
+            self.loading = True
+            return True
+
+    def _reload(self, model_path: str, backend: str, variant: str) -> None:
+        started = time.monotonic()
+        info = self._describe(model_path, backend, variant)
+        try:
+            logger.info(f"Loading new model in background: {model_path} (backend={backend}, variant={variant or '-'})")
+            if self.pool is not None:
+                self.pool.stage_model(model_path, backend, variant, self.warmup_sizes)
+                self.pool.activate_model()
+                info["model_version"] = self.pool.model_version
+                self._previous = None
+            else:
+                service = self._build(model_path, backend, variant)
+                service.warmup(self.warmup_sizes, self.warmup_batch)
+                info["model_version"] = service.model.model_version
+                # single reference swap: the next batch picks up the new model
+                self._previous, self._service = self._service, service
+            info["load_seconds"] = round(time.monotonic() - started, 3)
+            self.previous, self.current = self.current, info
+            self.swaps += 1
+            self.last_error = None
+            logger.info(f"✓ Swapped in model {info['model_version']} in {info['load_seconds']}s")
+        except Exception as e:
+            self.last_error = f"Failed to load {model_path}: {e}"
+            logger.error(f"✗ Model reload failed, keeping current model: {e}")
+        finally:
+            self.loading = False
+
+    def _watch(self, interval_s: float) -> None:
+        path = self.config.MODEL_PATH
+        last = self._stat(path)
+        pending = None
+        while not self._watch_stop.wait(interval_s):
+            stat = self._stat(path)
+            if stat is None or stat == last:
+                pending = None
+                continue
+            if stat != pending:
+                # changed since the last poll: wait until the copy has settled
+                pending = stat
+                continue
+            logger.info(f"Detected new weights at {path}, reloading")
+            if self.reload(model_path=path):
+                last, pending = stat, None
+
+    @staticmethod
+    def _stat(path: str):
+        try:
+            stat = os.stat(path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def _build(self, model_path: str, backend: str, variant: str) -> DetectionService:
+        return DetectionService(
+            model_path,
+            backend=backend,
+            variant=variant,
+            result_cache=self.result_cache,
+            cache_frames=self.config.RESULT_CACHE_FRAMES,
+            codec=self.codec
+        )
+
+    @staticmethod
+    def _describe(model_path: str, backend: str, variant: str) -> dict:
+        return {
+            "model_path": os.path.abspath(model_path),
+            "backend": backend,
+            "variant": variant,
+            "model_version": None,
+            "loaded_at": time.time()
+        }
+
+
+def warmup_sizes(config: Config) -> tuple:
+    """
+    Inference sizes a freshly loaded model is warmed up at: every live resolution
+    plus the still-image size (none when MODEL_WARMUP is off).
+
+    @param {Config} config - Application configuration
+    @return {tuple} - Sorted inference sizes
+    """
+    if not config.MODEL_WARMUP:
+        return ()
+    sizes = {config.LIVE_TARGET_SIZE, 320}
+    if config.LIVE_ADAPTIVE:
+        sizes.update(config.LIVE_RESOLUTIONS)
+    return tuple(sorted(sizes))
@@ -0,0 +1,150 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class ResultCache:
+    """
+    Content-addressed LRU/TTL cache for still-image results.
+
+    Keys are a BLAKE2b digest of the raw request payload plus the inference
+    parameters (imgsz, conf) and the version of the loaded weights, so a
+    repeated photo is answered without decoding it or running the model.
+    Memory is bounded by entry count and by the estimated size of the cached
+    values; entries also expire after `ttl_s`. Whenever a lookup comes with a
+    different model version than the cached entries, the cache is cleared.
+    """
+
+    def __init__(self, max_entries: int = 512, max_mb: float = 64, ttl_s: float = 600):
+        """
+        @param {int} max_entries - Maximum number of cached results
+        @param {float} max_mb - Upper bound on the estimated size of all cached values
+        @param {float} ttl_s - Seconds a result stays valid (0 keeps results until evicted)
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl_s
+
+        # key -> (value, size in bytes, stored at)
+        self._entries: "OrderedDict[Tuple, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._model_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def make_key(payload, imgsz: int, conf: float, model_version: str, kind: str = "detections") -> Tuple:
+        """
+        Build the cache key of a request.
+
+        @param {bytes|str} payload - Raw image bytes or base64 data URI as received
+        @param {int} imgsz - Inference size
+        @param {float} conf - Confidence threshold
+        @param {str} model_version - Version of the loaded weights (ModelLoader.model_version)
+        @param {str} kind - Namespace of the cached value (e.g. "detections", "image")
+        """
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        digest = hashlib.blake2b(payload, digest_size=16).digest()
+        return (kind, digest, int(imgsz), round(float(conf), 4), model_version)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        """
+        Look up a result.
+
+        @param {Tuple} key - Key from `make_key`
+        @return {Any} - The cached value, or None on a miss
+        """
+        with self._lock:
+            self._check_version(key[-1])
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            value, size, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                self._drop(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Tuple, value: Any, size: int) -> None:
+        """
+        Store a result, evicting least recently used entries to stay within bounds.
+
+        @param {Tuple} key - Key from `make_key`
+        @param {Any} value - Result to cache (treat as immutable once stored)
+        @param {int} size - Estimated size of the value in bytes
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(key[-1])
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        """Hit/miss and eviction counters plus current memory use."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl,
+                "model_version": self._model_version,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations
+            }
+
+    def _check_version(self, model_version: str) -> None:
+        """Clear the cache when the weights behind the requests changed."""
+        if model_version == self._model_version:
+            return
+        if self._entries:
+            self._invalidations += 1
+        self._entries.clear()
+        self._bytes = 0
+        self._model_version = model_version
+
+    def _drop(self, key: Tuple) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+def create_result_cache(config) -> Optional[ResultCache]:
+    """
+    Build the result cache described by the configuration.
+
+    @param {Config} config - Application configuration (RESULT_CACHE_* settings)
+    @return {ResultCache} - None when RESULT_CACHE_ENTRIES is 0
+    """
+    if config.RESULT_CACHE_ENTRIES <= 0:
+        return None
+    return ResultCache(config.RESULT_CACHE_ENTRIES, config.RESULT_CACHE_MB, config.RESULT_CACHE_TTL_S)
@@ -0,0 +1,156 @@
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from session_store import InMemorySessionStore
+
+logger = logging.getLogger(__name__)
+
+
+class SessionManager:
+    """
+    Owns the lifecycle of the Socket.IO sessions of this process.
+
+    Every component that keeps per-session state (batch scheduler, adaptive
+    controller, latency metrics, frame rings, work queue) registers how to drop
+    a session and, where it can, which sessions it currently holds. `close`
+    drops a session everywhere at once. Work already in flight for a closed
+    session is cancelled by its owner checking `is_live` (its results are
+    discarded, see `discard_result`). A frame finishing in the window between a
+    disconnect and that check can still recreate state for a dead session;
+    `sweep` (run periodically) finds those orphaned entries and drops them, so
+    per-session memory stays bounded by the number of live sessions.
+    """
+
+    def __init__(self, store=None):
+        """
+        @param {InMemorySessionStore|RedisSessionStore} store - Where session records are
+            kept (see session_store); defaults to this process' memory
+        """
+        self.store = store if store is not None else InMemorySessionStore()
+        # sids connected to this process (the store may span several front ends)
+        self._live: Set[str] = set()
+        # (name, drop a session, sessions currently held or None)
+        self._resources: List[Tuple[str, Callable[[str], None], Optional[Callable[[], Iterable[str]]]]] = []
+        self._lock = threading.Lock()
+
+        # statistics
+        self._opened = 0
+        self._closed = 0
+        self._orphans_reaped = 0
+        self._results_discarded = 0
+
+    def register(
+        self,
+        name: str,
+        remove: Callable[[str], None],
+        sessions: Optional[Callable[[], Iterable[str]]] = None
+    ) -> None:
+        """
+        Register a component holding per-session state.
+
+        @param {str} name - Name used in the stats
+        @param {Callable} remove - Drops everything the component holds for a session
+        @param {Callable} sessions - Returns the sessions the component holds state for
+            (None when it cannot tell; it is then never swept)
+        """
+        self._resources.append((name, remove, sessions))
+
+    def open(self, sid: str, record: dict) -> None:
+        """Start a session with its record (options chosen at connect time)."""
+        with self._lock:
+            self._live.add(sid)
+            self._opened += 1
+        self.store.add(sid, record)
+
+    def close(self, sid: str) -> None:
+        """End a session and drop its state in every registered component."""
+        with self._lock:
+            if sid in self._live:
+                self._live.discard(sid)
+                self._closed += 1
+        self.store.remove(sid)
+        for name, remove, _ in self._resources:
+            try:
+                remove(sid)
+            except Exception as e:
+                logger.error(f"Failed to drop session {sid} from {name}: {e}")
+
+    def is_live(self, sid: str) -> bool:
+        """Whether a session is still connected to this process (cheap, called per frame)."""
+        return sid in self._live
+
+    def get(self, sid: str) -> Optional[dict]:
+        """Record of a session (None once closed)."""
+        return self.store.get(sid)
+
+    def count(self) -> int:
+        """Connected sessions, across every front end sharing the store."""
+        return self.store.count()
+
+    def discard_result(self, sid: str) -> None:
+        """Count a result dropped because its session closed while it was in flight."""
+        with self._lock:
+            self._results_discarded += 1
+
+    def sweep(self) -> int:
+        """
+        Drop per-session state left behind for sessions that are no longer live.
+
+        @return {int} - Number of orphaned entries dropped
+        """
+        reaped = 0
+        for name, remove, sessions in self._resources:
+            if sessions is None:
+                continue
+            for sid in self._orphans(sessions()):
+                try:
+                    remove(sid)
+                    reaped += 1
+                except Exception as e:
+                    logger.error(f"Failed to drop orphaned session {sid} from {name}: {e}")
+        if reaped:
+            with self._lock:
+                self._orphans_reaped += reaped
+            logger.info(f"Reaped {reaped} orphaned per-session entries")
+        return reaped
+
+    def get_stats(self) -> dict:
+        """Live sessions, lifecycle counters and orphaned entries per component."""
+        orphaned: Dict[str, int] = {}
+        held: Dict[str, int] = {}
+        for name, _, sessions in self._resources:
+            if sessions is None:
+                continue
+            current = list(sessions())
+            held[name] = len(current)
+            orphaned[name] = len(self._orphans(current))
+        with self._lock:
+            return {
+                "live_sessions": len(self._live),
+                "sessions_opened": self._opened,
+                "sessions_closed": self._closed,
+                "held_by": held,
+                "orphaned": orphaned,
+                "orphaned_total": sum(orphaned.values()),
+                "orphans_reaped": self._orphans_reaped,
+                "results_discarded": self._results_discarded
+            }
+
+    def _orphans(self, sids: Iterable[str]) -> List[str]:
+        return [sid for sid in list(sids) if sid not in self._live]
+
+
+def session_gauges(stats: dict) -> list:
+    """
+    Prometheus gauges of SocketIOHandlers.get_session_stats, for LatencyMetrics.render_prometheus.
+
+    @param {dict} stats - Session stats (live sessions, buffered bytes, orphaned entries)
+    @return {list} - (name, help, value) tuples
+    """
+    return [
+        ("live_sessions", "Sessions connected to this process.", stats["live_sessions"]),
+        ("live_buffered_bytes", "Bytes of frames waiting for inference.", stats["buffered_bytes"]),
+        ("live_orphaned_entries", "Per-session entries held for sessions no longer connected.",
+         stats["orphaned_total"])
+    ]
@@ -0,0 +1,141 @@
+import json
+import logging
+import threading
+import uuid
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Redis keys shared by every front end
+SESSIONS_KEY = "live:sessions"
+NODE_KEY = "live:frontend:{node}"
+
+
+def connect_redis(url: str):
+    """Open a Redis client for a redis:// (or rediss://, unix://) URL."""
+    import redis
+    return redis.Redis.from_url(url)
+
+
+class InMemorySessionStore:
+    """Session records of the clients connected to this process."""
+
+    def __init__(self):
+        self._sessions: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def add(self, sid: str, record: dict) -> None:
+        with self._lock:
+            self._sessions[sid] = record
+
+    def get(self, sid: str) -> Optional[dict]:
+        return self._sessions.get(sid)
+
+    def remove(self, sid: str) -> None:
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+    def close(self) -> None:
+        pass
+
+
+class RedisSessionStore:
+    """
+    Session records shared by every Socket.IO front end through Redis.
+
+    Records live in one hash (sid -> JSON record with the owning front end),
+    so `count` covers the whole cluster and any node can look a session up.
+    Records never change after connect, so this node's own sessions are also
+    kept locally and per-frame lookups do not reach Redis. Every front end
+    refreshes a heartbeat key; records of front ends whose heartbeat expired
+    (crashed without their clients disconnecting) are reaped by the others.
+    """
+
+    def __init__(self, url: str, heartbeat_s: float = 10.0):
+        """
+        @param {str} url - Redis URL (see connect_redis)
+        @param {float} heartbeat_s - Heartbeat period; a front end is dead after 3 missed beats
+        """
+        self.redis = connect_redis(url)
+        self.node_id = uuid.uuid4().hex[:12]
+        self.heartbeat_s = heartbeat_s
+        self._local: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._beat()
+        threading.Thread(target=self._heartbeat, daemon=True, name="session-heartbeat").start()
+
+    def add(self, sid: str, record: dict) -> None:
+        record = dict(record, node=self.node_id)
+        with self._lock:
+            self._local[sid] = record
+        self.redis.hset(SESSIONS_KEY, sid, json.dumps(record))
+
+    def get(self, sid: str) -> Optional[dict]:
+        record = self._local.get(sid)
+        if record is not None:
+            return record
+        raw = self.redis.hget(SESSIONS_KEY, sid)
+        return json.loads(raw) if raw is not None else None
+
+    def remove(self, sid: str) -> None:
+        with self._lock:
+            self._local.pop(sid, None)
+        self.redis.hdel(SESSIONS_KEY, sid)
+
+    def count(self) -> int:
+        return self.redis.hlen(SESSIONS_KEY)
+
+    def close(self) -> None:
+        """Stop the heartbeat and drop this node's sessions."""
+        self._stop.set()
+        with self._lock:
+            sids = list(self._local)
+            self._local.clear()
+        try:
+            if sids:
+                self.redis.hdel(SESSIONS_KEY, *sids)
+            self.redis.delete(NODE_KEY.format(node=self.node_id))
+        except Exception as e:
+            logger.warning(f"Failed to remove sessions of front end {self.node_id}: {e}")
+
+    def _beat(self) -> None:
+        self.redis.set(NODE_KEY.format(node=self.node_id), 1, ex=max(1, int(self.heartbeat_s * 3)))
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.heartbeat_s):
+            try:
+                self._beat()
+                self._reap()
+            except Exception as e:
+                logger.warning(f"Session store heartbeat failed: {e}")
+
+    def _reap(self) -> None:
+        """Drop the records of front ends whose heartbeat expired."""
+        alive: Dict[str, bool] = {self.node_id: True}
+        dead = []
+        for sid, raw in self.redis.hscan_iter(SESSIONS_KEY, count=1000):
+            node = json.loads(raw).get("node")
+            if node not in alive:
+                alive[node] = bool(self.redis.exists(NODE_KEY.format(node=node)))
+            if not alive[node]:
+                dead.append(sid)
+        if dead:
+            self.redis.hdel(SESSIONS_KEY, *dead)
+            logger.info(f"Reaped {len(dead)} sessions of front ends that stopped without disconnecting them")
+
+
+def create_session_store(config):
+    """
+    Build the session store described by the configuration.
+
+    @param {Config} config - Application configuration (SESSION_STORE_URL)
+    @return {InMemorySessionStore|RedisSessionStore} - In-memory for "memory://"
+    """
+    url = config.SESSION_STORE_URL
+    if not url or url.startswith("memory://"):
+        return InMemorySessionStore()
+    return RedisSessionStore(url)
@@ -1,29 +1,107 @@
 from flask_socketio import emit
-from typing import Dict, Callable
+from typing import Callable, Optional
 import logging
 import threading
+import time
+from batch_scheduler import BatchScheduler
+from inference_pool import InferencePool
+from frame_ring import FrameRingPool
+from frame_queue import FrameQueue
+from session_manager import SessionManager
+from adaptive_controller import AdaptiveController
+from latency_metrics import LatencyMetrics
+from log_setup import LogSampler
+from config import Config
 
 logger = logging.getLogger(__name__)
 
 
 class SocketIOHandlers:
     """Handles SocketIO events for real-time detection."""
+
+    # Result protocols a client can choose at connect time
+    PROTOCOLS = ("json", "binary")
+    # Live modes: "annotated" returns the drawn frame, "metadata" only the detections
+    MODES = ("annotated", "metadata")
     
-    def __init__(self, detection_service_getter: Callable, service_ready: threading.Event, socketio):
+    def __init__(
+        self,
+        detection_service_getter: Callable,
+        service_ready: threading.Event,
+        socketio,
+        config: Config,
+        pool: Optional[InferencePool] = None,
+        frame_rings: Optional[FrameRingPool] = None,
+        session_store=None,
+        frame_queue: Optional[FrameQueue] = None
+    ):
         """
         Initialize handlers with detection service getter.
         
         @param {Callable} detection_service_getter - Function that returns detection service
         @param {threading.Event} service_ready - Event indicating service is ready
+        @param {Config} config - Application configuration (live batching settings)
+        @param {InferencePool} pool - Optional inference worker pool; when set, all
+            decoding, inference and encoding runs in the worker processes
+        @param {FrameRingPool} frame_rings - Optional shared-memory frame slots for live sessions
+        @param {InMemorySessionStore|RedisSessionStore} session_store - Where connected sessions
+            are kept (see session_store); defaults to this process' memory
+        @param {FrameQueue} frame_queue - Optional scale-out work queue; when set, frames are
+            only queued and inference nodes run them and emit the results
         """
         self.get_detection_service = detection_service_getter
         self.service_ready = service_ready
         self.socketio = socketio
-        # client tracking and live-buffer structures
-        self.active_clients: Dict[str, dict] = {}
-        self.latest_frame = {}
-        self.processing = {}
-        self.client_lock = {}
+        self.pool = pool
+        self.frame_queue = frame_queue
+        # per-session resolution and send-rate feedback (see `rate_hint`)
+        self.controller = None
+        if config.LIVE_ADAPTIVE:
+            self.controller = AdaptiveController(
+                self.emit_rate_hint,
+                resolutions=config.LIVE_RESOLUTIONS,
+                initial_size=config.LIVE_TARGET_SIZE,
+                target_latency_ms=config.LIVE_TARGET_LATENCY_MS,
+                min_fps=config.LIVE_MIN_FPS,
+                max_fps=config.LIVE_MAX_FPS
+            )
+        # per-frame INFO logs are sampled so their cost does not grow with the frame rate
+        self.frame_log = LogSampler(config.LOG_SAMPLE_EVERY)
+        # per-stage latency histograms of every frame (see /metrics)
+        self.metrics = LatencyMetrics(config.LATENCY_WINDOW) if config.LATENCY_METRICS else None
+        # connected clients; every per-session structure below is dropped through it on disconnect
+        self.sessions = SessionManager(session_store)
+        # one shared inference loop batches the live frames of every session
+        self.scheduler = BatchScheduler(
+            detection_service_getter,
+            self.emit_live_result,
+            socketio.start_background_task,
+            sleep=socketio.sleep,
+            max_batch_size=config.BATCH_MAX_SIZE,
+            max_wait_ms=config.BATCH_MAX_WAIT_MS,
+            target_size=config.LIVE_TARGET_SIZE,
+            pool=pool,
+            frame_rings=frame_rings,
+            controller=self.controller,
+            tracking_interval=config.TRACKING_DETECT_INTERVAL,
+            tracking_motion_threshold=config.TRACKING_MOTION_THRESHOLD,
+            gate_threshold=config.FRAME_GATE_THRESHOLD,
+            gate_max_stale_ms=config.FRAME_GATE_MAX_STALE_MS,
+            metrics=self.metrics,
+            max_pending_bytes=int(config.LIVE_MAX_BUFFERED_MB * 1024 * 1024),
+            session_active=self.sessions.is_live
+        )
+        self.sessions.register("scheduler", self.scheduler.remove_session, self.scheduler.get_session_ids)
+        if self.controller is not None:
+            self.sessions.register("adaptive", self.controller.remove_session, self.controller.get_session_ids)
+        if self.metrics is not None:
+            self.sessions.register("latency", self.metrics.remove_session, self.metrics.get_session_ids)
+        if frame_rings is not None:
+            self.sessions.register("frame_rings", frame_rings.remove_session, frame_rings.get_session_ids)
+        if frame_queue is not None:
+            self.sessions.register("frame_queue", frame_queue.remove_session)
+        self.tracking_default = config.LIVE_TRACKING
+        self.timings_default = config.LIVE_TIMINGS
     
     def handle_image(self, data: str) -> None:
         """
@@ -33,29 +111,31 @@ class SocketIOHandlers:
         @emits "response_back" - Processed frame and detection results
         """
         try:
-            # Check if service is ready
-            if not self.service_ready.is_set():
-                emit("response_back", {
-                    "error": "Model is still loading, please wait...",
-                    "loading": True
-                })
+            error = self.get_unavailable_error()
+            if error is not None:
+                emit("response_back", error)
+                return
+
+            if self.pool is not None:
+                self._submit_image_to_pool(data)
+                return
+
+            from flask import request
+            if self.frame_queue is not None:
+                self.frame_queue.submit_image(request.sid, data, self.sessions.get(request.sid) or {})
                 return
             
             detection_service = self.get_detection_service()
-            if detection_service is None:
-                emit("response_back", {
-                    "error": "Detection service not available",
-                    "loading": True
-                })
-                return
             
             # Process frame
+            started = time.monotonic()
             result = detection_service.process_frame(data)
+            timings = self._take_timings(request.sid, result)
             
             # Emit success response only to the sender
             emit("response_back", result)
-            
-            logger.info(f"Processed frame with {result['count']} detections")
+            self._record_timings(request.sid, timings, started)
+            self._log_frame(request.sid, result, "image")
         
         except Exception as e:
             # Log and emit error only to the sender
@@ -67,94 +147,246 @@ class SocketIOHandlers:
         Handle incoming binary image frames (sent as Blob/ArrayBuffer from browser).
         """
         try:
-            if not self.service_ready.is_set():
-                emit("response_back", {"error": "Model is still loading, please wait...", "loading": True})
+            error = self.get_unavailable_error()
+            if error is not None:
+                emit("response_back", error)
                 return
 
-            detection_service = self.get_detection_service()
-            if detection_service is None:
-                emit("response_back", {"error": "Detection service not available", "loading": True})
-                return
-
-            # Fast live path: store the latest binary frame per client and process in a background worker
+            # Fast live path: hand the latest frame to the shared batch scheduler
             from flask import request
-            sid = request.sid
-
-            # ensure lock exists
-            if sid not in self.client_lock:
-                self.client_lock[sid] = threading.Lock()
-
-            with self.client_lock[sid]:
-                # store/overwrite latest frame
-                self.latest_frame[sid] = data
-                if not self.processing.get(sid, False):
-                    self.processing[sid] = True
-
-                    def live_worker(sid):
-                        detection_service = self.get_detection_service()
-                        target_size = 320
-                        while True:
-                            frame = None
-                            with self.client_lock[sid]:
-                                frame = self.latest_frame.pop(sid, None)
-                                if frame is None:
-                                    self.processing[sid] = False
-                                    break
-                            try:
-                                res = detection_service.process_frame_bytes_live(frame, target_size=target_size)
-                                # emit back to originating session
-                                self.socketio.emit("response_back", res, to=sid)
-                                logger.info(f"Live processed frame for {sid} with {res.get('count',0)} detections")
-                            except Exception as e:
-                                logger.error(f"Error in live worker for {sid}: {e}")
-                                self.socketio.emit("response_back", {"error": str(e)}, to=sid)
-
-                    try:
-                        self.socketio.start_background_task(live_worker, sid)
-                    except Exception as e:
-                        logger.error(f"Failed to start live worker: {e}")
+            if not self.submit_live_frame(request.sid, data):
+                emit("response_back", {"error": "Too many frames buffered, please retry"})
 
         except Exception as e:
             logger.error(f"Error processing binary frame: {str(e)}")
             emit("response_back", {"error": str(e)})
     
-    def handle_connect(self) -> None:
-        """Handle client connection."""
+    def handle_connect(self, auth: Optional[dict] = None) -> None:
+        """
+        Handle client connection.
+
+        Clients pick the result protocol and mode for the `image_binary` path when
+        connecting, either with the Socket.IO auth payload
+        (`{"protocol": "binary", "mode": "metadata"}`) or the matching query parameters.
+        The default "json" protocol keeps the base64 `response_back` payload; "binary"
+        results are emitted as `response_binary` with raw JPEG bytes and packed
+        detections. The "metadata" mode skips annotation and re-encoding entirely and
+        only returns the detections, in original frame coordinates. `"tracking": true`
+        enables tracking mode: inference is skipped on intermediate frames and every
+        detection carries a persistent `track_id`. `"timings": true` attaches the
+        frame's per-stage latency (ms) to every result as "timings".
+
+        @param {dict} auth - Optional Socket.IO auth payload sent by the client
+        """
+        from flask import request
+
+        status = self.register_session(request.sid, self.parse_session_options(auth, request.args))
+
+        # Emit only to this client
+        emit("connection_status", status)
+    
+    def handle_disconnect(self) -> None:
+        """Handle client disconnection."""
         from flask import request
         
-        # Get unique session ID for this client
-        session_id = request.sid
-        
-        # Track this client
-        self.active_clients[session_id] = {
+        self.remove_session(request.sid)
+    
+    def parse_session_options(self, auth: Optional[dict], args) -> dict:
+        """
+        Read a connecting client's session options (see `handle_connect`).
+
+        @param {dict} auth - Socket.IO auth payload, takes precedence over `args`
+        @param {Mapping} args - Query parameters of the connection request
+        @return {dict} - {"protocol", "mode", "tracking", "timings"}
+        """
+        auth = auth if isinstance(auth, dict) else {}
+        protocol = auth.get("protocol") or args.get("protocol", "json")
+        if protocol not in self.PROTOCOLS:
+            protocol = "json"
+        mode = auth.get("mode") or args.get("mode", "annotated")
+        if mode not in self.MODES:
+            mode = "annotated"
+        tracking = auth.get("tracking", args.get("tracking"))
+        tracking = self.tracking_default if tracking is None else str(tracking).lower() in ("1", "true", "yes")
+        timings = auth.get("timings", args.get("timings"))
+        timings = self.timings_default if timings is None else str(timings).lower() in ("1", "true", "yes")
+        return {"protocol": protocol, "mode": mode, "tracking": tracking, "timings": timings}
+
+    def register_session(self, session_id: str, options: dict) -> dict:
+        """
+        Start tracking a connected client.
+
+        @param {str} session_id - Socket.IO session id
+        @param {dict} options - Session options from `parse_session_options`
+        @return {dict} - The "connection_status" payload for the client
+        """
+        self.sessions.open(session_id, {
             "connected_at": None,
-            "frame_count": 0
-        }
+            "frame_count": 0,
+            **options
+        })
         
         # Check if model is ready
         model_ready = self.service_ready.is_set()
         
-        logger.info(f"Client connected: {session_id} (Total clients: {len(self.active_clients)}, Model ready: {model_ready})")
+        logger.info(f"Client connected: {session_id} (Total clients: {self.sessions.count()}, Model ready: {model_ready}, Protocol: {options['protocol']}, Mode: {options['mode']})")
         
-        # Emit only to this client
-        emit("connection_status", {
+        status = {
             "status": "connected",
             "session_id": session_id,
-            "model_ready": model_ready
+            "model_ready": model_ready,
+            "protocol": options["protocol"],
+            "mode": options["mode"],
+            "tracking": options["tracking"]
+        }
+        # Binary clients receive bare class ids, so hand them the id -> name mapping once
+        class_names = self.get_class_names()
+        if options["protocol"] == "binary" and class_names:
+            status["class_names"] = {str(k): v for k, v in class_names.items()}
+        return status
+
+    def remove_session(self, session_id: str) -> None:
+        """Forget a disconnected client and drop its pending frame and per-session state."""
+        # frames of the session still in flight are cancelled (see SessionManager)
+        self.sessions.close(session_id)
+        
+        logger.info(f"Client disconnected: {session_id} (Remaining clients: {self.sessions.count()})")
+
+    def submit_live_frame(self, sid: str, data: bytes) -> bool:
+        """
+        Hand a session's latest `image_binary` frame to the batch scheduler (or the work queue).
+
+        @return {bool} - False if the frame was refused (buffered frames over LIVE_MAX_BUFFERED_MB)
+        """
+        client = self.sessions.get(sid) or {}
+        options = {
+            "protocol": client.get("protocol", "json"),
+            "mode": client.get("mode", "annotated"),
+            "tracking": client.get("tracking", False),
+            "timings": client.get("timings", False)
+        }
+        if self.frame_queue is not None:
+            self.frame_queue.submit(sid, data, options)
+            return True
+        return self.scheduler.submit(sid, data, options)
+
+    def get_unavailable_error(self) -> Optional[dict]:
+        """Get the error answered to frames while no model can serve them (None once ready)."""
+        if not self.service_ready.is_set():
+            return {"error": "Model is still loading, please wait...", "loading": True}
+        if self.frame_queue is not None:
+            if self.frame_queue.count_nodes() == 0:
+                return {"error": "No inference node available", "loading": True}
+            return None
+        if self.pool is None and self.get_detection_service() is None:
+            return {"error": "Detection service not available", "loading": True}
+        return None
+
+    def emit_live_result(self, sid: str, result) -> None:
+        """
+        Send a batch scheduler result back to the session it came from.
+
+        @param {str} sid - Originating session id
+        @param {dict|Exception} result - Processed frame, or the error raised for it
+        """
+        if isinstance(result, Exception):
+            logger.error(f"Error in live processing for {sid}: {result}")
+            self.socketio.emit("response_back", {"error": str(result)}, to=sid)
+            return
+
+        event = "response_binary" if self.get_session_protocol(sid) == "binary" else "response_back"
+        self.socketio.emit(event, result, to=sid)
+        self._log_frame(sid, result, "live")
+
+    def emit_rate_hint(self, sid: str, hint: dict) -> None:
+        """
+        Tell a live session how fast to send frames and which resolution it is served at.
+
+        @param {str} sid - Session id
+        @param {dict} hint - {"fps", "target_size", "latency_ms"} from the adaptive controller
+        @emits "rate_hint" - Suggested send rate for the `image_binary` stream
+        """
+        self.socketio.emit("rate_hint", hint, to=sid)
+
+    def emit_model_changed(self, model: dict) -> None:
+        """
+        Tell every connected client that a different model is now serving.
+
+        @param {dict} model - Current model info from ModelRegistry.get_status()
+        @emits "model_changed" - {"model_version", "model_path", "class_names"} to all clients
+        """
+        self.socketio.emit("model_changed", {
+            "model_version": model.get("model_version"),
+            "model_path": model.get("model_path"),
+            "class_names": self.get_class_names()
         })
-    
-    def handle_disconnect(self) -> None:
-        """Handle client disconnection."""
+
+    def _submit_image_to_pool(self, data: str) -> None:
+        """Run a text `image` frame on a worker and answer the sender when it completes."""
         from flask import request
-        
-        session_id = request.sid
-        
-        # Remove client from tracking
-        if session_id in self.active_clients:
-            del self.active_clients[session_id]
-        
-        logger.info(f"Client disconnected: {session_id} (Remaining clients: {len(self.active_clients)})")
-    
+        sid = request.sid
+        started = time.monotonic()
+
+        def on_done(result):
+            if not self.sessions.is_live(sid):
+                self.sessions.discard_result(sid)
+                return
+            if isinstance(result, Exception):
+                logger.error(f"Error processing frame: {result}")
+                self.socketio.emit("response_back", {"error": str(result)}, to=sid)
+            else:
+                timings = self._take_timings(sid, result)
+                self.socketio.emit("response_back", result, to=sid)
+                self._record_timings(sid, timings, started)
+                self._log_frame(sid, result, "image")
+
+        if not self.pool.submit_image(data, on_done):
+            emit("response_back", {"error": "All inference workers are busy, please retry"})
+
+    def _log_frame(self, sid: str, result: dict, path: str) -> None:
+        """Log a processed frame, 1 in LOG_SAMPLE_EVERY, with structured fields."""
+        if not self.frame_log():
+            return
+        logger.info(
+            f"Processed {path} frame for {sid} with {result.get('count', 0)} detections",
+            extra={"sid": sid, "path": path, "detections": result.get("count", 0), "sample_every": self.frame_log.every}
+        )
+
+    def _take_timings(self, sid: str, result: dict) -> Optional[dict]:
+        """Detach the stage timings of an `image` result, leaving them only for sessions that asked."""
+        timings = result.pop("timings", None)
+        if timings is not None and (self.sessions.get(sid) or {}).get("timings", self.timings_default):
+            result["timings"] = {stage: round(ms, 3) for stage, ms in timings.items()}
+        return timings
+
+    def _record_timings(self, sid: str, timings: Optional[dict], started: float) -> None:
+        """Record an `image` result's stage timings once it was emitted."""
+        if timings is None or self.metrics is None:
+            return
+        timings["total"] = (time.monotonic() - started) * 1000.0
+        self.metrics.observe(sid, timings)
+
+    def get_class_names(self) -> dict:
+        """Get the class id -> name mapping of the loaded model (empty while loading)."""
+        if self.pool is not None:
+            return self.pool.class_names
+        if self.frame_queue is not None:
+            return self.frame_queue.get_model_info().get("class_names", {})
+        detection_service = self.get_detection_service()
+        return detection_service.model.class_names if detection_service is not None else {}
+
+    def get_session_protocol(self, sid: str) -> str:
+        """Get the result protocol ("json" or "binary") chosen by a session."""
+        return (self.sessions.get(sid) or {}).get("protocol", "json")
+
+    def get_session_stats(self) -> dict:
+        """Session lifecycle counters, orphaned per-session entries and buffered frame bytes."""
+        return {
+            **self.sessions.get_stats(),
+            "buffered_bytes": self.scheduler.get_buffered_bytes(),
+            "max_buffered_bytes": self.scheduler.max_pending_bytes
+        }
+
     def get_active_client_count(self) -> int:
         """Get number of active clients."""
-        return len(self.active_clients)
\ No newline at end of file
+        return self.sessions.count()
\ No newline at end of file
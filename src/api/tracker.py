@@ -0,0 +1,286 @@
+import numpy as np
+from typing import List, Optional, Tuple
+from detections import Detections, pack_array, unpack_array
+
+# per-track columns of IoUTracker
+_TRACK_COLUMNS = ("boxes", "velocity", "scores", "class_ids", "track_ids", "misses", "gaps")
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU of two sets of xyxy boxes.
+
+    @param {np.ndarray} a - (N, 4) boxes
+    @param {np.ndarray} b - (M, 4) boxes
+    @return {np.ndarray} - (N, M) IoU matrix
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class IoUTracker:
+    """
+    Lightweight ByteTrack-style multi-object tracker.
+
+    Tracks keep a box in normalized [0, 1] coordinates (so the inference
+    resolution may change between frames) and a constant-velocity motion
+    estimate. On detection frames, high-confidence detections are matched to
+    the predicted tracks by IoU first, then low-confidence detections are used
+    to keep the remaining tracks alive; unmatched high-confidence detections
+    start new tracks. On frames without inference, `propagate` advances the
+    tracks by their velocity.
+    """
+
+    def __init__(
+        self,
+        high_threshold: float = 0.5,
+        match_iou: float = 0.3,
+        max_age: int = 30,
+        velocity_smoothing: float = 0.5
+    ):
+        """
+        @param {float} high_threshold - Confidence separating first- and second-stage detections
+        @param {float} match_iou - Minimum IoU for a detection to continue a track
+        @param {int} max_age - Frames a track survives without a matching detection
+        @param {float} velocity_smoothing - Weight of the newest velocity measurement
+        """
+        self.high_threshold = high_threshold
+        self.match_iou = match_iou
+        self.max_age = max_age
+        self.velocity_smoothing = velocity_smoothing
+
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.class_ids = np.zeros(0, dtype=np.int32)
+        self.track_ids = np.zeros(0, dtype=np.int32)
+        self.misses = np.zeros(0, dtype=np.int32)
+        # frames since each track was last matched to a detection
+        self.gaps = np.zeros(0, dtype=np.int32)
+        self.next_id = 1
+
+    def update(self, detections: Detections, size: Tuple[int, int]) -> Detections:
+        """
+        Associate a detection frame with the tracks.
+
+        @param {Detections} detections - Detections in pixel coordinates of a (width, height) frame
+        @param {Tuple[int, int]} size - Frame (width, height) the boxes refer to
+        @return {Detections} - The matched and newly started detections, with track ids
+        """
+        scale = np.array([size[0], size[1], size[0], size[1]], dtype=np.float32)
+        self._advance()
+
+        boxes = detections.xyxy / scale
+        high = np.flatnonzero(detections.confidence >= self.high_threshold)
+        low = np.flatnonzero(detections.confidence < self.high_threshold)
+
+        unmatched_tracks = np.arange(len(self.track_ids))
+        matches_high, unmatched_tracks, unmatched_high = self._match(unmatched_tracks, high, boxes, detections)
+        matches_low, unmatched_tracks, _ = self._match(unmatched_tracks, low, boxes, detections)
+
+        out_rows: List[int] = []
+        out_ids: List[int] = []
+        for track, det in matches_high + matches_low:
+            # the prediction error is spread over the frames since the track was last seen
+            measured = self.velocity[track] + (boxes[det] - self.boxes[track]) / max(self.gaps[track], 1)
+            self.velocity[track] += self.velocity_smoothing * (measured - self.velocity[track])
+            self.boxes[track] = boxes[det]
+            self.scores[track] = detections.confidence[det]
+            self.misses[track] = 0
+            self.gaps[track] = 0
+            out_rows.append(det)
+            out_ids.append(int(self.track_ids[track]))
+
+        self.misses[unmatched_tracks] += 1
+
+        new = np.asarray(unmatched_high, dtype=np.int64)
+        if len(new):
+            ids = np.arange(self.next_id, self.next_id + len(new), dtype=np.int32)
+            self.next_id += len(new)
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((len(new), 4), dtype=np.float32)])
+            self.scores = np.concatenate([self.scores, detections.confidence[new]])
+            self.class_ids = np.concatenate([self.class_ids, detections.class_id[new].astype(np.int32)])
+            self.track_ids = np.concatenate([self.track_ids, ids])
+            self.misses = np.concatenate([self.misses, np.zeros(len(new), dtype=np.int32)])
+            self.gaps = np.concatenate([self.gaps, np.zeros(len(new), dtype=np.int32)])
+            out_rows.extend(new.tolist())
+            out_ids.extend(ids.tolist())
+
+        self._prune()
+
+        rows = np.asarray(out_rows, dtype=np.int64)
+        return Detections(
+            detections.xyxy[rows],
+            detections.confidence[rows],
+            detections.class_id[rows],
+            detections.class_names,
+            track_id=np.asarray(out_ids, dtype=np.int32)
+        )
+
+    def propagate(self, size: Tuple[int, int], class_names: Optional[dict] = None) -> Detections:
+        """
+        Advance the tracks one frame without a detection pass.
+
+        @param {Tuple[int, int]} size - (width, height) of the frame to express the boxes in
+        @param {dict} class_names - class id -> name mapping for the returned detections
+        @return {Detections} - Predicted boxes of the tracks seen on the last detection frame
+        """
+        self._advance()
+        alive = self.misses == 0
+        scale = np.array([size[0], size[1], size[0], size[1]], dtype=np.float32)
+        boxes = np.clip(self.boxes[alive], 0.0, 1.0) * scale
+        return Detections(
+            boxes.astype(np.float32),
+            self.scores[alive].copy(),
+            self.class_ids[alive].copy(),
+            class_names,
+            track_id=self.track_ids[alive].copy()
+        )
+
+    def _advance(self) -> None:
+        """Move every track one frame along its velocity."""
+        self.boxes += self.velocity
+        self.gaps += 1
+
+    def _match(self, tracks: np.ndarray, dets: np.ndarray, boxes: np.ndarray, detections: Detections):
+        """Greedy highest-IoU matching of same-class tracks and detections."""
+        if len(tracks) == 0 or len(dets) == 0:
+            return [], tracks, dets.tolist()
+
+        iou = box_iou(self.boxes[tracks], boxes[dets])
+        iou[self.class_ids[tracks][:, None] != detections.class_id[dets][None, :]] = 0.0
+
+        matches = []
+        used_tracks, used_dets = set(), set()
+        for flat in np.argsort(-iou, axis=None):
+            t, d = divmod(int(flat), len(dets))
+            if iou[t, d] < self.match_iou:
+                break
+            if t in used_tracks or d in used_dets:
+                continue
+            used_tracks.add(t)
+            used_dets.add(d)
+            matches.append((int(tracks[t]), int(dets[d])))
+
+        unmatched_tracks = np.array([tracks[t] for t in range(len(tracks)) if t not in used_tracks], dtype=np.int64)
+        unmatched_dets = [int(dets[d]) for d in range(len(dets)) if d not in used_dets]
+        return matches, unmatched_tracks, unmatched_dets
+
+    def _prune(self) -> None:
+        keep = self.misses <= self.max_age
+        if keep.all():
+            return
+        for name in _TRACK_COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+
+    def to_dict(self) -> dict:
+        """JSON-serializable state (see `from_dict`)."""
+        return {
+            "high_threshold": self.high_threshold,
+            "match_iou": self.match_iou,
+            "max_age": self.max_age,
+            "velocity_smoothing": self.velocity_smoothing,
+            "next_id": self.next_id,
+            **{name: pack_array(getattr(self, name)) for name in _TRACK_COLUMNS}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IoUTracker":
+        """Rebuild a tracker from `to_dict` output."""
+        tracker = cls(data["high_threshold"], data["match_iou"], data["max_age"], data["velocity_smoothing"])
+        tracker.next_id = int(data["next_id"])
+        for name in _TRACK_COLUMNS:
+            setattr(tracker, name, unpack_array(data[name]))
+        return tracker
+
+
+class SessionTracker:
+    """
+    Tracking state of one live session.
+
+    Decides per frame whether a full detection pass is needed (every
+    `detect_interval` frames, or when the frame changed more than
+    `motion_threshold` since the last detection frame) and otherwise
+    propagates the tracked boxes. Small and picklable, so it can travel to an
+    inference worker with the frame and come back updated; `to_dict` gives a
+    JSON form for state kept outside the process (the Redis work queue).
+    """
+
+    def __init__(self, detect_interval: int = 5, motion_threshold: float = 12.0):
+        """
+        @param {int} detect_interval - Run detection at least every N frames
+        @param {float} motion_threshold - Mean absolute thumbnail difference (0-255) that forces detection
+        """
+        self.detect_interval = max(1, int(detect_interval))
+        self.motion_threshold = motion_threshold
+        self.tracker = IoUTracker()
+        self.keyframe_thumbnail: Optional[np.ndarray] = None
+        self.frames_since_detection = 0
+        self.frames = 0
+        self.detected_frames = 0
+        self.propagated_frames = 0
+
+    def needs_detection(self, thumbnail: np.ndarray) -> bool:
+        """
+        Whether the frame with this motion thumbnail must go through the model.
+
+        @param {np.ndarray} thumbnail - Motion thumbnail (see ImageProcessor.motion_thumbnail)
+        """
+        if self.keyframe_thumbnail is None or self.keyframe_thumbnail.shape != thumbnail.shape:
+            return True
+        if self.frames_since_detection + 1 >= self.detect_interval:
+            return True
+        motion = float(np.mean(np.abs(thumbnail.astype(np.int16) - self.keyframe_thumbnail)))
+        return motion > self.motion_threshold
+
+    def update(self, detections: Detections, size: Tuple[int, int], thumbnail: np.ndarray) -> Detections:
+        """Record a detection frame and return its detections with track ids."""
+        self.frames += 1
+        self.detected_frames += 1
+        self.frames_since_detection = 0
+        self.keyframe_thumbnail = thumbnail
+        return self.tracker.update(detections, size)
+
+    def propagate(self, size: Tuple[int, int], class_names: Optional[dict] = None) -> Detections:
+        """Record a frame without inference and return the propagated tracks."""
+        self.frames += 1
+        self.propagated_frames += 1
+        self.frames_since_detection += 1
+        return self.tracker.propagate(size, class_names)
+
+    def to_dict(self) -> dict:
+        """JSON-serializable state (see `from_dict`)."""
+        return {
+            "detect_interval": self.detect_interval,
+            "motion_threshold": self.motion_threshold,
+            "tracker": self.tracker.to_dict(),
+            "keyframe_thumbnail": (
+                pack_array(self.keyframe_thumbnail) if self.keyframe_thumbnail is not None else None
+            ),
+            "frames_since_detection": self.frames_since_detection,
+            "frames": self.frames,
+            "detected_frames": self.detected_frames,
+            "propagated_frames": self.propagated_frames
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SessionTracker":
+        """Rebuild a session tracker from `to_dict` output."""
+        tracker = cls(data["detect_interval"], data["motion_threshold"])
+        tracker.tracker = IoUTracker.from_dict(data["tracker"])
+        thumbnail = data["keyframe_thumbnail"]
+        tracker.keyframe_thumbnail = unpack_array(thumbnail) if thumbnail is not None else None
+        tracker.frames_since_detection = int(data["frames_since_detection"])
+        tracker.frames = int(data["frames"])
+        tracker.detected_frames = int(data["detected_frames"])
+        tracker.propagated_frames = int(data["propagated_frames"])
+        return tracker
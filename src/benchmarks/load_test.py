@@ -0,0 +1,426 @@
+"""
+Load test for the live Socket.IO server.
+
+Starts `live_app.create_app` in a separate process (or targets a running
+server with --url), connects N simulated clients over WebSocket that send
+JPEG frames at a fixed rate through the `image` (base64) and/or
+`image_binary` events, and reports per client and overall: delivered fps,
+dropped/superseded frames, errors and end-to-end latency percentiles, plus
+the server's own per-stage timings. Results are written as JSON so runs on
+different commits can be compared (--compare).
+
+Without --model the server runs the "synthetic" inference backend (random
+boxes, configurable latency), so the test needs neither weights nor torch.
+
+Example:
+    python src/benchmarks/load_test.py --clients 20 --fps 15 --duration 30 --out bench.json
+    python src/benchmarks/load_test.py --clients 20 --fps 15 --workers 2 --compare bench.json
+    python src/benchmarks/load_test.py --model runs/.../best.pt --event mixed --protocol binary
+"""
+
+import argparse
+import base64
+import glob
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import deque
+
+import cv2
+import numpy as np
+import socketio
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+API_DIR = os.path.join(ROOT_DIR, "src", "api")
+
+EVENTS = ("image", "image_binary")
+# server stages reported in the results' "timings" (see latency_metrics.STAGES)
+STAGES = ("queue", "decode", "inference", "postprocess", "draw", "encode", "total")
+
+
+def percentiles(values: list) -> dict:
+    """p50/p95/p99/mean/max of a list of milliseconds."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "p50": pick(0.5),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2)
+    }
+
+
+def load_frames(pattern: str, width: int, height: int, limit: int, quality: int) -> list:
+    """
+    JPEG-encode the test frames: dataset images when the glob matches, otherwise
+    synthetic frames with a moving rectangle (so consecutive frames differ).
+    """
+    frames = []
+    for path in sorted(glob.glob(pattern, recursive=True))[:limit]:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is not None:
+            frames.append(cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA))
+    if not frames:
+        rng = np.random.default_rng(0)
+        background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        for i in range(min(limit, 30)):
+            frame = background.copy()
+            x = int((i / 30) * (width - width // 4))
+            cv2.rectangle(frame, (x, height // 3), (x + width // 4, height // 3 + height // 4), (0, 0, 255), -1)
+            frames.append(frame)
+    encoded = []
+    for frame in frames:
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            encoded.append(buf.tobytes())
+    return encoded
+
+
+class SimulatedClient:
+    """
+    One Socket.IO client sending frames at a fixed rate and timing the answers.
+
+    The server keeps only the latest pending frame per session, so an answer is
+    matched to the newest frame that was sent before the server started working
+    on it (its emit time minus the server-side processing time from "timings");
+    older unanswered frames were superseded. `image` answers arrive in order.
+    """
+
+    def __init__(self, index: int, url: str, event: str, frames: list, args):
+        self.index = index
+        self.url = url
+        self.event = event
+        self.frames = frames
+        self.args = args
+        self.sio = socketio.Client(reconnection=False)
+        self.sent = 0
+        self.received = 0
+        self.errors = 0
+        self.superseded = 0
+        self.latencies = []
+        self.server_timings = {stage: [] for stage in STAGES}
+        self.connect_error = None
+        # send times of frames not answered yet
+        self._outstanding = deque()
+        self._lock = threading.Lock()
+        self.sio.on("response_back", self._on_response)
+        self.sio.on("response_binary", self._on_response)
+
+    def run(self, start_at: float, stop_at: float) -> None:
+        args = self.args
+        try:
+            self.sio.connect(
+                self.url,
+                transports=["websocket"],
+                auth={
+                    "protocol": args.protocol,
+                    "mode": args.mode,
+                    "tracking": args.tracking,
+                    "timings": True
+                },
+                wait_timeout=10
+            )
+        except Exception as e:
+            self.connect_error = str(e)
+            return
+
+        interval = 1.0 / args.fps
+        next_send = start_at + (self.index % 10) * interval / 10  # stagger clients
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            if now < next_send:
+                time.sleep(min(next_send - now, 0.01))
+                continue
+            frame = self.frames[self.sent % len(self.frames)]
+            payload = frame if self.event == "image_binary" else (
+                "data:image/jpeg;base64," + base64.b64encode(frame).decode("ascii")
+            )
+            with self._lock:
+                self._outstanding.append(time.monotonic())
+            try:
+                self.sio.emit(self.event, payload)
+                self.sent += 1
+            except Exception:
+                self.errors += 1
+            next_send += interval
+
+        # give in-flight frames a moment to come back
+        drain_until = time.monotonic() + args.drain
+        while time.monotonic() < drain_until and self._outstanding and self.received + self.errors < self.sent:
+            time.sleep(0.01)
+        self.sio.disconnect()
+
+    def _on_response(self, data) -> None:
+        now = time.monotonic()
+        if not isinstance(data, dict) or "error" in data:
+            with self._lock:
+                self.errors += 1
+                if self._outstanding:
+                    self._outstanding.popleft()
+            return
+
+        timings = data.get("timings") or {}
+        with self._lock:
+            if not self._outstanding:
+                return
+            if self.event == "image":
+                sent_at = self._outstanding.popleft()
+            else:
+                processing = (timings.get("total", 0.0) - timings.get("queue", 0.0)) / 1000.0
+                cutoff = now - processing
+                sent_at = self._outstanding.popleft()
+                while self._outstanding and self._outstanding[0] <= cutoff:
+                    self.superseded += 1
+                    sent_at = self._outstanding.popleft()
+            self.received += 1
+            self.latencies.append((now - sent_at) * 1000.0)
+            for stage in STAGES:
+                if stage in timings:
+                    self.server_timings[stage].append(timings[stage])
+
+    def report(self, duration: float) -> dict:
+        return {
+            "client": self.index,
+            "event": self.event,
+            "connect_error": self.connect_error,
+            "sent": self.sent,
+            "received": self.received,
+            "errors": self.errors,
+            "superseded": self.superseded,
+            "dropped": max(0, self.sent - self.received - self.errors),
+            "delivered_fps": round(self.received / duration, 2),
+            "latency_ms": percentiles(self.latencies)
+        }
+
+
+def _serve(port: int, env: dict, async_mode: str) -> None:
+    """Server process: configure through the environment, then run live_app."""
+    os.environ.update(env)
+    sys.path.insert(0, API_DIR)
+    os.chdir(API_DIR)
+    from config import Config
+    if async_mode:
+        Config.ASYNC_MODE = async_mode
+    import live_app
+
+    app, sio = live_app.create_app(Config())
+    sio.run(app, host="127.0.0.1", port=port, debug=False, allow_unsafe_werkzeug=True)
+
+
+def start_server(args) -> tuple:
+    """Launch live_app in a child process and wait until /ready answers 200."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    env = {
+        "INFERENCE_WORKERS": str(args.workers),
+        "LIVE_TIMINGS": "0",
+        "LOG_LEVEL": args.log_level,
+        "SYNTHETIC_DETECTIONS": str(args.synthetic_detections),
+        "SYNTHETIC_LATENCY_MS": str(args.synthetic_latency_ms),
+        "SYNTHETIC_PER_IMAGE_MS": str(args.synthetic_per_image_ms)
+    }
+    if args.model:
+        env["MODEL_PATH"] = os.path.abspath(args.model)
+        env["INFERENCE_BACKEND"] = args.backend
+    else:
+        # the synthetic backend never reads the weights, ModelLoader only needs the file to exist
+        placeholder = os.path.join(tempfile.mkdtemp(prefix="load_test_"), "synthetic.pt")
+        open(placeholder, "wb").close()
+        env["MODEL_PATH"] = placeholder
+        env["INFERENCE_BACKEND"] = "synthetic"
+
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve, args=(port, env, args.async_mode), name="load-test-server"
+    )
+    process.start()
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise RuntimeError("server process exited during startup")
+        try:
+            with urllib.request.urlopen(url + "/ready", timeout=1) as response:
+                if response.status == 200:
+                    return process, url
+        except Exception:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not become ready in time")
+
+
+def stop_server(process) -> None:
+    """Interrupt the server so its atexit handlers release workers and shared memory."""
+    if hasattr(signal, "SIGINT") and os.name != "nt":
+        os.kill(process.pid, signal.SIGINT)
+        process.join(15)
+    if process.is_alive():
+        process.terminate()
+        process.join(5)
+
+
+def fetch_json(url: str):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return json.loads(response.read())
+    except Exception:
+        return None
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(result: dict, baseline_path: str) -> None:
+    """Print the overall numbers next to those of an earlier run."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit') or '?'}):")
+    rows = [
+        ("delivered fps", ("overall", "delivered_fps")),
+        ("drop rate", ("overall", "drop_rate")),
+        ("latency p50 ms", ("overall", "latency_ms", "p50")),
+        ("latency p95 ms", ("overall", "latency_ms", "p95")),
+        ("latency p99 ms", ("overall", "latency_ms", "p99"))
+    ]
+    for label, path in rows:
+        new, old = result, baseline
+        for key in path:
+            new = (new or {}).get(key)
+            old = (old or {}).get(key)
+        if new is None or old is None:
+            continue
+        delta = (new - old) / old * 100 if old else 0.0
+        print(f"  {label:16s} {old:>10.2f} -> {new:>10.2f} ({delta:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the live Socket.IO detection server")
+    parser.add_argument("--url", default=None, help="Target a running server instead of starting one")
+    parser.add_argument("--model", default=None, help="Weights to serve (default: synthetic backend)")
+    parser.add_argument("--backend", default="auto", help="Inference backend used with --model")
+    parser.add_argument("--workers", type=int, default=0, help="INFERENCE_WORKERS of the started server")
+    parser.add_argument("--async_mode", default=None, help="Override Config.ASYNC_MODE (e.g. threading)")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--fps", type=float, default=15, help="Frames per second sent by each client")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of sending")
+    parser.add_argument("--drain", type=float, default=2, help="Seconds to wait for in-flight answers")
+    parser.add_argument("--event", default="image_binary", choices=EVENTS + ("mixed",),
+                        help="Event to send; mixed alternates clients between image and image_binary")
+    parser.add_argument("--protocol", default="json", choices=["json", "binary"])
+    parser.add_argument("--mode", default="annotated", choices=["annotated", "metadata"])
+    parser.add_argument("--tracking", action="store_true", help="Connect in tracking mode")
+    parser.add_argument("--images", default=os.path.join(ROOT_DIR, "dataset", "images", "**", "*.*"))
+    parser.add_argument("--resolution", default="640x480", help="WIDTHxHEIGHT of the sent frames")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality of the sent frames")
+    parser.add_argument("--num_frames", type=int, default=100, help="Distinct frames cycled through")
+    parser.add_argument("--synthetic_detections", type=int, default=5)
+    parser.add_argument("--synthetic_latency_ms", type=float, default=15)
+    parser.add_argument("--synthetic_per_image_ms", type=float, default=2)
+    parser.add_argument("--startup_timeout", type=float, default=300)
+    parser.add_argument("--log_level", default="WARNING", help="LOG_LEVEL of the started server")
+    parser.add_argument("--out", default=None, help="Write the results as JSON")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+    frames = load_frames(args.images, width, height, args.num_frames, args.quality)
+    print(f"{len(frames)} test frames at {width}x{height}, {args.clients} clients x {args.fps} fps, {args.duration}s")
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args)
+    try:
+        events = EVENTS if args.event == "mixed" else (args.event,)
+        clients = [
+            SimulatedClient(i, url, events[i % len(events)], frames, args) for i in range(args.clients)
+        ]
+        start_at = time.monotonic() + 1.0
+        stop_at = start_at + args.duration
+        threads = [threading.Thread(target=c.run, args=(start_at, stop_at), daemon=True) for c in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(args.duration + args.drain + 30)
+        server_stats = fetch_json(url + "/stats")
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    reports = [c.report(args.duration) for c in clients]
+    sent = sum(r["sent"] for r in reports)
+    received = sum(r["received"] for r in reports)
+    dropped = sum(r["dropped"] for r in reports)
+    server_stages = {}
+    for stage in STAGES:
+        values = [v for c in clients for v in c.server_timings[stage]]
+        if values:
+            server_stages[stage] = percentiles(values)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "args": vars(args),
+        "overall": {
+            "clients": len(clients),
+            "connect_errors": sum(1 for r in reports if r["connect_error"]),
+            "sent": sent,
+            "received": received,
+            "errors": sum(r["errors"] for r in reports),
+            "superseded": sum(r["superseded"] for r in reports),
+            "dropped": dropped,
+            "drop_rate": round(dropped / sent, 4) if sent else 0.0,
+            "offered_fps": round(sent / args.duration, 2),
+            "delivered_fps": round(received / args.duration, 2),
+            "latency_ms": percentiles([v for c in clients for v in c.latencies]),
+            "server_stage_ms": server_stages
+        },
+        "clients": reports,
+        "server_stats": server_stats
+    }
+
+    overall = result["overall"]
+    print(f"sent {sent} frames, received {received} ({overall['delivered_fps']} fps delivered), "
+          f"dropped {dropped} ({overall['drop_rate'] * 100:.1f}%, {overall['superseded']} superseded), "
+          f"errors {overall['errors']}")
+    print(f"end-to-end latency ms: {overall['latency_ms']}")
+    for stage, stats in server_stages.items():
+        print(f"  server {stage:12s} p50 {stats['p50']:>8} p95 {stats['p95']:>8} p99 {stats['p99']:>8}")
+    for r in reports:
+        if r["connect_error"]:
+            print(f"  client {r['client']}: connect failed: {r['connect_error']}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.out}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
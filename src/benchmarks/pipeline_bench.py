@@ -0,0 +1,291 @@
+"""
+Micro-benchmarks of the frame pipeline stages.
+
+Times each stage in isolation, without the network or a real model, over a
+range of frame resolutions (480p to 4K) and detection counts (0 to 300):
+
+  decode_base64      ImageProcessor.decode_base64_image (text `image` event)
+  decode_jpeg        ImageProcessor.decode_image_bytes at full size (`image_bytes` event)
+  encode_base64      ImageProcessor.encode_image_to_base64
+  encode_jpeg        ImageProcessor.encode_image_to_bytes (binary protocol)
+  draw / draw_inplace  DetectionVisualizer.draw_detections (copy / live in-place)
+  live_decode_resize DetectionService._decode_live_frame (imdecode + resize to 320)
+  live_resize        the resize step of the live path alone
+  detect             ModelLoader.detect around the synthetic backend (colour
+                     conversion + Detections), i.e. everything but the model
+  predict_ndarray    ModelLoader.predict_ndarray (adds the legacy dict list)
+  postprocess_onnx   inference_backends.postprocess (decode + NMS of an exported head)
+
+Before timing, every available JPEG codec backend is checked to decode an
+EXIF-rotated JPEG unrotated, with the size it reports (exit 1 otherwise).
+
+Results go to a JSON file; --compare checks a run against a baseline and
+exits 1 when a case got slower than --max_regression, so every stage
+optimization can be proven against the commit before it.
+
+Example:
+    python src/benchmarks/pipeline_bench.py --out baseline.json
+    python src/benchmarks/pipeline_bench.py --compare baseline.json --filter draw
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+API_DIR = os.path.join(ROOT_DIR, "src", "api")
+sys.path.insert(0, API_DIR)
+
+from detection_service import DetectionService  # noqa: E402
+from detection_visuallizer import DetectionVisualizer  # noqa: E402
+from detections import Detections  # noqa: E402
+from image_processor import ImageProcessor  # noqa: E402
+from jpeg_codec import JpegCodec  # noqa: E402
+from inference_backends import SyntheticBackend, postprocess  # noqa: E402
+
+RESOLUTIONS = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+DETECTION_COUNTS = (0, 10, 100, 300)
+CLASS_NAMES = {i: f"class_{i}" for i in range(10)}
+
+
+def make_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Camera-like test frame (smooth gradients, shapes and noise) so JPEG sizes are realistic."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2).astype(np.uint8)
+    for _ in range(12):
+        cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height))
+        radius = int(rng.integers(height // 20, height // 5))
+        cv2.circle(frame, (cx, cy), radius, tuple(int(c) for c in rng.integers(0, 255, 3)), -1)
+    noise = rng.normal(0, 6, frame.shape)
+    return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+def make_detections(count: int, width: int, height: int, seed: int = 0) -> Detections:
+    rng = np.random.default_rng(seed)
+    boxes = np.empty((count, 6), dtype=np.float32)
+    xy = rng.random((count, 2)) * (width * 0.85, height * 0.85)
+    boxes[:, 0:2] = xy
+    boxes[:, 2:4] = xy + rng.random((count, 2)) * (width * 0.15, height * 0.15) + 8
+    boxes[:, 4] = rng.uniform(0.25, 1.0, count)
+    boxes[:, 5] = rng.integers(0, len(CLASS_NAMES), count)
+    return Detections.from_array(boxes, CLASS_NAMES) if count else Detections.empty(CLASS_NAMES)
+
+
+def make_raw_head(count: int, num_classes: int = 10, anchors: int = 8400, seed: int = 0) -> np.ndarray:
+    """(4 + nc, anchors) YOLO head output with `count` anchors above the confidence threshold."""
+    rng = np.random.default_rng(seed)
+    raw = np.zeros((4 + num_classes, anchors), dtype=np.float32)
+    raw[0] = rng.uniform(0, 640, anchors)
+    raw[1] = rng.uniform(0, 640, anchors)
+    raw[2:4] = rng.uniform(8, 120, (2, anchors))
+    raw[4:] = rng.uniform(0, 0.2, (num_classes, anchors))
+    hits = rng.choice(anchors, count, replace=False)
+    raw[4 + rng.integers(0, num_classes, count), hits] = rng.uniform(0.3, 1.0, count)
+    return raw
+
+
+def add_exif_orientation(jpeg: bytes, orientation: int) -> bytes:
+    """Insert an APP1 EXIF segment holding only the orientation tag (0x0112) after the SOI marker."""
+    tiff = (
+        b"MM\x00\x2a\x00\x00\x00\x08"        # big-endian TIFF header, IFD at offset 8
+        + b"\x00\x01"                            # one entry
+        + b"\x01\x12\x00\x03\x00\x00\x00\x01"  # Orientation, SHORT, count 1
+        + orientation.to_bytes(2, "big") + b"\x00\x00"
+        + b"\x00\x00\x00\x00"                    # no next IFD
+    )
+    payload = b"Exif\x00\x00" + tiff
+    return jpeg[:2] + b"\xff\xe1" + (len(payload) + 2).to_bytes(2, "big") + payload + jpeg[2:]
+
+
+def check_exif_orientation() -> list:
+    """
+    Decode a 400x200 JPEG tagged with EXIF orientation 6 (rotate 90) through every
+    available codec backend, at full size and reduced.
+
+    @return {list} - Failures; the decoded frame must stay 400 wide and match the reported size
+    """
+    frame = make_frame(400, 200)
+    ok, buffer = cv2.imencode(".jpg", frame)
+    rotated = add_exif_orientation(buffer.tobytes(), 6)
+    backends = ["opencv"] + (["turbojpeg"] if JpegCodec._load_turbojpeg() is not None else [])
+    failures = []
+    for backend in backends:
+        codec = JpegCodec(backend=backend)
+        for max_side in (None, 100):
+            decoded, (width, height) = codec.decode(rotated, max_side)
+            if decoded is None or (width, height) != (400, 200) or decoded.shape[1] < decoded.shape[0]:
+                shape = None if decoded is None else decoded.shape
+                failures.append(f"{backend} max_side={max_side}: frame {shape}, size {(width, height)}")
+    return failures
+
+
+def measure(fn, min_time: float, min_rounds: int, max_rounds: int) -> dict:
+    """Call `fn` repeatedly (after one warm-up call) and summarize the per-call times."""
+    fn()
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_rounds and (len(times) < min_rounds or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    times.sort()
+    return {
+        "rounds": len(times),
+        "median_ms": round(times[len(times) // 2], 4),
+        "p95_ms": round(times[min(len(times) - 1, int(0.95 * len(times)))], 4),
+        "min_ms": round(times[0], 4),
+        "mean_ms": round(sum(times) / len(times), 4)
+    }
+
+
+def build_cases(resolutions: list, counts: list) -> list:
+    """(name, callable) for every stage x resolution x detection count."""
+    processor = ImageProcessor()
+    visualizer = DetectionVisualizer()
+
+    # the synthetic backend never reads the weights; ModelLoader only needs the file to exist
+    placeholder = os.path.join(tempfile.mkdtemp(prefix="pipeline_bench_"), "synthetic.pt")
+    open(placeholder, "wb").close()
+    service = DetectionService(placeholder, backend="synthetic")
+
+    cases = []
+    for label in resolutions:
+        width, height = RESOLUTIONS[label]
+        frame = make_frame(width, height)
+        jpeg = processor.encode_image_to_bytes(frame, quality=80)
+        data_uri = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("ascii")
+        scale = 320 / max(width, height)
+        small_size = (int(width * scale), int(height * scale))
+
+        cases += [
+            (f"decode_base64[{label}]", lambda d=data_uri: processor.decode_base64_image(d)),
+            (f"decode_jpeg[{label}]", lambda j=jpeg: processor.decode_image_bytes(j)),
+            (f"encode_base64[{label}]", lambda f=frame: processor.encode_image_to_base64(f)),
+            (f"encode_jpeg[{label}]", lambda f=frame: processor.encode_image_to_bytes(f, quality=80)),
+            (f"live_decode_resize[{label}]", lambda j=jpeg: service._decode_live_frame(j, 320)),
+            (f"live_resize[{label}]", lambda f=frame, s=small_size: cv2.resize(f, s, interpolation=cv2.INTER_LINEAR))
+        ]
+        for count in counts:
+            detections = make_detections(count, width, height)
+            canvas = frame.copy()
+            cases += [
+                (f"draw[{label},n={count}]", lambda f=frame, d=detections: visualizer.draw_detections(f, d)),
+                (f"draw_inplace[{label},n={count}]",
+                 lambda c=canvas, d=detections: visualizer.draw_detections(c, d, in_place=True))
+            ]
+
+    small = make_frame(320, 240)
+    for count in counts:
+        backend = SyntheticBackend(detections=count)
+        raw = make_raw_head(count)
+
+        def detect(b=backend):
+            service.model.backend = b
+            return service.model.detect(small, imagesz=320)
+
+        def predict(b=backend):
+            service.model.backend = b
+            return service.model.predict_ndarray(small, imagesz=320)
+
+        cases += [
+            (f"detect[n={count}]", detect),
+            (f"predict_ndarray[n={count}]", predict),
+            (f"postprocess_onnx[n={count}]",
+             lambda r=raw: postprocess(r, 0.25, 0.45, 300, 0.5, (0.0, 80.0), (480, 640)))
+        ]
+    return cases
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(results: dict, baseline_path: str, max_regression: float) -> bool:
+    """Print the median change of every case present in both runs; False if any regressed too much."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit') or '?'}), median ms:")
+    ok = True
+    for name, stats in results["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if old is None:
+            continue
+        delta = (stats["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0.0
+        flag = ""
+        if delta > max_regression:
+            flag = "  <-- regression"
+            ok = False
+        print(f"  {name:34s} {old['median_ms']:>10.3f} -> {stats['median_ms']:>10.3f} ({delta:+6.1f}%){flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the frame pipeline stages")
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS), help="Comma separated subset of "
+                        + ", ".join(RESOLUTIONS))
+    parser.add_argument("--counts", default=",".join(str(c) for c in DETECTION_COUNTS),
+                        help="Comma separated detection counts")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--min_time", type=float, default=0.3, help="Seconds spent per case (at least)")
+    parser.add_argument("--min_rounds", type=int, default=5)
+    parser.add_argument("--max_rounds", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=None, help="cv2.setNumThreads for stable numbers")
+    parser.add_argument("--out", default=None, help="Write the results as JSON")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON")
+    parser.add_argument("--max_regression", type=float, default=10.0,
+                        help="Percent a case's median may grow before --compare fails")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+    resolutions = [r.strip() for r in args.resolutions.split(",") if r.strip() in RESOLUTIONS]
+    counts = [int(c) for c in args.counts.split(",") if c.strip()]
+
+    failures = check_exif_orientation()
+    for failure in failures:
+        print(f"FAIL: EXIF-rotated JPEG decoded rotated or with a mismatched size ({failure})")
+    if failures:
+        sys.exit(1)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "opencv": cv2.__version__,
+        "jpeg_codec": ImageProcessor().codec.backend,
+        "numpy": np.__version__,
+        "cv2_threads": cv2.getNumThreads(),
+        "cases": {}
+    }
+    for name, fn in build_cases(resolutions, counts):
+        if args.filter and args.filter not in name:
+            continue
+        stats = measure(fn, args.min_time, args.min_rounds, args.max_rounds)
+        results["cases"][name] = stats
+        print(f"{name:34s} median {stats['median_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms  "
+              f"({stats['rounds']} rounds)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    if args.compare and not compare(results, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Connection-churn soak test for the live Socket.IO server.
+
+Starts `live_app.create_app` in a separate process (synthetic backend unless
+--model), then runs cycles in which many short-lived clients connect, send a
+burst of frames and disconnect right away, while their frames are still
+queued or being inferred. After every cycle it samples the server's resident
+memory (VmRSS from /proc) and the session counters of /stats (live sessions,
+buffered frame bytes, per-session entries left behind for closed sessions).
+
+Fails (exit status 1) when the RSS grew more than --max_growth_mb after the
+warmup cycles, or when sessions, buffered frames or orphaned entries are still
+held once the clients are gone and the session sweep ran.
+
+Example:
+    python src/benchmarks/session_soak.py --cycles 30 --clients 40
+    python src/benchmarks/session_soak.py --workers 2 --tracking --out soak.json
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+
+import socketio
+
+from load_test import ROOT_DIR, fetch_json, git_commit, load_frames, start_server, stop_server
+
+
+def read_rss_mb(pid: int) -> float:
+    """Resident memory of a process in MB (0 where /proc is unavailable)."""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return 0.0
+
+
+def churn_client(index: int, url: str, frames: list, args, counts: dict, lock: threading.Lock) -> None:
+    """Connect, send a burst of frames and disconnect without waiting for the answers."""
+    sio = socketio.Client(reconnection=False)
+    event = "image" if args.base64_every and index % args.base64_every == 0 else "image_binary"
+    try:
+        sio.connect(
+            url,
+            transports=["websocket"],
+            auth={"protocol": args.protocol, "mode": "metadata", "tracking": args.tracking},
+            wait_timeout=10
+        )
+    except Exception:
+        with lock:
+            counts["connect_errors"] += 1
+        return
+    sent = 0
+    try:
+        for i in range(args.frames_per_client):
+            frame = frames[(index + i) % len(frames)]
+            payload = frame if event == "image_binary" else (
+                "data:image/jpeg;base64," + base64.b64encode(frame).decode("ascii")
+            )
+            sio.emit(event, payload)
+            sent += 1
+            time.sleep(args.send_interval_ms / 1000.0)
+    except Exception:
+        pass
+    finally:
+        sio.disconnect()
+        with lock:
+            counts["frames_sent"] += sent
+
+
+def run_cycle(url: str, frames: list, args) -> dict:
+    counts = {"connect_errors": 0, "frames_sent": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=churn_client, args=(i, url, frames, args, counts, lock), daemon=True)
+        for i in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connect/disconnect soak test of the live server's session state")
+    parser.add_argument("--model", default=None, help="Weights to serve (default: synthetic backend)")
+    parser.add_argument("--backend", default="auto", help="Inference backend used with --model")
+    parser.add_argument("--workers", type=int, default=0, help="INFERENCE_WORKERS of the started server")
+    parser.add_argument("--async_mode", default=None, help="Override Config.ASYNC_MODE (e.g. threading)")
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--warmup_cycles", type=int, default=3, help="Cycles before the RSS baseline is taken")
+    parser.add_argument("--clients", type=int, default=30, help="Clients connecting and leaving per cycle")
+    parser.add_argument("--frames_per_client", type=int, default=5)
+    parser.add_argument("--send_interval_ms", type=float, default=5, help="Pause between a client's frames")
+    parser.add_argument("--base64_every", type=int, default=4,
+                        help="Every Nth client sends base64 `image` events (0 = binary only)")
+    parser.add_argument("--protocol", default="json", choices=["json", "binary"])
+    parser.add_argument("--tracking", action="store_true", help="Connect in tracking mode")
+    parser.add_argument("--pause", type=float, default=0.5, help="Seconds between cycles")
+    parser.add_argument("--sweep_interval", type=float, default=1.0, help="SESSION_SWEEP_INTERVAL_S of the server")
+    parser.add_argument("--max_buffered_mb", type=float, default=None, help="LIVE_MAX_BUFFERED_MB of the server")
+    parser.add_argument("--max_growth_mb", type=float, default=25, help="Allowed RSS growth after warmup")
+    parser.add_argument("--images", default=os.path.join(ROOT_DIR, "dataset", "images", "**", "*.*"))
+    parser.add_argument("--resolution", default="640x480", help="WIDTHxHEIGHT of the sent frames")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality of the sent frames")
+    parser.add_argument("--num_frames", type=int, default=30, help="Distinct frames cycled through")
+    parser.add_argument("--synthetic_detections", type=int, default=5)
+    parser.add_argument("--synthetic_latency_ms", type=float, default=15)
+    parser.add_argument("--synthetic_per_image_ms", type=float, default=2)
+    parser.add_argument("--startup_timeout", type=float, default=300)
+    parser.add_argument("--log_level", default="WARNING", help="LOG_LEVEL of the started server")
+    parser.add_argument("--out", default=None, help="Write the samples as JSON")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+    frames = load_frames(args.images, width, height, args.num_frames, args.quality)
+    print(f"{len(frames)} test frames at {width}x{height}, {args.cycles} cycles x {args.clients} clients "
+          f"x {args.frames_per_client} frames")
+
+    # inherited by the spawned server process
+    os.environ["SESSION_SWEEP_INTERVAL_S"] = str(args.sweep_interval)
+    if args.max_buffered_mb is not None:
+        os.environ["LIVE_MAX_BUFFERED_MB"] = str(args.max_buffered_mb)
+
+    process, url = start_server(args)
+    samples = []
+    try:
+        print(f"{'cycle':>5} {'rss_mb':>8} {'sent':>6} {'live':>5} {'buffered':>9} {'orphaned':>8} "
+              f"{'reaped':>6} {'discarded':>9}")
+        for cycle in range(1, args.cycles + 1):
+            counts = run_cycle(url, frames, args)
+            time.sleep(args.pause)
+            sessions = (fetch_json(url + "/stats") or {}).get("sessions") or {}
+            sample = {"cycle": cycle, "rss_mb": round(read_rss_mb(process.pid), 1), **counts, "sessions": sessions}
+            samples.append(sample)
+            print(f"{cycle:>5} {sample['rss_mb']:>8} {counts['frames_sent']:>6} "
+                  f"{sessions.get('live_sessions', '-'):>5} {sessions.get('buffered_bytes', '-'):>9} "
+                  f"{sessions.get('orphaned_total', '-'):>8} {sessions.get('orphans_reaped', '-'):>6} "
+                  f"{sessions.get('results_discarded', '-'):>9}")
+
+        # let in-flight frames finish and the sweep run once more before the final check
+        time.sleep(max(1.0, args.sweep_interval * 2))
+        final = (fetch_json(url + "/stats") or {}).get("sessions") or {}
+        final_rss = read_rss_mb(process.pid)
+    finally:
+        stop_server(process)
+
+    failures = []
+    baseline = samples[min(args.warmup_cycles, len(samples)) - 1]["rss_mb"] if samples else 0.0
+    growth = final_rss - baseline
+    if baseline and growth > args.max_growth_mb:
+        failures.append(f"RSS grew {growth:.1f} MB after warmup (limit {args.max_growth_mb} MB)")
+    for key in ("live_sessions", "buffered_bytes", "orphaned_total"):
+        if final.get(key):
+            failures.append(f"{key} is {final[key]} with every client gone")
+    if not final:
+        failures.append("/stats did not report session counters")
+
+    print(f"RSS {baseline:.1f} MB after warmup -> {final_rss:.1f} MB at the end ({growth:+.1f} MB); "
+          f"final sessions {json.dumps(final)}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "args": vars(args),
+                "samples": samples,
+                "final": {"rss_mb": round(final_rss, 1), "sessions": final},
+                "failures": failures
+            }, f, indent=2)
+        print(f"Results written to {args.out}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
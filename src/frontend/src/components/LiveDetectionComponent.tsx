@@ -11,6 +11,9 @@ interface Detection {
   confidence: number;
 }
 
+// per-stage server latency of a frame (ms), sent when connecting with `timings: true`
+type StageTimings = Partial<Record<"queue" | "decode" | "inference" | "postprocess" | "draw" | "encode" | "total", number>>;
+
 const LiveDetectionComponent = () => {
   const videoRef = useRef<HTMLVideoElement>(null);
   const canvasRef = useRef<HTMLCanvasElement>(null);
@@ -20,6 +23,7 @@ const LiveDetectionComponent = () => {
   const [socket, setSocket] = useState<Socket | null>(null);
   const [frameSrc, setFrameSrc] = useState<string | null>(null);
   const [detections, setDetections] = useState<Detection[]>([]);
+  const [timings, setTimings] = useState<StageTimings | null>(null);
   const [isConnected, setIsConnected] = useState(false);
   const [fps, setFps] = useState(0);
   // target capture fps (controls how frequently we send frames)
@@ -36,6 +40,7 @@ const LiveDetectionComponent = () => {
   useEffect(() => {
     const newSocket = io("http://localhost:8080", {
       transports: ["websocket"],
+      auth: { timings: true },
       reconnection: true,
       reconnectionDelay: 1000,
       reconnectionDelayMax: 5000,
@@ -61,9 +66,10 @@ const LiveDetectionComponent = () => {
       setIsConnected(false);
     });
 
-    newSocket.on("response_back", (data: { frame: string; detections: Detection[] }) => {
+    newSocket.on("response_back", (data: { frame: string; detections: Detection[]; timings?: StageTimings }) => {
       setFrameSrc(data.frame);
       setDetections(data.detections || []);
+      if (data.timings) setTimings(data.timings);
     });
 
     return () => {
@@ -270,14 +276,15 @@ const LiveDetectionComponent = () => {
   }, intervalMs);
 
     return () => clearInterval(interval);
-  }, [socket, isConnected]);
+  }, [socket, isConnected, targetFps]);
 
   // release backpressure when server responds
   useEffect(() => {
     if (!socket) return;
-    const handler = (data: { frame: string; detections: any[] }) => {
+    const handler = (data: { frame: string; detections: any[]; timings?: StageTimings }) => {
       setFrameSrc(data.frame);
       setDetections(data.detections || []);
+      if (data.timings) setTimings(data.timings);
     };
     socket.on("response_back", handler);
     return () => {
@@ -285,6 +292,18 @@ const LiveDetectionComponent = () => {
     };
   }, [socket]);
 
+  // follow the send rate suggested by the server's adaptive controller
+  useEffect(() => {
+    if (!socket) return;
+    const handler = (hint: { fps: number; target_size: number; latency_ms: number | null }) => {
+      setTargetFps(Math.max(1, Math.min(30, Math.round(hint.fps))));
+    };
+    socket.on("rate_hint", handler);
+    return () => {
+      socket.off("rate_hint", handler);
+    };
+  }, [socket]);
+
   return (
     <div className="min-h-screen bg-black text-white">
       <StarsBackground />
@@ -467,10 +486,23 @@ const LiveDetectionComponent = () => {
                   </div>
                   <h2 className="text-base sm:text-lg font-semibold">YOLO Detection</h2>
                 </div>
-                <div className="px-2 sm:px-3 py-0.5 sm:py-1 rounded-full bg-gray-900/10 border border-blue-500/30">
-                  <span className="text-xs font-medium text-blue-400">
-                    {detections.length} objects
-                  </span>
+                <div className="flex items-center gap-2">
+                  {timings?.total !== undefined && (
+                    <span
+                      className="text-xs text-slate-400"
+                      title={Object.entries(timings)
+                        .map(([stage, ms]) => `${stage}: ${ms?.toFixed(1)} ms`)
+                        .join("\n")}
+                    >
+                      {timings.total.toFixed(0)} ms
+                      {timings.inference !== undefined && ` (infer ${timings.inference.toFixed(0)} ms)`}
+                    </span>
+                  )}
+                  <div className="px-2 sm:px-3 py-0.5 sm:py-1 rounded-full bg-gray-900/10 border border-blue-500/30">
+                    <span className="text-xs font-medium text-blue-400">
+                      {detections.length} objects
+                    </span>
+                  </div>
                 </div>
               </div>
               <div className="p-3 sm:p-4">
@@ -0,0 +1,234 @@
+"""
+YOLO Quantization Script
+
+Produces quantized ONNX variants of a trained `best.pt` and writes a
+side-by-side accuracy-vs-speed report:
+
+- fp32          : plain ONNX export (reference for the quantized variants)
+- fp16          : FP16 weights/activations (needs onnxconverter-common)
+- int8_dynamic  : ONNX Runtime dynamic INT8 (weights quantized, activations at runtime)
+- int8_static   : ONNX Runtime static INT8 (QDQ), calibrated on dataset/images/val
+
+Every variant is written next to the weights (best.int8_static.onnx, ...) so
+the server can serve it directly with MODEL_VARIANT=<variant>.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from viz import save_metrics
+
+# Share letterbox pre-processing and variant names with the serving code (src/api)
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+sys.path.insert(0, API_DIR)
+
+from inference_backends import MODEL_VARIANTS, OnnxRuntimeBackend, export_model, letterbox  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def list_images(images_dir: str, limit: int) -> list:
+    """Collect up to `limit` image paths below images_dir (sorted for reproducibility)."""
+    paths = [
+        p for p in glob.glob(os.path.join(images_dir, "**", "*"), recursive=True)
+        if p.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    return sorted(paths)[:limit]
+
+
+class ValImageCalibrationReader:
+    """ONNX Runtime calibration reader feeding letterboxed validation images."""
+
+    def __init__(self, input_name: str, image_paths: list, imgsz: int):
+        self.input_name = input_name
+        self.image_paths = iter(image_paths)
+        self.imgsz = imgsz
+
+    def get_next(self):
+        for path in self.image_paths:
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            tensor, _, _ = letterbox(img, self.imgsz)
+            return {self.input_name: tensor[None]}
+        return None
+
+    def rewind(self):
+        pass
+
+
+def copy_metadata(src_path: str, dst_path: str) -> None:
+    """Copy the ultralytics metadata (names, stride, imgsz) so the variant loads like the export."""
+    import onnx
+
+    src, dst = onnx.load(src_path), onnx.load(dst_path)
+    existing = {p.key for p in dst.metadata_props}
+    for prop in src.metadata_props:
+        if prop.key not in existing:
+            dst.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(dst, dst_path)
+
+
+def build_variants(weights: str, imgsz: int, calib_paths: list, variants: list) -> dict:
+    """
+    Export and quantize the requested variants.
+
+    @return {dict} - variant name -> ONNX path (variants that could not be built are skipped)
+    """
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    stem = os.path.splitext(weights)[0]
+    fp32_path = export_model(weights, "onnx", imgsz=imgsz)
+    built = {"fp32": fp32_path}
+
+    if "fp16" in variants:
+        try:
+            import onnx
+            from onnxconverter_common import float16
+
+            fp16_path = stem + MODEL_VARIANTS["fp16"]
+            onnx.save(float16.convert_float_to_float16(onnx.load(fp32_path), keep_io_types=True), fp16_path)
+            built["fp16"] = fp16_path
+        except ImportError:
+            print("[WARN] Skipping fp16: pip install onnxconverter-common")
+
+    if "int8_dynamic" in variants:
+        dynamic_path = stem + MODEL_VARIANTS["int8_dynamic"]
+        quantize_dynamic(fp32_path, dynamic_path, weight_type=QuantType.QUInt8)
+        copy_metadata(fp32_path, dynamic_path)
+        built["int8_dynamic"] = dynamic_path
+
+    if "int8_static" in variants:
+        if not calib_paths:
+            print("[WARN] Skipping int8_static: no calibration images found")
+        else:
+            static_path = stem + MODEL_VARIANTS["int8_static"]
+            input_name = OnnxRuntimeBackend(fp32_path).input_name
+            quantize_static(
+                fp32_path,
+                static_path,
+                ValImageCalibrationReader(input_name, calib_paths, imgsz),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+                calibrate_method=CalibrationMethod.MinMax
+            )
+            copy_metadata(fp32_path, static_path)
+            built["int8_static"] = static_path
+
+    return built
+
+
+def measure_latency(model_path: str, image_paths: list, imgsz: int, warmup: int = 3) -> float:
+    """Median CPU latency (ms/img) of the serving backend (letterbox + inference + NMS)."""
+    backend = OnnxRuntimeBackend(model_path)
+    images = [img for img in (cv2.imread(p, cv2.IMREAD_COLOR) for p in image_paths) if img is not None]
+    if not images:
+        return None
+
+    for img in images[:warmup]:
+        backend.predict([img], imgsz=imgsz, conf=0.25)
+
+    timings = []
+    for img in images:
+        start = time.perf_counter()
+        backend.predict([img], imgsz=imgsz, conf=0.25)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(timings))
+
+
+def evaluate(model_path: str, dataset: str, imgsz: int) -> dict:
+    """Validate one variant on CPU and collect overall and per-class mAP."""
+    res = YOLO(model_path, task="detect").val(data=dataset, imgsz=imgsz, batch=1, device="cpu", verbose=False, plots=False)
+    names = res.names
+    ap50 = dict(zip(res.box.ap_class_index.tolist(), res.box.ap50.tolist()))
+    ap = dict(zip(res.box.ap_class_index.tolist(), res.box.ap.tolist()))
+    return {
+        "mAP50": float(res.box.map50),
+        "mAP50-95": float(res.box.map),
+        "per_class": {
+            names[i]: {"mAP50": ap50.get(i), "mAP50-95": ap.get(i)} for i in sorted(names)
+        },
+        "speed(ms/img)": getattr(res, "speed", None)
+    }
+
+
+def write_markdown(report: dict, out_path: str) -> None:
+    """Render the side-by-side variant table (overall + per class)."""
+    variants = list(report["variants"])
+    classes = list(next(iter(report["variants"].values()))["per_class"]) if variants else []
+
+    def fmt(value):
+        return "-" if value is None else f"{value:.4f}" if isinstance(value, float) else str(value)
+
+    lines = [
+        f"# Quantization report: {report['weights']}",
+        "",
+        "| Variant | Size (MB) | CPU latency (ms/img) | mAP50 | mAP50-95 |",
+        "|---|---|---|---|---|"
+    ]
+    for name in variants:
+        v = report["variants"][name]
+        lines.append(f"| {name} | {fmt(v['size_mb'])} | {fmt(v['latency_ms'])} | {fmt(v['mAP50'])} | {fmt(v['mAP50-95'])} |")
+
+    lines += ["", "## Per-class mAP50 / mAP50-95", "", "| Class | " + " | ".join(variants) + " |",
+              "|---|" + "---|" * len(variants)]
+    for cls in classes:
+        cells = [
+            f"{fmt(report['variants'][n]['per_class'][cls]['mAP50'])} / "
+            f"{fmt(report['variants'][n]['per_class'][cls]['mAP50-95'])}"
+            for n in variants
+        ]
+        lines.append(f"| {cls} | " + " | ".join(cells) + " |")
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize a trained YOLO model and report accuracy vs speed")
+    parser.add_argument("--weights", required=True, help="Path to trained weights (.pt)")
+    parser.add_argument("--dataset", default="../../dataset/data.yaml", help="Dataset YAML path")
+    parser.add_argument("--calib_dir", default="../../dataset/images/val", help="Calibration images")
+    parser.add_argument("--calib_images", type=int, default=200, help="Number of calibration images")
+    parser.add_argument("--latency_images", type=int, default=50, help="Images used for the latency benchmark")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--variants", nargs="+", default=list(MODEL_VARIANTS), choices=list(MODEL_VARIANTS))
+    parser.add_argument("--out_dir", default="../../runs/quantize", help="Where to save the report")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    weights = os.path.abspath(args.weights)
+    calib_paths = list_images(args.calib_dir, args.calib_images)
+
+    print(f"🔧 Quantizing model: {weights}")
+    print(f"📂 Calibration images: {len(calib_paths)} from {args.calib_dir}")
+
+    built = build_variants(weights, args.imgsz, calib_paths, args.variants)
+
+    report = {"weights": weights, "imgsz": args.imgsz, "variants": {}}
+    for name, path in built.items():
+        print(f"🔍 Evaluating {name}: {path}")
+        metrics = evaluate(path, args.dataset, args.imgsz)
+        metrics["path"] = path
+        metrics["size_mb"] = os.path.getsize(path) / 1e6
+        metrics["latency_ms"] = measure_latency(path, calib_paths[:args.latency_images], args.imgsz)
+        report["variants"][name] = metrics
+
+    out_json = os.path.join(args.out_dir, "quantization_report.json")
+    save_metrics(report, out_json)
+    out_md = os.path.join(args.out_dir, "quantization_report.md")
+    write_markdown(report, out_md)
+    print(f"✅ Report saved to: {out_md}")
+
+    print("\n📊 Summary:")
+    for name, v in report["variants"].items():
+        print(f" - {name}: mAP50={v['mAP50']:.4f} mAP50-95={v['mAP50-95']:.4f} latency={v['latency_ms']} ms/img")
+    print("\nServe a variant with MODEL_VARIANT=<variant> (MODEL_PATH stays the .pt weights).")
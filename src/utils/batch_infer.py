@@ -0,0 +1,380 @@
+"""
+Offline bulk inference over a directory, a glob or a video file.
+
+Images are read and decoded on a thread pool (JPEGs reduced to the inference
+size while decoding), run through `ModelLoader.detect_batch` in batches and
+written as one record per image (or video frame) to JSONL or Parquet. Videos
+are read as a stream by a single reader thread into a bounded queue, so memory
+stays flat for recordings of any length.
+
+Progress is checkpointed every --checkpoint_every batches: the output is
+flushed first, then the number of finished inputs is recorded. Re-running
+the same command resumes after the last checkpoint (records written after it
+are dropped and redone); --restart starts over.
+
+Output records: {"source", "frame" (video only), "timestamp_ms" (video only),
+"width", "height", "count", "detections": [...]} in JSONL; Parquet has one row
+per input with list columns (class_id, class_name, confidence, x1, y1, x2, y2)
+and is written as one part file per checkpoint into the --out directory.
+
+Example:
+    python src/utils/batch_infer.py dataset/images/val --weights runs/.../best.pt --out val.jsonl
+    python src/utils/batch_infer.py "photos/**/*.jpg" --out audit_parquet --format parquet --batch 16
+    python src/utils/batch_infer.py station.mp4 --out station.jsonl --video_stride 5 --annotate_dir annotated/
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Make src/api importable (it uses flat imports)
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+sys.path.insert(0, API_DIR)
+
+from config import Config  # noqa: E402
+from detection_visuallizer import DetectionVisualizer  # noqa: E402
+from image_processor import ImageProcessor  # noqa: E402
+from model_loader import ModelLoader  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".webm", ".ts")
+
+# (source, video frame index or None, timestamp ms or None, decoded BGR frame or None, original (w, h))
+Item = Tuple[str, Optional[int], Optional[float], Optional[np.ndarray], Tuple[int, int]]
+
+
+def list_images(input_path: str) -> List[str]:
+    """Sorted image paths of a directory (recursive) or a glob, so resumed runs see the same order."""
+    if os.path.isdir(input_path):
+        paths = glob.glob(os.path.join(input_path, "**", "*"), recursive=True)
+    else:
+        paths = glob.glob(input_path, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def iter_images(paths: List[str], processor: ImageProcessor, max_side: Optional[int], workers: int) -> Iterator[Item]:
+    """
+    Read and decode images on a thread pool, yielding them in input order.
+
+    At most a few images per worker are decoded ahead of the consumer.
+    """
+    def decode(path: str) -> Item:
+        try:
+            with open(path, "rb") as f:
+                frame, size = processor.decode_image_bytes(f.read(), max_side)
+            return path, None, None, frame, size
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Skipping {path}: {e}")
+            return path, None, None, None, (0, 0)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        remaining = iter(paths)
+        pending = deque(executor.submit(decode, path) for path in itertools.islice(remaining, workers * 4))
+        while pending:
+            item = pending.popleft().result()
+            following = next(remaining, None)
+            if following is not None:
+                pending.append(executor.submit(decode, following))
+            yield item
+
+
+def iter_video(path: str, start_frame: int, stride: int, max_side: Optional[int], prefetch: int) -> Iterator[Item]:
+    """
+    Stream the frames of a video, every `stride`-th one from `start_frame` on.
+
+    A reader thread decodes into a bounded queue (frames in between are only
+    grabbed, not decoded) and shrinks them to `max_side`, so memory use does
+    not grow with the length of the recording.
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video {path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    if start_frame:
+        # container seeking can land slightly off on some codecs; resumed runs continue from there
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    frames: "queue.Queue" = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def read() -> None:
+        index = start_frame
+        try:
+            while not stop.is_set():
+                if (index - start_frame) % stride:
+                    if not capture.grab():
+                        break
+                    index += 1
+                    continue
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                h, w = frame.shape[:2]
+                if max_side and max(h, w) > max_side:
+                    scale = max_side / max(h, w)
+                    frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+                timestamp = index * 1000.0 / fps if fps else None
+                frames.put((path, index, timestamp, frame, (w, h)))
+                index += 1
+        finally:
+            frames.put(None)
+
+    reader = threading.Thread(target=read, daemon=True, name="video-reader")
+    reader.start()
+    try:
+        while True:
+            item = frames.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        stop.set()
+        # unblock the reader if it waits on a full queue
+        while reader.is_alive():
+            try:
+                frames.get_nowait()
+            except queue.Empty:
+                reader.join(timeout=0.05)
+        capture.release()
+
+
+class JsonlSink:
+    """Appends JSON lines; a checkpoint is the flushed file size, resuming truncates back to it."""
+
+    def __init__(self, path: str, resume_state: Optional[dict]):
+        mode = "r+b" if resume_state and os.path.exists(path) else "wb"
+        self.file = open(path, mode)
+        if mode == "r+b":
+            self.file.truncate(resume_state["output_bytes"])
+            self.file.seek(resume_state["output_bytes"])
+
+    def write(self, records: List[dict]) -> None:
+        self.file.write("".join(json.dumps(record) + "\n" for record in records).encode("utf-8"))
+
+    def checkpoint(self) -> dict:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"output_bytes": self.file.tell()}
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetSink:
+    """Writes one Parquet part file per checkpoint; resuming deletes parts after the checkpoint."""
+
+    def __init__(self, directory: str, resume_state: Optional[dict]):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Parquet output requires the pyarrow package (pip install pyarrow)") from e
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.parts = resume_state["parts"] if resume_state else 0
+        for name in os.listdir(directory):
+            if name.startswith("part-") and name.endswith(".parquet") and int(name[5:10]) >= self.parts:
+                os.remove(os.path.join(directory, name))
+        self.rows: List[dict] = []
+
+    def write(self, records: List[dict]) -> None:
+        for record in records:
+            detections = record.pop("detections")
+            # same columns in every part file
+            record.setdefault("error", None)
+            record.update({
+                "class_id": [d["class_Id"] for d in detections],
+                "class_name": [d["class_name"] for d in detections],
+                "confidence": [d["confidence"] for d in detections],
+                "x1": [d["bbox"][0] for d in detections],
+                "y1": [d["bbox"][1] for d in detections],
+                "x2": [d["bbox"][2] for d in detections],
+                "y2": [d["bbox"][3] for d in detections]
+            })
+            self.rows.append(record)
+
+    def checkpoint(self) -> dict:
+        if self.rows:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            path = os.path.join(self.directory, f"part-{self.parts:05d}.parquet")
+            pq.write_table(pa.Table.from_pylist(self.rows), path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self.parts += 1
+            self.rows = []
+        return {"parts": self.parts}
+
+    def close(self) -> None:
+        # rows after the last checkpoint are redone on resume
+        self.rows = []
+
+
+def load_checkpoint(path: str, signature: dict) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("signature") != signature:
+        raise SystemExit(f"Checkpoint {path} belongs to a different run (input/model/settings); use --restart")
+    return state
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def batched(items: Iterator[Item], size: int) -> Iterator[List[Item]]:
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the detector over a directory, glob or video")
+    parser.add_argument("input", help="Image directory, image glob (quote it) or video file")
+    parser.add_argument("--weights", default=Config.MODEL_PATH, help="Model weights (default: MODEL_PATH)")
+    parser.add_argument("--backend", default=Config.INFERENCE_BACKEND)
+    parser.add_argument("--variant", default=Config.MODEL_VARIANT or None)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--batch", type=int, default=8, help="Images per forward pass")
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="Image decode threads")
+    parser.add_argument("--out", required=True, help=".jsonl file, or a directory for --format parquet")
+    parser.add_argument("--format", default="auto", choices=["auto", "jsonl", "parquet"])
+    parser.add_argument("--annotate_dir", default=None, help="Also write annotated images here, mirroring the input folders")
+    parser.add_argument("--video_stride", type=int, default=1, help="Process every Nth video frame")
+    parser.add_argument("--checkpoint_every", type=int, default=50, help="Batches between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    output_format = args.format
+    if output_format == "auto":
+        output_format = "jsonl" if args.out.lower().endswith((".jsonl", ".ndjson")) else "parquet"
+
+    is_video = os.path.isfile(args.input) and args.input.lower().endswith(VIDEO_EXTENSIONS)
+    paths = [] if is_video else list_images(args.input)
+    if not is_video and not paths:
+        print(f"No images matched {args.input}")
+        return 1
+
+    checkpoint_path = args.out.rstrip("/\\") + ".checkpoint.json"
+    signature = {
+        "input": os.path.abspath(args.input),
+        "inputs": len(paths) if not is_video else None,
+        "weights": os.path.abspath(args.weights),
+        "backend": args.backend,
+        "variant": args.variant,
+        "imgsz": args.imgsz,
+        "conf": args.conf,
+        "video_stride": args.video_stride,
+        "format": output_format
+    }
+    state = None if args.restart else load_checkpoint(checkpoint_path, signature)
+    done = state["done"] if state else 0
+    if state:
+        print(f"[INFO] Resuming after {done} {'frames' if is_video else 'images'}")
+
+    model = ModelLoader(args.weights, backend=args.backend, variant=args.variant)
+    processor = ImageProcessor()
+    visualizer = DetectionVisualizer() if args.annotate_dir else None
+    # annotated images are drawn at full size; otherwise JPEGs are decoded reduced to the inference size
+    max_side = None if args.annotate_dir else args.imgsz
+    if args.annotate_dir:
+        os.makedirs(args.annotate_dir, exist_ok=True)
+    # annotated images mirror the input tree below this root, so equal file names in subfolders do not collide
+    if os.path.isdir(args.input):
+        source_root = args.input
+    else:
+        source_root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths or [args.input]])
+
+    if is_video:
+        stride = max(1, args.video_stride)
+        items = iter_video(args.input, done * stride, stride, max_side, prefetch=args.batch * 4)
+    else:
+        items = iter_images(paths[done:], processor, max_side, args.workers)
+
+    sink = ParquetSink(args.out, state) if output_format == "parquet" else JsonlSink(args.out, state)
+    started = time.perf_counter()
+    processed = 0
+    try:
+        for batch_index, batch in enumerate(batched(items, max(1, args.batch)), start=1):
+            decoded = [item for item in batch if item[3] is not None]
+            results = model.detect_batch([item[3] for item in decoded], imagesz=args.imgsz, conf=args.conf)
+            detections_by_item = {id(item): detections for item, detections in zip(decoded, results)}
+
+            records = []
+            for item in batch:
+                source, frame_index, timestamp, frame, (width, height) = item
+                record = {"source": os.path.relpath(source, args.input) if os.path.isdir(args.input) else source}
+                if frame_index is not None:
+                    record.update({"frame": frame_index, "timestamp_ms": timestamp})
+                detections = detections_by_item.get(id(item))
+                if detections is None:
+                    record.update({"width": 0, "height": 0, "count": 0, "detections": [], "error": "decode failed"})
+                    records.append(record)
+                    continue
+                if (width > height) != (frame.shape[1] > frame.shape[0]):
+                    # the frame was rotated relative to the header size (e.g. by EXIF orientation):
+                    # rescaling boxes to (width, height) would be anisotropic and wrong
+                    record.update({
+                        "width": width, "height": height, "count": 0, "detections": [],
+                        "error": "decoded frame orientation does not match the image size"
+                    })
+                    records.append(record)
+                    continue
+                if visualizer is not None:
+                    annotated = visualizer.draw_detections(frame, detections, in_place=True)
+                    name, ext = os.path.splitext(os.path.relpath(os.path.abspath(source), os.path.abspath(source_root)))
+                    if frame_index is not None:
+                        name += f"_{frame_index:08d}.jpg"
+                    else:
+                        # keep a non-JPEG extension so a.png and a.jpg do not overwrite each other
+                        name += ".jpg" if ext.lower() in (".jpg", ".jpeg") else f"{ext}.jpg"
+                    annotated_path = os.path.join(args.annotate_dir, name)
+                    os.makedirs(os.path.dirname(annotated_path), exist_ok=True)
+                    cv2.imwrite(annotated_path, annotated)
+                detections = detections.scaled(width / frame.shape[1], height / frame.shape[0])
+                record.update({
+                    "width": width, "height": height, "count": len(detections), "detections": detections.to_list()
+                })
+                records.append(record)
+
+            sink.write(records)
+            processed += len(batch)
+            if batch_index % args.checkpoint_every == 0:
+                save_checkpoint(checkpoint_path, {"signature": signature, "done": done + processed, **sink.checkpoint()})
+                elapsed = time.perf_counter() - started
+                total = f"/{len(paths)}" if paths else ""
+                print(f"[INFO] {done + processed}{total} done, {processed / elapsed:.1f} images/s")
+        save_checkpoint(
+            checkpoint_path, {"signature": signature, "done": done + processed, **sink.checkpoint(), "finished": True}
+        )
+    except KeyboardInterrupt:
+        print("[INFO] Interrupted; re-run the same command to resume from the last checkpoint")
+        return 130
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] {processed} inputs in {elapsed:.1f}s ({processed / elapsed if elapsed else 0.0:.1f} images/s) -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Backend parity check.
+
+Runs the same images through the PyTorch (ultralytics) path and an exported
+backend (ONNX Runtime / OpenVINO / TorchScript) via `ModelLoader`, matches the
+detections of both and fails when they drift apart.
+
+Example:
+    python src/utils/compare_backends.py --weights runs/.../best.pt --backend onnx \
+        --images "dataset/images/val/*.png" --limit 50
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+import cv2
+import numpy as np
+
+# Make src/api importable (it uses flat imports)
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+sys.path.insert(0, API_DIR)
+
+from model_loader import ModelLoader  # noqa: E402
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def compare(reference: list, candidate: list, iou_threshold: float, conf_tolerance: float) -> dict:
+    """
+    Greedily match candidate detections to reference detections of the same class.
+
+    @return {dict} - matched / missing / extra counts and the worst confidence delta
+    """
+    ref_boxes = np.array([d["bbox"] for d in reference], dtype=np.float32).reshape(-1, 4)
+    cand_boxes = np.array([d["bbox"] for d in candidate], dtype=np.float32).reshape(-1, 4)
+    ious = box_iou(ref_boxes, cand_boxes)
+
+    matched, worst_conf = 0, 0.0
+    used = set()
+    for i, ref in enumerate(reference):
+        best_j, best_iou = None, iou_threshold
+        for j, cand in enumerate(candidate):
+            if j in used or cand["class_Id"] != ref["class_Id"]:
+                continue
+            if ious[i, j] >= best_iou:
+                best_j, best_iou = j, ious[i, j]
+        if best_j is not None:
+            used.add(best_j)
+            matched += 1
+            worst_conf = max(worst_conf, abs(candidate[best_j]["confidence"] - ref["confidence"]))
+
+    return {
+        "matched": matched,
+        "missing": len(reference) - matched,
+        "extra": len(candidate) - len(used),
+        "max_conf_delta": worst_conf,
+        "ok": matched == len(reference) and len(used) == len(candidate) and worst_conf <= conf_tolerance
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check an exported backend against the PyTorch path")
+    parser.add_argument("--weights", required=True, help="Path to trained weights (.pt)")
+    parser.add_argument("--backend", default="onnx", choices=["onnx", "openvino", "torchscript"])
+    parser.add_argument("--images", default="dataset/images/val/*", help="Glob of images to compare on")
+    parser.add_argument("--limit", type=int, default=50, help="Maximum number of images")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.9, help="Minimum IoU for two boxes to match")
+    parser.add_argument("--conf_tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    paths = sorted(p for p in glob.glob(args.images) if os.path.isfile(p))[:args.limit]
+    if not paths:
+        print(f"No images matched {args.images}")
+        return 1
+
+    reference = ModelLoader(args.weights, backend="pytorch")
+    candidate = ModelLoader(args.weights, backend=args.backend)
+
+    failures = 0
+    for path in paths:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        ref = reference.predict_ndarray(img, imagesz=args.imgsz, conf=args.conf)["detections"]
+        cand = candidate.predict_ndarray(img, imagesz=args.imgsz, conf=args.conf)["detections"]
+        report = compare(ref, cand, args.iou, args.conf_tolerance)
+        if not report["ok"]:
+            failures += 1
+            print(f"[MISMATCH] {path}: {report}")
+
+    print(f"[INFO] {len(paths) - failures}/{len(paths)} images match between pytorch and {args.backend}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Cold-start budget check for the live server.
+
+Measures, each in a fresh interpreter:
+  1. how long `import live_app` takes and whether it pulled in heavy modules
+     (torch, ultralytics, matplotlib, ...) that should only load with the model;
+  2. with --model, the time from process start until `/ready` and until the
+     first live frame comes back (model load + warm-up included).
+Exits with status 1 when a budget is exceeded, so it can run in CI.
+
+Example:
+    python src/utils/startup_check.py --import_budget_ms 1500
+    python src/utils/startup_check.py --model runs/.../best.pt --ready_budget_s 20 --frame_budget_ms 300
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+
+# Modules that must only be imported once the model is loaded (inference_backends)
+HEAVY_MODULES = ("torch", "ultralytics", "matplotlib", "onnxruntime", "openvino", "pandas", "PIL", "yaml")
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import live_app
+elapsed = time.perf_counter() - started
+print(json.dumps({"import_ms": elapsed * 1000, "heavy": [m for m in HEAVY if m in sys.modules]}))
+"""
+
+COLD_START_PROBE = """
+import json, time
+started = time.perf_counter()
+import cv2, numpy as np
+from config import Config
+Config.ASYNC_MODE = "threading"
+import live_app
+app, socketio = live_app.create_app(Config())
+if not live_app.service_ready.wait(TIMEOUT):
+    raise SystemExit("model did not become ready within the timeout")
+ready_s = time.perf_counter() - started
+client = socketio.test_client(app)
+ok, frame = cv2.imencode(".jpg", np.zeros((480, 640, 3), dtype=np.uint8))
+sent = time.perf_counter()
+client.emit("image_binary", frame.tobytes())
+frame_ms = None
+while time.perf_counter() - sent < TIMEOUT:
+    if any(m["name"] in ("response_back", "response_binary") for m in client.get_received()):
+        frame_ms = (time.perf_counter() - sent) * 1000
+        break
+    time.sleep(0.002)
+client.disconnect()
+print(json.dumps({"ready_s": ready_s, "first_frame_ms": frame_ms, "startup": live_app.model_registry.startup}))
+"""
+
+
+def run_probe(source: str, env: dict) -> dict:
+    """Run a probe in a fresh interpreter inside src/api and parse its JSON report."""
+    proc = subprocess.run(
+        [sys.executable, "-c", source], cwd=API_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or proc.stdout.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import time and cold start of the live server")
+    parser.add_argument("--import_budget_ms", type=float, default=1500, help="Maximum time of `import live_app`")
+    parser.add_argument("--model", default=None, help="Weights to measure a full cold start with (optional)")
+    parser.add_argument("--ready_budget_s", type=float, default=30, help="Maximum time until /ready")
+    parser.add_argument("--frame_budget_ms", type=float, default=500, help="Maximum latency of the first frame")
+    parser.add_argument("--timeout_s", type=float, default=300)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [API_DIR, env.get("PYTHONPATH")]))
+    failures = []
+
+    report = run_probe(IMPORT_PROBE.replace("HEAVY", repr(HEAVY_MODULES)), env)
+    print(f"import live_app: {report['import_ms']:.0f} ms (budget {args.import_budget_ms:.0f} ms)")
+    if report["import_ms"] > args.import_budget_ms:
+        failures.append("import time over budget")
+    if report["heavy"]:
+        print(f"  heavy modules imported eagerly: {', '.join(report['heavy'])}")
+        failures.append("heavy modules on the import path")
+
+    if args.model:
+        env["MODEL_PATH"] = args.model
+        report = run_probe(COLD_START_PROBE.replace("TIMEOUT", str(args.timeout_s)), env)
+        print(f"process start -> ready: {report['ready_s']:.2f} s (budget {args.ready_budget_s:.0f} s)")
+        print(f"  phases: {report['startup']}")
+        if report["ready_s"] > args.ready_budget_s:
+            failures.append("cold start over budget")
+        if report["first_frame_ms"] is None:
+            failures.append("no result for the first frame")
+        else:
+            print(f"first frame: {report['first_frame_ms']:.0f} ms (budget {args.frame_budget_ms:.0f} ms)")
+            if report["first_frame_ms"] > args.frame_budget_ms:
+                failures.append("first frame over budget")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()